@@ -1,6 +1,12 @@
 // Document database - This will hold the indexed documents
 let documentDatabase = [];
-let searchIndex = {};
+let searchIndex = null;
+const docIndexById = new Map();
+
+// Sharded builds (process_all_pdfs.py --format sharded) load content on demand
+const CORPUS_DIR = 'corpus';
+let corpusManifest = null;
+const shardLoads = {};
 
 // Initialize the application
 document.addEventListener('DOMContentLoaded', function() {
@@ -23,6 +29,11 @@ function setupEventListeners() {
 // Load documents from the data file
 async function loadDocuments() {
     try {
+        if (await loadCorpusManifest()) {
+            await loadSearchIndex(`${CORPUS_DIR}/search_index.json.gz`);
+            return;
+        }
+        
         const response = await fetch('documents.json');
         if (!response.ok) {
             console.warn('No documents.json file found. Please add documents to enable search.');
@@ -30,7 +41,10 @@ async function loadDocuments() {
         }
         const data = await response.json();
         documentDatabase = data.documents || [];
-        buildSearchIndex();
+        indexDocumentIds();
+        if (!await loadSearchIndex('search_index.json.gz')) {
+            buildSearchIndex();
+        }
         updateLastUpdated(data.lastUpdated);
         updateTotalDocs(documentDatabase.length);
         populateDocumentLibrary();
@@ -39,6 +53,67 @@ async function loadDocuments() {
     }
 }
 
+// Load the sharded corpus manifest, if this site was built with one.
+// Documents are listed right away; their content arrives with loadShard().
+async function loadCorpusManifest() {
+    try {
+        const response = await fetch(`${CORPUS_DIR}/manifest.json`);
+        if (!response.ok) return false;
+        corpusManifest = await response.json();
+    } catch (error) {
+        return false;
+    }
+    
+    documentDatabase = corpusManifest.documents || [];
+    indexDocumentIds();
+    updateLastUpdated(corpusManifest.lastUpdated);
+    updateTotalDocs(documentDatabase.length);
+    populateDocumentLibrary();
+    return true;
+}
+
+// Fetch one content shard and attach its text to the matching documents
+function loadShard(shardIndex) {
+    if (!shardLoads[shardIndex]) {
+        const shard = corpusManifest.shards[shardIndex];
+        shardLoads[shardIndex] = (async () => {
+            const response = await fetch(`${CORPUS_DIR}/${shard.file}?v=${corpusManifest.build}`);
+            if (!response.ok) throw new Error(`Could not load ${shard.file}`);
+            
+            const entriesById = {};
+            (await readGzippedJson(response)).forEach(entry => {
+                entriesById[entry.id] = entry;
+            });
+            documentDatabase.forEach(doc => {
+                if (doc.shard !== shardIndex) return;
+                doc.content = entriesById[doc.id].content;
+                if (entriesById[doc.id].pageOffsets) doc.pageOffsets = entriesById[doc.id].pageOffsets;
+            });
+        })();
+        // Allow a retry if the request failed
+        shardLoads[shardIndex].catch(() => delete shardLoads[shardIndex]);
+    }
+    return shardLoads[shardIndex];
+}
+
+// Parse a .json.gz response. Some hosts already decode .gz for us, so only
+// decompress if the body is still gzipped.
+async function readGzippedJson(response) {
+    let bytes = new Uint8Array(await response.arrayBuffer());
+    if (bytes[0] === 0x1f && bytes[1] === 0x8b) {
+        const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+        bytes = new Uint8Array(await new Response(stream).arrayBuffer());
+    }
+    return JSON.parse(new TextDecoder().decode(bytes));
+}
+
+// Make sure the given documents (default: all) have their content loaded
+async function ensureContentLoaded(docs = documentDatabase) {
+    if (!corpusManifest) return;
+    const shards = new Set(docs.filter(doc => doc.content === undefined).map(doc => doc.shard));
+    await Promise.all([...shards].map(loadShard));
+}
+
 function updateTotalDocs(count) {
     const totalDocsEl = document.getElementById('totalDocs');
     if (totalDocsEl) {
@@ -46,22 +121,220 @@ function updateTotalDocs(count) {
     }
 }
 
+function indexDocumentIds() {
+    docIndexById.clear();
+    documentDatabase.forEach((doc, index) => docIndexById.set(doc.id, index));
+}
+
+// Search index: term -> documents containing it. Terms are lowercased runs
+// of letters/digits, the same as search_index.py. It is either the prebuilt
+// search_index.json.gz (with word positions, and from version 2 character
+// offsets) or, failing that, built here.
+const TOKEN_REGEX = /[\p{L}\p{N}]+/gu;
+
+// Terms whose index words occur more often than this are matched by scanning
+const MAX_INDEXED_STARTS = 20000;
+
+function tokenize(text) {
+    return text.toLowerCase().match(TOKEN_REGEX) || [];
+}
+
+function setSearchIndex(terms, positional, hasOffsets = false, shifted = []) {
+    searchIndex = {
+        terms: terms,
+        positional: positional,
+        hasOffsets: hasOffsets,
+        // Documents whose offsets don't line up with their text (see search_index.py)
+        shifted: new Set(shifted.map(id => docIndexById.get(id))),
+        vocabulary: [...terms.keys()],
+        postings: new Map(),
+        vocabularyMatches: new Map()
+    };
+}
+
+// Load the index built by process_all_pdfs.py
+async function loadSearchIndex(url) {
+    try {
+        const response = await fetch(url);
+        if (!response.ok) return false;
+        const index = await readGzippedJson(response);
+        if ((index.version !== 1 && index.version !== 2) || index.documents !== documentDatabase.length) {
+            console.warn('Search index does not match the loaded documents, ignoring it.');
+            return false;
+        }
+        setSearchIndex(new Map(Object.entries(index.terms)), true, index.version >= 2, index.shifted || []);
+        return true;
+    } catch (error) {
+        console.warn('Could not load search index:', error.message);
+        return false;
+    }
+}
+
 // Build a search index for faster lookups
 function buildSearchIndex() {
-    searchIndex = {};
+    const terms = new Map();
     documentDatabase.forEach((doc, index) => {
-        const text = `${doc.title} ${doc.content} ${doc.source}`.toLowerCase();
-        const words = text.split(/\s+/);
-        
-        words.forEach(word => {
-            if (!searchIndex[word]) {
-                searchIndex[word] = [];
+        tokenize(doc.content).forEach(term => {
+            let docs = terms.get(term);
+            if (!docs) {
+                docs = [];
+                terms.set(term, docs);
             }
-            if (!searchIndex[word].includes(index)) {
-                searchIndex[word].push(index);
+            // Documents are visited in order, so only the last entry can repeat
+            if (docs[docs.length - 1] !== index) {
+                docs.push(index);
             }
         });
     });
+    setSearchIndex(terms, false);
+}
+
+// Decode varint postings (see search_index.py) into docIndex -> word positions
+// and, for version 2 indexes, docIndex -> character offsets
+function decodePostings(encoded, withOffsets) {
+    const postings = new Map();
+    const offsets = new Map();
+    const { readVarint, done } = varintReader(encoded);
+    
+    let docId = 0;
+    while (!done()) {
+        docId += readVarint();
+        const positions = new Array(readVarint());
+        const docOffsets = withOffsets ? new Array(positions.length) : null;
+        let position = 0, offset = 0;
+        for (let i = 0; i < positions.length; i++) {
+            position += readVarint();
+            positions[i] = position;
+            if (withOffsets) {
+                offset += readVarint();
+                docOffsets[i] = offset;
+            }
+        }
+        postings.set(docIndexById.get(docId), positions);
+        if (withOffsets) offsets.set(docIndexById.get(docId), docOffsets);
+    }
+    return { postings, offsets };
+}
+
+// Read unsigned LEB128 varints from a base64 string, one at a time
+function varintReader(encoded) {
+    const bytes = Uint8Array.from(atob(encoded), c => c.charCodeAt(0));
+    let offset = 0;
+    const readVarint = () => {
+        let value = 0, scale = 1, byte;
+        do {
+            byte = bytes[offset++];
+            value += (byte & 0x7f) * scale;
+            scale *= 128;
+        } while (byte & 0x80);
+        return value;
+    };
+    return { readVarint, done: () => offset >= bytes.length };
+}
+
+// Postings for one term: docIndex -> word positions (null without positions)
+function getPostings(term) {
+    return decodedTerm(term).postings;
+}
+
+// Character offsets of one term: docIndex -> offsets (empty without offsets)
+function getOffsets(term) {
+    return decodedTerm(term).offsets;
+}
+
+function decodedTerm(term) {
+    let decoded = searchIndex.postings.get(term);
+    if (!decoded) {
+        const raw = searchIndex.terms.get(term);
+        decoded = searchIndex.positional
+            ? decodePostings(raw, searchIndex.hasOffsets)
+            : { postings: new Map(raw.map(index => [index, null])), offsets: new Map() };
+        searchIndex.postings.set(term, decoded);
+    }
+    return decoded;
+}
+
+// Rough number of occurrences of index terms, from the size of their postings
+function estimatedOccurrences(terms) {
+    // base64 is 4 characters per 3 bytes; a position and an offset take about 3 bytes
+    return terms.reduce((total, term) => total + searchIndex.terms.get(term).length, 0) / 4;
+}
+
+// Index terms that contain / start with / end with / equal a query token
+function vocabularyMatches(token, mode) {
+    const key = `${mode}:${token}`;
+    let matches = searchIndex.vocabularyMatches.get(key);
+    if (!matches) {
+        if (mode === 'equals') {
+            matches = searchIndex.terms.has(token) ? [token] : [];
+        } else {
+            matches = searchIndex.vocabulary.filter(term => term[mode](token));
+        }
+        searchIndex.vocabularyMatches.set(key, matches);
+    }
+    return matches;
+}
+
+// Documents whose text could contain a run of query tokens. Inside a match,
+// the first token can end a word, the last can start one and the rest must
+// be whole words at consecutive positions.
+function phraseCandidates(tokens) {
+    const last = tokens.length - 1;
+    const perToken = tokens.map((token, k) => {
+        const mode = last === 0 ? 'includes' : k === 0 ? 'endsWith' : k === last ? 'startsWith' : 'equals';
+        const docs = new Map();
+        vocabularyMatches(token, mode).forEach(term => {
+            getPostings(term).forEach((positions, docIndex) => {
+                if (!docs.has(docIndex)) docs.set(docIndex, new Set());
+                if (positions) positions.forEach(p => docs.get(docIndex).add(p));
+            });
+        });
+        return docs;
+    });
+    
+    const candidates = new Set();
+    perToken[0].forEach((firstPositions, docIndex) => {
+        if (!perToken.every(docs => docs.has(docIndex))) return;
+        if (last === 0 || !searchIndex.positional) {
+            candidates.add(docIndex);
+            return;
+        }
+        for (const p of firstPositions) {
+            if (perToken.every((docs, k) => docs.get(docIndex).has(p + k))) {
+                candidates.add(docIndex);
+                return;
+            }
+        }
+    });
+    return candidates;
+}
+
+// Narrow the documents a query has to be checked against using the index.
+// Every document that can match is returned; searchDocuments() does the
+// exact matching, so results are the same as scanning everything.
+function documentsToSearch(query, exactMatch) {
+    if (!searchIndex) return documentDatabase;
+    
+    const groups = exactMatch ? [query] : query.trim().split(/\s+/);
+    let candidates = null;
+    groups.forEach(group => {
+        const tokens = tokenize(group);
+        if (tokens.length === 0) return;
+        const docs = phraseCandidates(tokens);
+        if (!exactMatch) {
+            // Flexible search also accepts a term found only in the title
+            const term = group.toLowerCase();
+            documentDatabase.forEach((doc, docIndex) => {
+                if ((doc.title || '').toLowerCase().includes(term)) docs.add(docIndex);
+            });
+        }
+        candidates = candidates === null
+            ? docs
+            : new Set([...candidates].filter(docIndex => docs.has(docIndex)));
+    });
+    
+    if (candidates === null) return documentDatabase;
+    return [...candidates].sort((a, b) => a - b).map(docIndex => documentDatabase[docIndex]);
 }
 
 // Perform search
@@ -83,53 +356,132 @@ function performSearch() {
     showLoading();
     
     // Simulate slight delay for better UX
-    setTimeout(() => {
+    setTimeout(async () => {
+        try {
+            await ensureContentLoaded(documentsToSearch(query, exactMatch));
+        } catch (error) {
+            showMessage(`Could not load documents: ${error.message}`);
+            return;
+        }
         const results = searchDocuments(query, caseInsensitive, exactMatch);
         displayResults(results, query);
     }, 300);
 }
 
+// Every match of a search term, from the character offsets in the index
+// (like term_offsets() in search_engine.py): docIndex -> match offsets for
+// the documents in `docs`. Matches start inside an index word containing
+// the term's first token, so only those places are checked against the
+// text. Returns null when the index can't answer (no offsets, no letters or
+// digits in the term) or the term is so common that scanning is faster.
+function termOffsets(term, caseInsensitive, docs) {
+    const tokens = tokenize(term);
+    if (!searchIndex || !searchIndex.hasOffsets || tokens.length === 0 || term.toLowerCase().length !== term.length) {
+        return null;
+    }
+    const first = tokens[0];
+    const words = vocabularyMatches(first, 'includes');
+    if (estimatedOccurrences(words) > MAX_INDEXED_STARTS) return null;
+    const lead = term.toLowerCase().indexOf(first);
+    const width = term.length;
+    // A lone lowercase token is matched by the index words themselves
+    const check = !(caseInsensitive && term === first);
+    
+    const startsByDoc = new Map();
+    words.forEach(word => {
+        const inner = [];
+        for (let k = word.indexOf(first); k !== -1; k = word.indexOf(first, k + 1)) {
+            inner.push(k - lead);
+        }
+        getOffsets(word).forEach((offsets, docIndex) => {
+            if (!docs.has(docIndex) || searchIndex.shifted.has(docIndex)) return;
+            if (!startsByDoc.has(docIndex)) startsByDoc.set(docIndex, []);
+            const starts = startsByDoc.get(docIndex);
+            offsets.forEach(offset => inner.forEach(k => starts.push(offset + k)));
+        });
+    });
+    
+    const found = new Map();
+    startsByDoc.forEach((starts, docIndex) => {
+        if (check) {
+            const content = documentDatabase[docIndex].content;
+            starts = starts.filter(start => {
+                if (start < 0) return false;
+                const text = content.substr(start, width);
+                return (caseInsensitive ? text.toLowerCase() : text) === term;
+            });
+        }
+        // Matches don't overlap, as with a global regex
+        starts.sort((a, b) => a - b);
+        const matches = [];
+        let end = 0;
+        starts.forEach(start => {
+            if (start >= end) {
+                matches.push(start);
+                end = start + width;
+            }
+        });
+        if (matches.length > 0) found.set(docIndex, matches);
+    });
+    return found;
+}
+
+// Offsets of every match of a term in a document's text
+function findAll(content, term, caseInsensitive) {
+    const regex = new RegExp(escapeRegex(term), caseInsensitive ? 'gi' : 'g');
+    const matches = [];
+    let match;
+    while ((match = regex.exec(content)) !== null) {
+        matches.push(match.index);
+    }
+    return matches;
+}
+
 // Search through documents
 function searchDocuments(query, caseInsensitive, exactMatch) {
     const searchQuery = caseInsensitive ? query.toLowerCase() : query;
+    const searchTerms = exactMatch ? [searchQuery] : searchQuery.split(/\s+/);
+    const candidates = documentsToSearch(query, exactMatch);
     const results = [];
     
-    documentDatabase.forEach((doc, index) => {
-        const content = caseInsensitive ? doc.content.toLowerCase() : doc.content;
-        const title = caseInsensitive ? doc.title.toLowerCase() : doc.title;
-        
-        let matches = [];
+    // Match offsets from the index where it has them; null means scan for the term
+    const candidateIndexes = new Set(candidates.map(doc => docIndexById.get(doc.id)));
+    const found = new Map(searchTerms.map(term => [term, termOffsets(term, caseInsensitive, candidateIndexes)]));
+    
+    candidates.forEach(doc => {
+        const docIndex = docIndexById.get(doc.id);
+        const shifted = searchIndex && searchIndex.shifted.has(docIndex);
+        const indexed = term => {
+            const offsets = shifted ? null : found.get(term);
+            return offsets ? offsets.get(docIndex) || [] : null;
+        };
         
-        if (exactMatch) {
-            // Exact phrase match
-            const regex = new RegExp(escapeRegex(searchQuery), caseInsensitive ? 'gi' : 'g');
-            let match;
-            while ((match = regex.exec(doc.content)) !== null) {
-                matches.push(match.index);
-            }
-        } else {
+        if (!exactMatch) {
             // Flexible search - find documents containing the terms
-            const searchTerms = searchQuery.split(/\s+/);
-            let found = searchTerms.every(term => 
-                content.includes(term) || title.includes(term)
-            );
-            
-            if (found) {
-                // Find all occurrences for highlighting
-                searchTerms.forEach(term => {
-                    const regex = new RegExp(escapeRegex(term), caseInsensitive ? 'gi' : 'g');
-                    let match;
-                    while ((match = regex.exec(doc.content)) !== null) {
-                        matches.push(match.index);
-                    }
-                });
-            }
+            const title = caseInsensitive ? doc.title.toLowerCase() : doc.title;
+            let content = null;
+            const present = searchTerms.every(term => {
+                if (title.includes(term)) return true;
+                const offsets = indexed(term);
+                if (offsets) return offsets.length > 0;
+                if (content === null) content = caseInsensitive ? doc.content.toLowerCase() : doc.content;
+                return content.includes(term);
+            });
+            if (!present) return;
         }
         
+        // All occurrences of each term, for highlighting
+        const termMatches = searchTerms.map(term => ({
+            length: term.length,
+            offsets: indexed(term) || findAll(doc.content, term, caseInsensitive)
+        }));
+        const matches = termMatches.flatMap(({ offsets }) => offsets);
+        
         if (matches.length > 0) {
             results.push({
                 ...doc,
                 matches: matches,
+                termMatches: termMatches,
                 relevance: matches.length
             });
         }
@@ -138,7 +490,28 @@ function searchDocuments(query, caseInsensitive, exactMatch) {
     // Sort by relevance (number of matches)
     results.sort((a, b) => b.relevance - a.relevance);
     
-    return results;
+    return collapseDuplicates(results);
+}
+
+// One result per group of near-duplicates (documents with duplicateOf, see
+// near_duplicates.py), like collapse_duplicates() in search_engine.py: the
+// canonical document if it matched, else the best-ranked copy, listing the
+// other matching documents in `duplicates`
+function collapseDuplicates(results) {
+    const groups = new Map();
+    results.forEach(result => {
+        const canonical = result.duplicateOf != null ? result.duplicateOf : result.id;
+        if (!groups.has(canonical)) groups.set(canonical, []);
+        groups.get(canonical).push(result);
+    });
+    
+    const collapsed = [];
+    groups.forEach((members, canonical) => {
+        const shown = members.find(result => result.id === canonical) || members[0];
+        shown.duplicates = members.filter(result => result !== shown);
+        collapsed.push(shown);
+    });
+    return collapsed;
 }
 
 // Display search results
@@ -161,7 +534,8 @@ function displayResults(results, query) {
     
     let html = '';
     results.forEach((result, index) => {
-        const excerpt = getExcerpt(result.content, query, result.matches[0]);
+        const excerpt = getExcerpt(result.content, result.termMatches, result.matches[0]);
+        const matchPage = pageForOffset(result, result.matches[0]);
         const resultId = `result-${index}`;
         const fullContentId = `full-content-${index}`;
         const aiExplainId = `ai-explain-${index}`;
@@ -179,7 +553,7 @@ function displayResults(results, query) {
                 <div class="result-excerpt">${excerpt}</div>
                 
                 <div class="result-full-content collapsed" id="${fullContentId}">
-                    <div class="full-text">${escapeHtml(result.content).replace(/\n/g, '<br>')}</div>
+                    <div class="full-text" data-result="${index}"></div>
                 </div>
                 
                 <div class="result-actions">
@@ -198,7 +572,9 @@ function displayResults(results, query) {
                 <div class="result-footer">
                     <span>Source: ${escapeHtml(result.source)}</span>
                     ${result.date ? `<span>Date: ${escapeHtml(result.date)}</span>` : ''}
-                    ${result.page ? `<span>Page: ${escapeHtml(result.page)}</span>` : ''}
+                    ${matchPage ? `<span>Page: ${matchPage} of ${result.pageOffsets.length}</span>`
+                        : result.page ? `<span>Page: ${escapeHtml(result.page)}</span>` : ''}
+                    ${result.duplicates.length ? `<span>Also filed as: ${result.duplicates.map(doc => escapeHtml(doc.source)).join('; ')}</span>` : ''}
                 </div>
             </div>
         `;
@@ -210,25 +586,60 @@ function displayResults(results, query) {
     window.currentSearchResults = results;
 }
 
-// Get an excerpt from the content with highlighted search terms
-function getExcerpt(content, query, matchPosition = 0) {
+// 1-based page containing a character offset, from the page offsets recorded
+// at extraction time (null for documents built without them)
+function pageForOffset(doc, offset) {
+    const offsets = doc.pageOffsets;
+    if (!offsets || offsets.length === 0) return null;
+    
+    // Last page starting at or before offset
+    return Math.max(1, firstAbove(offsets, offset));
+}
+
+// Index of the first value in a sorted array that is greater than target
+function firstAbove(values, target) {
+    let low = 0, high = values.length;
+    while (low < high) {
+        const mid = (low + high) >> 1;
+        if (values[mid] <= target) low = mid + 1;
+        else high = mid;
+    }
+    return low;
+}
+
+// Get an excerpt from the content with the matches in it highlighted.
+// termMatches are a result's match offsets per search term, so only the
+// matches inside the excerpt are looked at, however long the document is.
+function getExcerpt(content, termMatches, matchPosition = 0) {
     const excerptLength = 300;
     const start = Math.max(0, matchPosition - 100);
     const end = Math.min(content.length, start + excerptLength);
     
-    let excerpt = content.substring(start, end);
+    const spans = [];
+    termMatches.forEach(({ length, offsets }) => {
+        // Matches that start before the excerpt can still reach into it
+        for (let i = firstAbove(offsets, start - length); i < offsets.length && offsets[i] < end; i++) {
+            spans.push([offsets[i], length]);
+        }
+    });
+    spans.sort((a, b) => a[0] - b[0]);
+    
+    let excerpt = '';
+    let cursor = start;
+    spans.forEach(([offset, length]) => {
+        const stop = Math.min(offset + length, end);
+        if (stop <= cursor) return;
+        offset = Math.max(offset, cursor);
+        excerpt += escapeHtml(content.substring(cursor, offset));
+        excerpt += `<mark>${escapeHtml(content.substring(offset, stop))}</mark>`;
+        cursor = stop;
+    });
+    excerpt += escapeHtml(content.substring(cursor, end));
     
     // Add ellipsis if truncated
     if (start > 0) excerpt = '...' + excerpt;
     if (end < content.length) excerpt = excerpt + '...';
     
-    // Highlight search terms
-    const terms = query.toLowerCase().split(/\s+/);
-    terms.forEach(term => {
-        const regex = new RegExp(`(${escapeRegex(term)})`, 'gi');
-        excerpt = excerpt.replace(regex, '<mark>$1</mark>');
-    });
-    
     return excerpt;
 }
 
@@ -349,6 +760,13 @@ function toggleFullContent(contentId, resultId) {
     const textEl = document.getElementById(`expand-text-${resultId}`);
     const isCollapsed = content.classList.contains('collapsed');
     
+    // The full text is only rendered the first time it is opened
+    const fullText = content.querySelector('.full-text');
+    if (isCollapsed && !fullText.innerHTML) {
+        const result = window.currentSearchResults[fullText.dataset.result];
+        fullText.innerHTML = escapeHtml(result.content).replace(/\n/g, '<br>');
+    }
+    
     content.classList.toggle('collapsed');
     textEl.textContent = isCollapsed ? 'Hide Full Document' : 'Read Full Document';
 }
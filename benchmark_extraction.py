@@ -0,0 +1,212 @@
+"""
+Text Extraction Benchmark for the Epstein Documents Extractor
+
+Runs every PDF of a fixture corpus through each extraction backend
+(pdfplumber, PDFium and "auto", see pdf_backends.py) in this process and
+reports files/s, pages/s and per-page latency, how many pages "auto" sent
+to its pdfplumber fallback, and how closely each backend's words match
+pdfplumber's.
+
+With --ocr, scanned copies of the fixtures are also OCRed (see ocr.py) by
+a pool of extraction workers, twice: once with an empty OCR cache and once
+with it full, reporting pages/s for each.
+
+The fixture corpus is epstein_documents/pdfs/ if it has PDFs; otherwise a
+synthetic one shaped like our court filings is generated in a temporary
+directory.
+
+Usage:
+    python benchmark_extraction.py                      # epstein_documents/pdfs, or synthetic
+    python benchmark_extraction.py --pdfs some/dir --limit 50
+    python benchmark_extraction.py --synthetic 200      # always use 200 generated PDFs
+    python benchmark_extraction.py --ocr 20 --workers 8   # OCR 20 scanned fixtures too
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+
+from extraction_pool import ExtractionPool
+from ocr import PageOcr, tesseract_available
+from pdf_backends import available_backends, open_backend
+from process_all_pdfs import extract_document, extract_document_timed
+
+FILING_WORDS = [
+    "the", "of", "and", "to", "in", "that", "plaintiff", "defendant", "court",
+    "motion", "exhibit", "deposition", "counsel", "order", "judge", "witness",
+    "testimony", "evidence", "maxwell", "giuffre", "epstein", "flight", "sealed",
+    "redacted", "filed", "pursuant", "respectfully", "submitted", "declaration"
+]
+
+def pdf_string(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_fixture_pdf(path, pages):
+    """Write a minimal text PDF (Helvetica, one line per entry) with the given pages of lines"""
+    objects = [b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>", None]
+    kids = []
+    for lines in pages:
+        stream = ("BT /F1 10 Tf 50 750 Td 12 TL\n"
+                  + "".join(f"({pdf_string(line)}) '\n" for line in lines) + "ET").encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+                       b"/Resources << /Font << /F1 1 0 R >> >> >>" % (len(objects)))
+        kids.append(len(objects))
+    objects[1] = (b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % kid for kid in kids)
+                  + b"] /Count %d >>" % len(kids))
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, len(objects), xref)
+    Path(path).write_bytes(bytes(out))
+
+def generate_fixtures(directory, count, seed=42):
+    """Synthetic filings: 1-12 pages of 50 lines each, with a case header per page"""
+    rng = random.Random(seed)
+    paths = []
+    for number in range(1, count + 1):
+        num_pages = rng.randint(1, 12)
+        pages = []
+        for page in range(1, num_pages + 1):
+            lines = [f"Case 1:15-cv-07433-LAP Document {number} Filed 01/03/24 Page {page} of {num_pages}"]
+            lines += [" ".join(rng.choice(FILING_WORDS) for _ in range(12)) for _ in range(50)]
+            pages.append(lines)
+        path = Path(directory) / f"Synthetic_{number}_Exhibit.pdf"
+        write_fixture_pdf(path, pages)
+        paths.append(path)
+    return paths
+
+def scan_fixture(pdf_file, path, dpi=150):
+    """Write an image-only copy of pdf_file, like a scanned filing"""
+    with open_backend("pdfium", pdf_file) as reader:
+        images = [reader.render(index, dpi).convert("RGB") for index in range(len(reader))]
+    images[0].save(path, save_all=True, append_images=images[1:], resolution=dpi)
+    return Path(path)
+
+def word_agreement(text, reference):
+    """Share of reference words found, in order-insensitive multiset terms"""
+    if not reference:
+        return 1.0 if not text else 0.0
+    counts = {}
+    for word in text.split():
+        counts[word] = counts.get(word, 0) + 1
+    matched = 0
+    reference_words = reference.split()
+    for word in reference_words:
+        if counts.get(word):
+            counts[word] -= 1
+            matched += 1
+    return matched / len(reference_words)
+
+def run_backend(backend, pdf_files):
+    """Extract every file with one backend; returns timings and texts"""
+    texts = []
+    page_timings = []
+    started = time.perf_counter()
+    for pdf_file in pdf_files:
+        extracted = extract_document(pdf_file, page_timings, backend=backend)
+        texts.append(extracted["content"] if extracted else "")
+    elapsed = time.perf_counter() - started
+    return elapsed, page_timings, texts
+
+def run_ocr(pdf_files, ocr, workers):
+    """OCR every file with a pool of workers; returns (seconds, page_timings)"""
+    page_timings = []
+    started = time.perf_counter()
+    with ExtractionPool(partial(extract_document_timed, ocr=ocr), workers) as pool:
+        for _, result in pool.imap(pdf_files):
+            page_timings += result["page_timings"]
+    return time.perf_counter() - started, page_timings
+
+def benchmark_ocr(pdf_files, count, workers, directory):
+    """Print OCR pages/s for scanned copies of the first `count` fixtures, cold and cached"""
+    print(f"\n🔍 OCR: {count} scanned fixtures, {workers} workers")
+    if not tesseract_available() or "pdfium" not in available_backends():
+        print("   ⚠️  Skipped: needs tesseract and pypdfium2")
+        return
+    scans = [scan_fixture(pdf_file, Path(directory) / f"scan_{number}.pdf")
+             for number, pdf_file in enumerate(pdf_files[:count], 1)]
+    ocr = PageOcr(cache_dir=Path(directory) / "ocr_cache", threads=1 if workers > 1 else (os.cpu_count() or 1))
+    print(f"   {'run':<12}{'pages':>8}{'pages/s':>10}{'p50 ms':>9}{'ocr':>6}{'cached':>8}")
+    for run in ("cold", "cached"):
+        elapsed, page_timings = run_ocr(scans, ocr, workers)
+        latencies = sorted(seconds * 1000 for _, seconds in page_timings)
+        ocred = sum(1 for used, _ in page_timings if used == "ocr")
+        cached = sum(1 for used, _ in page_timings if used == "ocr-cache")
+        print(f"   {run:<12}{len(page_timings):>8}{len(page_timings) / elapsed:>10.2f}"
+              f"{statistics.median(latencies or [0]):>9.1f}{ocred:>6}{cached:>8}")
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark the PDF text extraction backends")
+    parser.add_argument("--pdfs", default="epstein_documents/pdfs", help="fixture corpus directory")
+    parser.add_argument("--limit", type=int, default=0, help="use only the first N PDFs")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="benchmark N generated PDFs instead of a directory")
+    parser.add_argument("--ocr", type=int, default=0,
+                        help="also OCR scanned copies of the first N PDFs (needs tesseract)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="extraction processes for --ocr (default: 0 = one per CPU core)")
+    args = parser.parse_args()
+
+    print("\n⏱️  EXTRACTION BENCHMARK")
+    print("="*60)
+
+    temp_dir = None
+    pdf_files = [] if args.synthetic else sorted(Path(args.pdfs).glob("*.pdf"))
+    if not pdf_files:
+        temp_dir = tempfile.TemporaryDirectory()
+        pdf_files = generate_fixtures(temp_dir.name, args.synthetic or 100)
+        print(f"Corpus: {len(pdf_files)} synthetic filings")
+    else:
+        print(f"Corpus: {args.pdfs}")
+    if args.limit:
+        pdf_files = pdf_files[:args.limit]
+    total_mb = sum(pdf_file.stat().st_size for pdf_file in pdf_files) / 1e6
+    print(f"   {len(pdf_files)} PDFs, {total_mb:.1f} MB")
+
+    backends = ["pdfplumber"] + [name for name in ("pdfium", "auto")
+                                 if name == "auto" or name in available_backends()]
+    results = {}
+    for backend in backends:
+        results[backend] = run_backend(backend, pdf_files)
+
+    reference = results["pdfplumber"][2]
+    print(f"\n   {'backend':<12}{'files/s':>10}{'pages/s':>10}{'MB/s':>8}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'fallback':>10}{'match':>8}")
+    for backend in backends:
+        elapsed, page_timings, texts = results[backend]
+        latencies = sorted(seconds * 1000 for _, seconds in page_timings)
+        p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else 0.0
+        fallback = sum(1 for used, _ in page_timings if used == "pdfplumber") if backend == "auto" else 0
+        agreement = statistics.mean(word_agreement(text, ref) for text, ref in zip(texts, reference))
+        print(f"   {backend:<12}{len(pdf_files) / elapsed:>10.1f}{len(page_timings) / elapsed:>10.1f}"
+              f"{total_mb / elapsed:>8.2f}{statistics.median(latencies or [0]):>9.2f}{p95:>9.2f}"
+              f"{fallback:>10}{agreement:>8.1%}")
+
+    speedup = results["pdfplumber"][0] / results["auto"][0]
+    print(f"\n⚡ auto is {speedup:.1f}x pdfplumber on this corpus")
+
+    if args.ocr:
+        with tempfile.TemporaryDirectory() as scan_dir:
+            benchmark_ocr(pdf_files, args.ocr, args.workers if args.workers > 0 else (os.cpu_count() or 1),
+                          scan_dir)
+
+    if temp_dir is not None:
+        temp_dir.cleanup()
+
+if __name__ == "__main__":
+    main()
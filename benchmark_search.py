@@ -0,0 +1,239 @@
+"""
+Search Benchmark for the Epstein Documents Search Tool
+
+Generates a synthetic corpus shaped like ours (document count and average
+length from epstein_documents/STATISTICS.txt, scaled up), runs a fixed,
+seeded query set through search_engine.SearchEngine and reports p50/p99
+latency and queries/sec for each search mode.
+
+With --sqlite, the corpus is also written both as documents.json and as a
+SQLite FTS5 database (documents.db, see sqlite_corpus.py), and the two are
+compared: build time, file size, time to open, and query latency of the
+JSON full scan against FTS5.
+
+Usage:
+    python benchmark_search.py                 # 10x the current collection
+    python benchmark_search.py --scale 1       # current size
+    python benchmark_search.py --scan          # also time the full-scan path
+    python benchmark_search.py --sqlite --scale 1   # JSON scan vs SQLite FTS5, current size
+    python benchmark_search.py --sqlite --scale 10  # ... and at 10x
+"""
+
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from corpus_writers import DocumentsJsonWriter, SqliteCorpusWriter
+from search_engine import SearchEngine
+from sqlite_corpus import SqliteCorpus
+
+# Current collection, from epstein_documents/STATISTICS.txt
+BASE_DOCUMENTS = 275
+BASE_AVERAGE_CHARS = 57_833
+
+COMMON_WORDS = [
+    "the", "of", "and", "to", "in", "a", "that", "is", "was", "for", "on", "by",
+    "with", "as", "at", "not", "be", "this", "it", "from", "or", "had", "plaintiff",
+    "defendant", "court", "case", "document", "filed", "page", "motion", "exhibit",
+    "deposition", "counsel", "order", "judge", "witness", "testimony", "evidence",
+    "maxwell", "giuffre", "epstein", "flight", "island", "sealed", "redacted",
+]
+SYLLABLES = ["ba", "ker", "son", "ri", "ton", "el", "ma", "de", "lo", "vin",
+             "sta", "mer", "gan", "ter", "hol", "ly", "wood", "ford", "an", "ne"]
+
+def build_vocabulary(rng, size=40_000):
+    """Common legal words followed by pseudo-words, in frequency-rank order"""
+    vocabulary = list(COMMON_WORDS)
+    seen = set(vocabulary)
+    while len(vocabulary) < size:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            vocabulary.append(word)
+    return vocabulary
+
+def generate_corpus(num_documents, average_chars, seed=42):
+    """Synthetic documents with Zipf-distributed words"""
+    rng = random.Random(seed)
+    vocabulary = build_vocabulary(rng)
+    cumulative = []
+    total = 0.0
+    for rank in range(1, len(vocabulary) + 1):
+        total += 1 / rank ** 1.05
+        cumulative.append(total)
+
+    documents = []
+    for doc_id in range(1, num_documents + 1):
+        # Roughly 7 characters per word including the separator
+        num_words = max(50, int(rng.expovariate(1 / average_chars) / 7))
+        words = rng.choices(vocabulary, cum_weights=cumulative, k=num_words)
+        lines = [" ".join(words[i:i + 12]) for i in range(0, len(words), 12)]
+        content = "\n".join(line.capitalize() for line in lines)
+        # A page every 50 lines, as process_all_pdfs.py records them
+        page_offsets = [0]
+        for i in range(50, len(lines), 50):
+            page_offsets.append(page_offsets[-1] + sum(len(line) + 1 for line in lines[i - 50:i]))
+        documents.append({
+            "id": doc_id,
+            "title": f"Exhibit {doc_id}",
+            "source": f"Synthetic Case - Entry #{doc_id}",
+            "date": "Various",
+            "page": "Multiple",
+            "content": content,
+            "filename": f"synthetic_{doc_id}.pdf",
+            "pageOffsets": page_offsets
+        })
+    return documents, vocabulary
+
+def build_queries(documents, vocabulary, seed=7):
+    """Fixed query set: frequent, mid-frequency and rare words, word pairs,
+    partial words and phrases taken from the corpus"""
+    rng = random.Random(seed)
+    queries = []
+    queries += [rng.choice(vocabulary[:50]) for _ in range(20)]
+    queries += [rng.choice(vocabulary[500:5000]) for _ in range(20)]
+    queries += [rng.choice(vocabulary[20000:]) for _ in range(20)]
+    queries += [f"{rng.choice(vocabulary[:2000])} {rng.choice(vocabulary[:2000])}" for _ in range(20)]
+    queries += [rng.choice(vocabulary[100:5000])[1:-1] for _ in range(10)]
+    for _ in range(20):
+        words = rng.choice(documents)["content"].split()
+        start = rng.randrange(max(1, len(words) - 3))
+        queries.append(" ".join(words[start:start + 3]))
+    return queries
+
+MODES = [
+    ("flexible", {"case_insensitive": True, "exact": False}),
+    ("exact", {"case_insensitive": True, "exact": True}),
+    ("case-sensitive", {"case_insensitive": False, "exact": False}),
+    ("bm25", {"case_insensitive": True, "exact": False, "rank": "bm25"}),
+]
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def run_benchmark(engine, queries, repeat):
+    """Time every query in every mode; the first pass warms caches"""
+    rows = []
+    for name, options in MODES:
+        for query in queries:
+            engine.search(query, **options)
+
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for query in queries:
+                t0 = time.perf_counter()
+                engine.search(query, **options)
+                latencies.append((time.perf_counter() - t0) * 1000)
+        elapsed = time.perf_counter() - started
+
+        rows.append((name, statistics.median(latencies), percentile(latencies, 0.99),
+                     len(latencies) / elapsed))
+    return rows
+
+def print_rows(label, rows):
+    print(f"\n{label}")
+    print(f"   {'mode':<16}{'p50 ms':>10}{'p99 ms':>10}{'queries/s':>12}")
+    for name, p50, p99, qps in rows:
+        print(f"   {name:<16}{p50:>10.2f}{p99:>10.2f}{qps:>12.1f}")
+
+def time_queries(search, queries, repeat):
+    """p50 and p99 latency in ms and queries/s of search(query), after a warm-up pass"""
+    for query in queries:
+        search(query)
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            t0 = time.perf_counter()
+            search(query)
+            latencies.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - started
+    return statistics.median(latencies), percentile(latencies, 0.99), len(latencies) / elapsed
+
+def compare_sqlite(documents, engine, queries, repeat):
+    """documents.json (scanned, or with its index) against documents.db with FTS5"""
+    with tempfile.TemporaryDirectory() as directory:
+        json_file = Path(directory) / "documents.json"
+        db_file = Path(directory) / "documents.db"
+        builds = {}
+        for name, writer_class, path in (("json", DocumentsJsonWriter, json_file),
+                                         ("sqlite", SqliteCorpusWriter, db_file)):
+            t0 = time.perf_counter()
+            writer = writer_class(path, {"source": "benchmark"})
+            for doc in documents:
+                writer.add(doc)
+            writer.close()
+            builds[name] = time.perf_counter() - t0
+
+        # Opening: what a fresh process pays before its first query
+        t0 = time.perf_counter()
+        with open(json_file, 'r', encoding='utf-8') as f:
+            loaded = json.load(f)["documents"]
+        scan_engine = SearchEngine(loaded, engine.index, use_index=False)
+        json_open = time.perf_counter() - t0
+        indexed_engine = SearchEngine(loaded, engine.index)
+        t0 = time.perf_counter()
+        corpus = SqliteCorpus(db_file)
+        sqlite_open = time.perf_counter() - t0
+
+        rows = [
+            ("json scan", builds["json"], json_file, json_open,
+             time_queries(lambda q: scan_engine.search(q, rank="bm25")[:10], queries, repeat)),
+            ("json + index", builds["json"], json_file, json_open,
+             time_queries(lambda q: indexed_engine.search(q, rank="bm25")[:10], queries, repeat)),
+            ("sqlite fts5", builds["sqlite"], db_file, sqlite_open,
+             time_queries(lambda q: corpus.search(q, limit=10), queries, repeat)),
+        ]
+        corpus.close()
+
+        print("\nJSON vs SQLite FTS5 (top 10 by BM25; the index build for json + index isn't counted)")
+        print(f"   {'path':<14}{'build s':>9}{'MB':>8}{'open ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'queries/s':>12}")
+        for name, build, path, opened, (p50, p99, qps) in rows:
+            print(f"   {name:<14}{build:>9.1f}{path.stat().st_size / 1e6:>8.1f}{opened * 1000:>10.1f}"
+                  f"{p50:>10.2f}{p99:>10.2f}{qps:>12.1f}")
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark search_engine.py on a synthetic corpus")
+    parser.add_argument("--scale", type=float, default=10,
+                        help=f"corpus size relative to the current {BASE_DOCUMENTS} documents (default: 10)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed passes over the query set")
+    parser.add_argument("--scan", action="store_true",
+                        help="also benchmark the full-scan path (no index), like the site without one")
+    parser.add_argument("--sqlite", action="store_true",
+                        help="also compare documents.json with a SQLite FTS5 build of the corpus")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    num_documents = max(1, int(BASE_DOCUMENTS * args.scale))
+    print("\n⏱️  SEARCH BENCHMARK")
+    print("="*60)
+
+    t0 = time.perf_counter()
+    documents, vocabulary = generate_corpus(num_documents, BASE_AVERAGE_CHARS, args.seed)
+    total_chars = sum(len(doc["content"]) for doc in documents)
+    print(f"Corpus: {num_documents:,} documents, {total_chars:,} characters "
+          f"({args.scale:g}x, generated in {time.perf_counter() - t0:.1f}s)")
+
+    t0 = time.perf_counter()
+    engine = SearchEngine(documents)
+    print(f"Index: {len(engine.vocabulary):,} terms, built in {time.perf_counter() - t0:.1f}s")
+
+    queries = build_queries(documents, vocabulary)
+    print(f"Queries: {len(queries)} x {args.repeat} passes per mode")
+
+    print_rows("Indexed search", run_benchmark(engine, queries, args.repeat))
+    if args.scan:
+        scan_engine = SearchEngine(documents, engine.index, use_index=False)
+        print_rows("Full scan", run_benchmark(scan_engine, queries, args.repeat))
+    if args.sqlite:
+        compare_sqlite(documents, engine, queries, args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Content-Addressed PDF Store for the Epstein Documents Downloaders
+
+The same filing often appears under several dockets and file names. Every
+downloaded PDF is filed under its SHA-256 in epstein_documents/blobs/, and
+the human-readable names in epstein_documents/pdfs/ are hard links to
+those blobs, so a PDF that shows up under three names takes the disk
+space of one. process_all_pdfs.py then extracts and indexes each distinct
+PDF once, however many names it has.
+
+Which docket entry maps to which blob is recorded in download_log.jsonl
+(the "sha256" of each record).
+
+Usage:
+    python blob_store.py     # file existing PDFs (e.g. from the Selenium downloaders) into the store
+"""
+
+import hashlib
+import os
+import shutil
+from pathlib import Path
+
+BLOBS_DIR = "epstein_documents/blobs"
+
+def sha256_file(path):
+    """Return the hex SHA-256 of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class BlobStore:
+    """PDFs stored once each, under blobs/<first two hex digits>/<sha256>.pdf"""
+
+    def __init__(self, root=BLOBS_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def blob_path(self, sha256):
+        return self.root / sha256[:2] / f"{sha256}.pdf"
+
+    def adopt(self, path):
+        """File the PDF at path into the store, leaving path as a link to its blob
+
+        Returns (sha256, duplicate); duplicate is True if the store already
+        held this content, in which case path now shares the existing blob.
+        """
+        path = Path(path)
+        sha256 = sha256_file(path)
+        blob = self.blob_path(sha256)
+
+        if not blob.exists():
+            blob.parent.mkdir(exist_ok=True)
+            try:
+                os.link(path, blob)
+                return sha256, False
+            except FileExistsError:
+                pass  # Another download of the same PDF got there first
+            except OSError:
+                # No hard links on this filesystem; keep a copy instead
+                tmp_path = blob.with_name(blob.name + ".tmp")
+                shutil.copy2(path, tmp_path)
+                os.replace(tmp_path, blob)
+                return sha256, False
+
+        if not os.path.samefile(path, blob):
+            tmp_path = path.with_name(path.name + ".link")
+            try:
+                os.link(blob, tmp_path)
+                os.replace(tmp_path, path)
+            except OSError:
+                pass  # Can't link; the duplicate copy stays where it is
+        return sha256, True
+
+    def adopt_dir(self, pdfs_dir):
+        """Adopt every PDF in a directory; returns (files, duplicates)"""
+        files = duplicates = 0
+        for pdf_file in sorted(Path(pdfs_dir).glob("*.pdf")):
+            # Already a link to a blob
+            if pdf_file.stat().st_nlink > 1:
+                continue
+            _, duplicate = self.adopt(pdf_file)
+            files += 1
+            duplicates += duplicate
+        return files, duplicates
+
+def main():
+    """Main function"""
+    pdfs_dir = Path("epstein_documents/pdfs")
+    print("\n🧬 CONTENT-ADDRESSED PDF STORE")
+    print("="*60)
+    if not pdfs_dir.exists():
+        print(f"❌ Directory not found: {pdfs_dir}")
+        return
+
+    store = BlobStore()
+    files, duplicates = store.adopt_dir(pdfs_dir)
+    print(f"Filed {files} new PDFs into {store.root}")
+    print(f"   {duplicates} of them were duplicates of PDFs already stored")
+
+if __name__ == "__main__":
+    main()
@@ -33,8 +33,18 @@ async function sendMessage() {
     const thinkingId = showChatMessage('ai', '🤔 Analyzing documents...');
     
     try {
-        // Prepare context from documents
-        const context = prepareDocumentContext(message);
+        // Prepare context from the best-matching passages, falling back to
+        // a document search if there is no passage index
+        await loadPassageIndex();
+        const passages = passageIndex ? topPassages(message) : [];
+        let context;
+        if (passages.length > 0) {
+            await ensureContentLoaded(passages.map(passage => passage.doc));
+            context = preparePassageContext(passages);
+        } else {
+            await ensureContentLoaded(documentsToSearch(message, false));
+            context = prepareDocumentContext(message);
+        }
         
         // Prepare messages for API
         const messages = [
@@ -99,6 +109,90 @@ ${context}`
     }
 }
 
+// Passage index (see passage_index.py): documents split into overlapping
+// passages with per-passage term counts, loaded the first time chat is used
+let passageIndex = null;
+let passageIndexLoad = null;
+const BM25_K1 = 1.2;
+const BM25_B = 0.75;
+
+function loadPassageIndex() {
+    // Wait for the documents, so the index can be checked against them
+    if (!passageIndexLoad && documentDatabase.length > 0) {
+        passageIndexLoad = (async () => {
+            const url = corpusManifest
+                ? `${CORPUS_DIR}/passages.json.gz?v=${corpusManifest.build}`
+                : 'passages.json.gz';
+            try {
+                const response = await fetch(url);
+                if (!response.ok) return;
+                const index = await readGzippedJson(response);
+                // A passage index from another build would cite the wrong
+                // documents; without one the chat scans documents instead
+                if (index.version !== 1 || index.documents !== documentDatabase.length ||
+                    !index.docs.every(docId => docIndexById.has(docId))) {
+                    console.warn('Passage index does not match the loaded documents, ignoring it.');
+                    return;
+                }
+                index.terms = new Map(Object.entries(index.terms));
+                index.averageLength = index.lengths.reduce((sum, length) => sum + length, 0) /
+                    Math.max(index.lengths.length, 1);
+                passageIndex = index;
+            } catch (error) {
+                console.warn('Could not load passage index:', error.message);
+            }
+        })();
+    }
+    return passageIndexLoad;
+}
+
+// Top passages for a question by BM25, skipping passages that overlap a
+// better one from the same document
+function topPassages(question, limit = 5) {
+    const total = passageIndex.docs.length;
+    const scores = new Map();
+    new Set(tokenize(question)).forEach(term => {
+        const encoded = passageIndex.terms.get(term);
+        if (!encoded) return;
+        
+        const postings = [];
+        const { readVarint, done } = varintReader(encoded);
+        let passage = 0;
+        while (!done()) {
+            passage += readVarint();
+            postings.push([passage, readVarint()]);
+        }
+        
+        const idf = Math.log(1 + (total - postings.length + 0.5) / (postings.length + 0.5));
+        postings.forEach(([passage, tf]) => {
+            const norm = 1 - BM25_B + BM25_B * passageIndex.lengths[passage] / passageIndex.averageLength;
+            scores.set(passage, (scores.get(passage) || 0) + idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm));
+        });
+    });
+    
+    const ranked = [...scores.keys()].sort((a, b) => scores.get(b) - scores.get(a) || a - b);
+    const results = [];
+    for (const passage of ranked) {
+        const doc = documentDatabase[docIndexById.get(passageIndex.docs[passage])];
+        const start = passageIndex.starts[passage];
+        const end = passageIndex.ends[passage];
+        if (!doc || results.some(r => r.doc === doc && r.start < end && start < r.end)) continue;
+        
+        results.push({ doc, start, end, page: passageIndex.pages[passage] || null });
+        if (results.length === limit) break;
+    }
+    return results;
+}
+
+function preparePassageContext(passages) {
+    let context = `Relevant passages found:\n\n`;
+    passages.forEach(({ doc, start, end, page }) => {
+        const citation = page ? `${doc.source}, page ${page}` : doc.source;
+        context += `[${citation}] ${doc.title}\n...${doc.content.substring(start, end)}...\n\n`;
+    });
+    return context;
+}
+
 function prepareDocumentContext(query) {
     // Search documents for relevant context
     if (!documentDatabase || documentDatabase.length === 0) {
@@ -115,8 +209,12 @@ function prepareDocumentContext(query) {
     // Prepare context
     let context = `Relevant documents found:\n\n`;
     relevantDocs.forEach(doc => {
-        const excerpt = doc.content.substring(0, 500);
-        context += `[${doc.source}] ${doc.title}\n${excerpt}...\n\n`;
+        // Take the excerpt around the first match rather than the start of the document
+        const start = Math.max(0, doc.matches[0] - 150);
+        const excerpt = doc.content.substring(start, start + 500);
+        const page = pageForOffset(doc, doc.matches[0]);
+        const citation = page ? `${doc.source}, page ${page}` : doc.source;
+        context += `[${citation}] ${doc.title}\n${start > 0 ? '...' : ''}${excerpt}...\n\n`;
     });
     
     return context;
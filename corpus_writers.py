@@ -0,0 +1,211 @@
+"""
+Corpus Writers for the Epstein Documents Search Tool
+
+Output formats for the document database built by process_all_pdfs.py.
+Every writer takes documents one at a time through add() and finishes the
+output in close(), so memory use doesn't grow with the size of the corpus.
+"""
+
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+class DocumentsJsonWriter:
+    """Stream documents.json to disk one document entry at a time
+
+    The layout matches json.dump(..., indent=2) so app.js loads it exactly
+    as before. The only difference is that totalDocuments, which isn't
+    known until the end, is written after the documents array.
+    """
+
+    def __init__(self, output_file, envelope):
+        self.output_path = Path(output_file)
+        self.tmp_path = self.output_path.with_name(self.output_path.name + ".tmp")
+        self.count = 0
+
+        self.file = open(self.tmp_path, 'w', encoding='utf-8')
+        header = json.dumps(envelope, indent=2, ensure_ascii=False)
+        self.file.write(header[:-2] + ',\n  "documents": [')
+
+    def add(self, doc):
+        """Write one document entry"""
+        entry = json.dumps(doc, indent=2, ensure_ascii=False)
+        self.file.write(",\n" if self.count else "\n")
+        # JSON strings can't contain raw newlines, so this only indents structure
+        self.file.write("\n".join("    " + line for line in entry.split("\n")))
+        self.count += 1
+
+    def close(self):
+        """Finish the envelope and move the file into place"""
+        self.file.write("\n  ]" if self.count else "]")
+        self.file.write(f',\n  "totalDocuments": {self.count}\n}}')
+        self.file.close()
+        os.replace(self.tmp_path, self.output_path)
+
+# Per-document fields stored in the shards rather than the manifest
+SHARD_FIELDS = ("content", "pageOffsets")
+
+class ShardedCorpusWriter:
+    """Write a small metadata manifest plus gzipped content shards
+
+    corpus/manifest.json holds everything app.js needs to list documents
+    (title, source, filename, length, ...) and which shard holds each
+    document's text. Content lives in corpus/shard-NNN.json.gz files of
+    roughly shard_chars characters each, fetched by the browser on demand,
+    together with each document's page offsets.
+    """
+
+    def __init__(self, output_dir, envelope, shard_chars=2_000_000):
+        self.output_path = Path(output_dir)
+        self.tmp_path = self.output_path.with_name(self.output_path.name + ".tmp")
+        self.envelope = envelope
+        self.shard_chars = shard_chars
+        self.count = 0
+
+        if self.tmp_path.exists():
+            shutil.rmtree(self.tmp_path)
+        self.tmp_path.mkdir(parents=True)
+
+        self.documents = []
+        self.shards = []
+        self.buffer = []
+        self.buffer_chars = 0
+
+    def add(self, doc):
+        """Record a document's metadata and buffer its content for the current shard"""
+        entry = {key: value for key, value in doc.items() if key not in SHARD_FIELDS}
+        entry["length"] = len(doc["content"])
+        entry["shard"] = len(self.shards)
+        self.documents.append(entry)
+
+        self.buffer.append({"id": doc["id"], **{key: doc[key] for key in SHARD_FIELDS if key in doc}})
+        self.buffer_chars += len(doc["content"])
+        self.count += 1
+        if self.buffer_chars >= self.shard_chars:
+            self.flush_shard()
+
+    def flush_shard(self):
+        """Compress the buffered documents into the next shard file"""
+        if not self.buffer:
+            return
+        filename = f"shard-{len(self.shards):03d}.json.gz"
+        data = json.dumps(self.buffer, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        with gzip.open(self.tmp_path / filename, 'wb', compresslevel=9) as f:
+            f.write(data)
+        self.shards.append({
+            "file": filename,
+            "documents": len(self.buffer),
+            "bytes": (self.tmp_path / filename).stat().st_size
+        })
+        self.buffer = []
+        self.buffer_chars = 0
+
+    def close(self):
+        """Write the manifest and swap the new build into place"""
+        self.flush_shard()
+        manifest = dict(self.envelope)
+        manifest.update({
+            "format": "sharded",
+            "build": datetime.now().strftime("%Y%m%d%H%M%S"),
+            "totalDocuments": self.count,
+            "shards": self.shards,
+            "documents": self.documents
+        })
+        with open(self.tmp_path / "manifest.json", 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+
+        if self.output_path.exists():
+            shutil.rmtree(self.output_path)
+        os.replace(self.tmp_path, self.output_path)
+
+# Fields with a column of their own in documents.db; the rest go in metadata
+SQLITE_COLUMNS = ("id", "title", "source", "filename")
+
+SQLITE_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE documents (
+    id INTEGER PRIMARY KEY,
+    title TEXT,
+    source TEXT,
+    filename TEXT,
+    length INTEGER,
+    metadata TEXT
+);
+CREATE TABLE pages (
+    id INTEGER PRIMARY KEY,
+    doc_id INTEGER NOT NULL REFERENCES documents(id),
+    page INTEGER NOT NULL,
+    start INTEGER NOT NULL,
+    title TEXT,
+    text TEXT
+);
+CREATE INDEX pages_by_doc ON pages(doc_id, page);
+CREATE VIRTUAL TABLE pages_fts USING fts5(
+    title, text,
+    content='pages', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='3'
+);
+"""
+
+def page_spans(doc):
+    """(start, end) of each page's text in doc["content"], from its pageOffsets"""
+    content_length = len(doc["content"])
+    offsets = doc.get("pageOffsets") or [0]
+    return [(start, offsets[n + 1] if n + 1 < len(offsets) else content_length)
+            for n, start in enumerate(offsets)]
+
+class SqliteCorpusWriter:
+    """Write documents into a SQLite database with an FTS5 full-text index
+
+    Text is stored one row per page (split at the document's pageOffsets),
+    so the index can rank, snippet and cite single pages. A document's
+    pages joined in order are its content. The index itself is built in
+    one pass in close(). See sqlite_corpus.py for querying the database.
+    """
+
+    def __init__(self, output_file, envelope):
+        self.output_path = Path(output_file)
+        self.tmp_path = self.output_path.with_name(self.output_path.name + ".tmp")
+        self.count = 0
+
+        if self.tmp_path.exists():
+            self.tmp_path.unlink()
+        self.db = sqlite3.connect(self.tmp_path)
+        # A half-written build is thrown away anyway, so skip the journal
+        self.db.execute("PRAGMA journal_mode = OFF")
+        self.db.execute("PRAGMA synchronous = OFF")
+        self.db.executescript(SQLITE_SCHEMA)
+        self.db.executemany("INSERT INTO meta VALUES (?, ?)",
+                            [(key, json.dumps(value, ensure_ascii=False)) for key, value in envelope.items()])
+
+    def add(self, doc):
+        """Insert one document and its pages"""
+        metadata = {key: value for key, value in doc.items()
+                    if key not in SQLITE_COLUMNS and key not in SHARD_FIELDS}
+        self.db.execute("INSERT INTO documents VALUES (?, ?, ?, ?, ?, ?)",
+                        (doc["id"], doc.get("title"), doc.get("source"), doc.get("filename"),
+                         len(doc["content"]), json.dumps(metadata, ensure_ascii=False)))
+        self.count += 1
+        self.db.executemany(
+            "INSERT INTO pages (doc_id, page, start, title, text) VALUES (?, ?, ?, ?, ?)",
+            [(doc["id"], page, start, doc.get("title"), doc["content"][start:end])
+             for page, (start, end) in enumerate(page_spans(doc), 1)])
+
+    def close(self):
+        """Build the full-text index and move the database into place"""
+        self.db.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("format", json.dumps("sqlite")),
+            ("build", json.dumps(datetime.now().strftime("%Y%m%d%H%M%S"))),
+            ("totalDocuments", json.dumps(self.count))
+        ])
+        self.db.execute("INSERT INTO pages_fts(pages_fts) VALUES ('rebuild')")
+        self.db.execute("INSERT INTO pages_fts(pages_fts) VALUES ('optimize')")
+        self.db.commit()
+        self.db.execute("VACUUM")
+        self.db.close()
+        os.replace(self.tmp_path, self.output_path)
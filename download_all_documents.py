@@ -10,17 +10,24 @@ Requirements:
 
 Usage:
     python download_all_documents.py
+    python download_all_documents.py --concurrency 4 --rate 2
 """
 
 import requests
-import json
-import os
-import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 
+from blob_store import BlobStore
+from download_ledger import DownloadLedger
+from http_download import TokenBucket, download_file, polite_get
+from http_fetcher import pdf_filename
+from metrics import METRICS, finish_run
+
 # CourtListener API (free, no key required for basic access)
-BASE_URL = "https://www.courtlistener.com/api/rest/v3"
+SITE_URL = "https://www.courtlistener.com"
+BASE_URL = f"{SITE_URL}/api/rest/v3"
 
 # Major Epstein-related dockets
 EPSTEIN_DOCKETS = {
@@ -45,8 +52,10 @@ EPSTEIN_DOCKETS = {
 }
 
 class EpsteinDocumentDownloader:
-    def __init__(self, output_dir="epstein_documents"):
+    def __init__(self, output_dir="epstein_documents", concurrency=1, rate=3.0, revalidate=False, limiter=None,
+                 site_url=SITE_URL):
         self.output_dir = Path(output_dir)
+        self.site_url = site_url
         self.output_dir.mkdir(exist_ok=True)
         
         # Create subdirectories
@@ -56,26 +65,35 @@ class EpsteinDocumentDownloader:
         self.json_dir = self.output_dir / "json"
         self.json_dir.mkdir(exist_ok=True)
         
-        self.log_file = self.output_dir / "download_log.json"
-        self.downloaded = self.load_log()
+        # Every PDF is stored once by content; names in pdfs/ link to it
+        self.store = BlobStore(self.output_dir / "blobs")
+        
+        # Constant-time "already downloaded?" checks; replaces download_log.json
+        self.log_file = self.output_dir / "download_log.jsonl"
+        self.downloaded = DownloadLedger(self.log_file, legacy_path=self.output_dir / "download_log.json")
+        
+        # Up to `concurrency` downloads in flight, never more than `rate`
+        # requests per second between them (or the given limiter's rate, when
+        # it is shared with other downloaders hitting the same site)
+        self.concurrency = max(1, concurrency)
+        self.limiter = limiter or TokenBucket(rate)
+        self.revalidate = revalidate
         
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'EpsteinDocumentResearch/1.0 (Educational Research)'
         })
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
     
-    def load_log(self):
-        """Load log of already downloaded documents"""
-        if self.log_file.exists():
-            with open(self.log_file, 'r') as f:
-                return json.load(f)
-        return {"documents": [], "last_updated": None}
+    def get(self, url, **kwargs):
+        """Rate-limited GET that backs off when the server asks (Retry-After)"""
+        return polite_get(self.session, url, self.limiter, **kwargs)
     
     def save_log(self):
-        """Save download log"""
-        self.downloaded["last_updated"] = datetime.now().isoformat()
-        with open(self.log_file, 'w') as f:
-            json.dump(self.downloaded, f, indent=2)
+        """Force the download log to disk"""
+        self.downloaded.sync()
     
     def search_dockets(self, search_term):
         """Search for dockets by term"""
@@ -88,7 +106,7 @@ class EpsteinDocumentDownloader:
         }
         
         try:
-            response = self.session.get(url, params=params, timeout=30)
+            response = self.get(url, params=params, timeout=30)
             if response.status_code == 200:
                 data = response.json()
                 print(f"   Found {data.get('count', 0)} dockets")
@@ -106,10 +124,10 @@ class EpsteinDocumentDownloader:
         print("   Using direct website scraping method...")
         
         # Use the website directly since API requires auth
-        url = f"https://www.courtlistener.com/docket/{docket_id}/json/"
+        url = f"{self.site_url}/docket/{docket_id}/json/"
         
         try:
-            response = self.session.get(url, timeout=30)
+            response = self.get(url, timeout=30)
             if response.status_code == 200:
                 data = response.json()
                 entries = data.get('docket_entries', [])
@@ -127,7 +145,7 @@ class EpsteinDocumentDownloader:
         
         while True:
             try:
-                response = self.session.get(url, params=params, timeout=30)
+                response = self.get(url, params=params, timeout=30)
                 if response.status_code != 200:
                     print(f"   ⚠️  Status code: {response.status_code}")
                     break
@@ -144,7 +162,6 @@ class EpsteinDocumentDownloader:
                 
                 url = data['next']
                 page += 1
-                time.sleep(0.5)  # Be nice to the API
                 
             except Exception as e:
                 print(f"   ❌ Error: {e}")
@@ -163,8 +180,10 @@ class EpsteinDocumentDownloader:
         """Download a single document"""
         doc_id = doc_info.get('id')
         
-        # Check if already downloaded
-        if any(d['id'] == doc_id for d in self.downloaded['documents']):
+        # Check if already downloaded (with --revalidate, ask the server
+        # whether it changed instead)
+        previous = self.downloaded.get(doc_id)
+        if previous and not self.revalidate:
             return False
         
         filepath = doc_info.get('filepath_local')
@@ -172,44 +191,49 @@ class EpsteinDocumentDownloader:
             return False
         
         # Build download URL
-        download_url = f"https://www.courtlistener.com{filepath}"
+        download_url = f"{self.site_url}{filepath}"
         
-        # Create filename
+        # Create filename; attachments share their entry's number, so they
+        # get "<entry>-<attachment>" and every name a hash of its URL
         entry_num = doc_info.get('document_number', 'unknown')
+        attachment = doc_info.get('attachment_number')
+        if attachment:
+            entry_num = f"{entry_num}-{attachment}"
         description = doc_info.get('description', 'document')
-        safe_desc = "".join(c for c in description if c.isalnum() or c in (' ', '-', '_'))[:50]
-        filename = f"{case_name}_{entry_num}_{safe_desc}.pdf"
+        filename = pdf_filename(case_name, entry_num, description, download_url)
         output_path = self.pdfs_dir / filename
         
-        try:
-            print(f"      📥 Downloading: {filename}")
-            response = self.session.get(download_url, timeout=60, stream=True)
-            
-            if response.status_code == 200:
-                with open(output_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                
-                # Log successful download
-                self.downloaded['documents'].append({
-                    'id': doc_id,
-                    'filename': filename,
-                    'case': case_name,
-                    'entry_number': entry_num,
-                    'description': description,
-                    'downloaded_at': datetime.now().isoformat()
-                })
-                self.save_log()
-                
-                print(f"      ✅ Saved: {filename}")
-                return True
-            else:
-                print(f"      ⚠️  Status {response.status_code}")
-                return False
-                
-        except Exception as e:
-            print(f"      ❌ Error: {e}")
+        print(f"      📥 Downloading: {filename}")
+        result = download_file(self.session, download_url, output_path, self.limiter,
+                               validators=previous, timeout=60)
+        
+        if result["status"] == "not_modified":
+            print(f"      ♻️  Unchanged: {filename}")
+            return False
+        if result["status"] == "failed":
+            print(f"      ⚠️  {result['error']}")
             return False
+        
+        sha256, duplicate = self.store.adopt(output_path)
+        if duplicate:
+            print(f"      🧬 Same PDF as an earlier download, stored once")
+        
+        # Log successful download
+        self.downloaded.add({
+            'id': doc_id,
+            'filename': filename,
+            'case': case_name,
+            'entry_number': entry_num,
+            'description': description,
+            'downloaded_at': datetime.now().isoformat(),
+            'bytes': result['bytes'],
+            'sha256': sha256,
+            'etag': result['etag'],
+            'last_modified': result['last_modified']
+        })
+        
+        print(f"      ✅ Saved: {filename}")
+        return True
     
     def download_case(self, case_name, docket_id):
         """Download all documents for a specific case"""
@@ -226,7 +250,8 @@ class EpsteinDocumentDownloader:
         
         total_downloaded = 0
         
-        # Process each entry
+        # Collect the documents of every entry
+        documents = []
         for i, entry in enumerate(entries, 1):
             entry_num = entry.get('entry_number', 'N/A')
             description = entry.get('description', 'No description')
@@ -234,19 +259,26 @@ class EpsteinDocumentDownloader:
             print(f"\n   [{i}/{len(entries)}] Entry #{entry_num}: {description[:60]}")
             
             # Get documents for this entry
-            documents = self.get_recap_documents(entry)
-            
-            if documents:
-                print(f"      Found {len(documents)} document(s)")
-                for doc in documents:
-                    if self.download_document(doc, case_name.replace(' ', '_')):
-                        total_downloaded += 1
-                    time.sleep(0.3)  # Be respectful to the server
-            
-            # Periodic save
-            if i % 10 == 0:
-                self.save_log()
-                print(f"\n   💾 Progress saved ({total_downloaded} documents downloaded)")
+            entry_documents = self.get_recap_documents(entry)
+            if entry_documents:
+                print(f"      Found {len(entry_documents)} document(s)")
+                documents.extend(entry_documents)
+        
+        # Download them, several at a time if asked to; the rate limiter
+        # keeps us within what the server allows
+        def download(doc):
+            return self.download_document(doc, case_name.replace(' ', '_'))
+        
+        print(f"\n   📥 Downloading {len(documents)} document(s) with {self.concurrency} worker(s)")
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for i, downloaded in enumerate(executor.map(download, documents), 1):
+                if downloaded:
+                    total_downloaded += 1
+                
+                # Periodic save
+                if i % 100 == 0:
+                    self.save_log()
+                    print(f"\n   💾 Progress saved ({total_downloaded} documents downloaded)")
         
         print(f"\n✅ {case_name}: Downloaded {total_downloaded} new documents")
     
@@ -256,7 +288,7 @@ class EpsteinDocumentDownloader:
         print("🚀 EPSTEIN DOCUMENT MASS DOWNLOADER")
         print("="*60)
         print(f"Output directory: {self.output_dir.absolute()}")
-        print(f"Previously downloaded: {len(self.downloaded['documents'])} documents")
+        print(f"Previously downloaded: {len(self.downloaded)} documents")
         
         # Download from known dockets
         for case_name, info in EPSTEIN_DOCKETS.items():
@@ -274,14 +306,14 @@ class EpsteinDocumentDownloader:
                     docket_id = results[0].get('id')
                     if docket_id:
                         self.download_case(case_name, docket_id)
-            
-            time.sleep(1)  # Pause between cases
+        
+        self.save_log()
         
         # Final summary
         print("\n" + "="*60)
         print("✅ DOWNLOAD COMPLETE")
         print("="*60)
-        print(f"Total documents downloaded: {len(self.downloaded['documents'])}")
+        print(f"Total documents downloaded: {len(self.downloaded)}")
         print(f"PDFs saved to: {self.pdfs_dir.absolute()}")
         print(f"Log saved to: {self.log_file.absolute()}")
         
@@ -296,11 +328,11 @@ class EpsteinDocumentDownloader:
             f.write("EPSTEIN DOCUMENT DOWNLOAD SUMMARY\n")
             f.write("="*60 + "\n\n")
             f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"Total Documents: {len(self.downloaded['documents'])}\n\n")
+            f.write(f"Total Documents: {len(self.downloaded)}\n\n")
             
             # Group by case
             by_case = {}
-            for doc in self.downloaded['documents']:
+            for doc in self.downloaded:
                 case = doc['case']
                 if case not in by_case:
                     by_case[case] = []
@@ -320,6 +352,15 @@ class EpsteinDocumentDownloader:
 
 def main():
     """Main function"""
+    parser = argparse.ArgumentParser(description="Download Epstein court documents from CourtListener")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="number of documents to download at once (default: 1)")
+    parser.add_argument("--rate", type=float, default=3.0,
+                        help="maximum requests per second across all downloads (default: 3)")
+    parser.add_argument("--revalidate", action="store_true",
+                        help="re-check already downloaded documents and fetch the ones that changed")
+    args = parser.parse_args()
+    
     print("\n⚖️  OFFICIAL EPSTEIN COURT DOCUMENTS DOWNLOADER")
     print("="*60)
     print("This tool downloads publicly available court documents")
@@ -328,10 +369,12 @@ def main():
     
     input("\nPress Enter to start downloading ALL documents...")
     
-    downloader = EpsteinDocumentDownloader()
+    downloader = EpsteinDocumentDownloader(concurrency=args.concurrency, rate=args.rate,
+                                           revalidate=args.revalidate)
     
     try:
-        downloader.download_all()
+        with METRICS.stage("download"):
+            downloader.download_all()
     except KeyboardInterrupt:
         print("\n\n⚠️  Download interrupted by user")
         downloader.save_log()
@@ -339,6 +382,7 @@ def main():
     except Exception as e:
         print(f"\n\n❌ Error: {e}")
         downloader.save_log()
+    finish_run("download_all_documents")
     
     print("\n🎉 Done! Next steps:")
     print("1. Run: python process_all_pdfs.py")
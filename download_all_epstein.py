@@ -7,6 +7,10 @@ This script will:
 3. Extract text and build a comprehensive database
 
 WARNING: This could download THOUSANDS of files and take hours!
+
+Pages and PDFs are fetched over plain HTTP (http_fetcher.py); Chrome is
+only started for pages that need it, such as a CAPTCHA. Use --browser to
+do everything in the browser as before.
 """
 
 from selenium import webdriver
@@ -17,19 +21,26 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
+import argparse
 import time
 import os
 from pathlib import Path
 import json
 import re
 
+from blob_store import BlobStore
+from download_watcher import DownloadWatcher
+from http_fetcher import CAPTCHA_INDICATORS, HttpDocketFetcher
+from metrics import METRICS, finish_run
+
 class ComprehensiveEpsteinDownloader:
-    def __init__(self):
+    def __init__(self, use_http=True, concurrency=4, rate=2.0, limiter=None):
         self.download_dir = Path("epstein_documents/pdfs").absolute()
         self.download_dir.mkdir(parents=True, exist_ok=True)
         self.downloaded_count = 0
         self.failed_count = 0
         self.docket_list = []
+        self.fetcher = HttpDocketFetcher(concurrency=concurrency, rate=rate, limiter=limiter) if use_http else None
         
     def setup_browser(self):
         """Setup Chrome browser with download preferences"""
@@ -44,6 +55,12 @@ class ComprehensiveEpsteinDownloader:
         service = Service(ChromeDriverManager().install())
         self.driver = webdriver.Chrome(service=service, options=chrome_options)
         self.wait = WebDriverWait(self.driver, 10)
+    
+    def ensure_browser(self):
+        """Start Chrome the first time a page needs it"""
+        if not hasattr(self, 'driver'):
+            self.log("🌐 Starting Chrome browser...")
+            self.setup_browser()
         
     def log(self, message):
         """Print and log message"""
@@ -53,17 +70,9 @@ class ComprehensiveEpsteinDownloader:
         """Check if CAPTCHA is present and pause if needed"""
         try:
             # Check for common CAPTCHA indicators
-            captcha_indicators = [
-                "recaptcha",
-                "captcha",
-                "verify you are human",
-                "confirm you are human",
-                "hcaptcha"
-            ]
-            
             page_source = self.driver.page_source.lower()
             
-            for indicator in captcha_indicators:
+            for indicator in CAPTCHA_INDICATORS:
                 if indicator in page_source:
                     self.log("\n" + "="*70)
                     self.log("🤖 CAPTCHA DETECTED!")
@@ -115,7 +124,16 @@ class ComprehensiveEpsteinDownloader:
             self.log(f"\n🔎 Searching: {search_term}")
             url = f"https://www.courtlistener.com/?q={search_term.replace(' ', '+')}&type=r&order_by=score+desc"
             
+            if self.fetcher is not None:
+                dockets = self.fetcher.search_dockets(url, blacklist)
+                if dockets is not None:
+                    all_dockets.update(dockets)
+                    self.log(f"   Found {len(dockets)} potential dockets")
+                    continue
+                self.log("   🌐 Falling back to the browser for this search")
+            
             try:
+                self.ensure_browser()
                 self.driver.get(url)
                 time.sleep(3)
                 
@@ -148,7 +166,16 @@ class ComprehensiveEpsteinDownloader:
         self.log(f"📂 Processing: {docket_url}")
         self.log(f"{'='*70}")
         
+        if self.fetcher is not None:
+            result = self.fetcher.fetch_docket(docket_url)
+            if result is not None:
+                self.downloaded_count += result["downloaded"]
+                self.failed_count += result["failed"]
+                return
+            self.log("   🌐 Falling back to the browser for this docket")
+        
         try:
+            self.ensure_browser()
             self.driver.get(docket_url)
             time.sleep(2)
             
@@ -171,24 +198,30 @@ class ComprehensiveEpsteinDownloader:
                 self.log("   ⚠️ No PDFs found on this docket, skipping...")
                 return
             
-            for i, pdf_link in enumerate(pdf_links, 1):
+            # Read the URLs up front; navigating makes the elements stale
+            pdf_urls = [pdf_link.get_attribute('href') for pdf_link in pdf_links]
+            watcher = DownloadWatcher(self.download_dir)
+            for i, pdf_url in enumerate(pdf_urls, 1):
                 try:
-                    pdf_url = pdf_link.get_attribute('href')
-                    
                     # Get document number from URL
                     doc_match = re.search(r'/(\d+)/', pdf_url)
                     doc_num = doc_match.group(1) if doc_match else str(i)
                     
-                    # Download the PDF
-                    self.log(f"   [{i}/{len(pdf_links)}] Downloading document #{doc_num}...")
+                    # Download the PDF (a few at a time)
+                    watcher.wait_for_slot()
+                    self.log(f"   [{i}/{len(pdf_urls)}] Downloading document #{doc_num}...")
                     self.driver.get(pdf_url)
-                    time.sleep(2)  # Wait for download
-                    
-                    self.downloaded_count += 1
+                    watcher.started()
                     
                 except Exception as e:
                     self.log(f"   ❌ Failed to download PDF: {e}")
                     self.failed_count += 1
+            
+            # Only count files that actually landed on disk
+            finished = watcher.wait_all()
+            self.downloaded_count += len(finished)
+            self.failed_count += watcher.failed
+            self.log(f"   ✅ {len(finished)} downloaded, {watcher.failed} never arrived")
                     
         except Exception as e:
             self.log(f"❌ Failed to process docket: {e}")
@@ -203,7 +236,8 @@ class ComprehensiveEpsteinDownloader:
         self.log("="*70)
         
         try:
-            self.setup_browser()
+            if self.fetcher is None:
+                self.setup_browser()
             
             # Step 1: Find all dockets
             dockets = self.find_all_epstein_dockets()
@@ -234,6 +268,11 @@ class ComprehensiveEpsteinDownloader:
             self.log(f"❌ Failed: {self.failed_count} documents")
             self.log(f"📂 Total dockets processed: {len(self.docket_list)}")
             self.log(f"💾 Files saved to: {self.download_dir}")
+            
+            # File the downloads into the content-addressed store so
+            # repeated filings share one copy
+            files, duplicates = BlobStore().adopt_dir(self.download_dir)
+            self.log(f"🧬 Stored {files} new PDFs ({duplicates} duplicates of existing ones)")
             self.log("="*70)
             
             if hasattr(self, 'driver'):
@@ -245,12 +284,23 @@ class ComprehensiveEpsteinDownloader:
             'downloaded': self.downloaded_count,
             'failed': self.failed_count,
             'current_docket': current_docket,
-            'total_dockets': len(self.docket_list)
+            'total_dockets': len(self.docket_list),
+            'metrics': METRICS.snapshot()
         }
         
         with open('download_progress.json', 'w') as f:
             json.dump(progress, f, indent=2)
             
 if __name__ == "__main__":
-    downloader = ComprehensiveEpsteinDownloader()
-    downloader.download_all()
+    parser = argparse.ArgumentParser(description="Download ALL Epstein-related documents from CourtListener")
+    parser.add_argument("--browser", action="store_true",
+                        help="do everything in Chrome instead of fetching pages over HTTP first")
+    parser.add_argument("--concurrency", type=int, default=4, help="PDFs to download at once over HTTP")
+    parser.add_argument("--rate", type=float, default=2.0, help="maximum HTTP requests per second")
+    args = parser.parse_args()
+    
+    downloader = ComprehensiveEpsteinDownloader(use_http=not args.browser,
+                                                concurrency=args.concurrency, rate=args.rate)
+    with METRICS.stage("download"):
+        downloader.download_all()
+    finish_run("download_all_epstein")
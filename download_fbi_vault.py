@@ -14,6 +14,10 @@ import time
 import os
 import requests
 
+from download_watcher import DownloadWatcher
+from http_download import download_file
+from metrics import METRICS, finish_run
+
 # Download directory
 DOWNLOAD_DIR = os.path.join(os.getcwd(), 'epstein_documents', 'fbi_vault')
 os.makedirs(DOWNLOAD_DIR, exist_ok=True)
@@ -34,9 +38,11 @@ def setup_driver():
     driver = webdriver.Chrome(service=service, options=chrome_options)
     return driver
 
-def download_fbi_vault_documents():
+def download_fbi_vault_documents(limiter=None):
     """
     Navigate to FBI Vault Epstein page and download all PDF parts
+
+    limiter (an http_download.TokenBucket) paces the requests to the vault.
     """
     driver = setup_driver()
     
@@ -83,6 +89,7 @@ def download_fbi_vault_documents():
                     pdf_links.append(href)
         
         # Download each PDF
+        watcher = DownloadWatcher(DOWNLOAD_DIR)
         for idx, pdf_url in enumerate(pdf_links, 1):
             try:
                 print(f"\n[{idx}/{len(pdf_links)}] Downloading: {pdf_url}")
@@ -93,26 +100,37 @@ def download_fbi_vault_documents():
                 
                 # Navigate to PDF or download directly
                 if pdf_url.endswith('.pdf'):
-                    # Direct PDF link - download with requests
-                    response = requests.get(pdf_url, stream=True)
+                    # Direct PDF link - download with requests (into a .part
+                    # file, renamed into place only once it is complete)
                     filename = pdf_url.split('/')[-1]
                     filepath = os.path.join(DOWNLOAD_DIR, filename)
-                    
-                    with open(filepath, 'wb') as f:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            f.write(chunk)
+                    result = download_file(requests, pdf_url, filepath, limiter)
+                    if result["status"] == "failed":
+                        print(f"   ❌ Failed: {result['error']}")
+                        continue
                     
                     print(f"   ✅ Downloaded: {filename}")
                 else:
-                    # Navigate and let browser download
+                    # Navigate and let browser download (a few at a time)
+                    watcher.wait_for_slot()
+                    if limiter is not None:
+                        limiter.acquire()
                     driver.get(pdf_url)
-                    time.sleep(3)  # Wait for download to start
+                    watcher.started()
                     print(f"   ✅ Download initiated")
                 
             except Exception as e:
                 print(f"   ❌ Failed: {str(e)}")
                 continue
         
+        # Wait for the browser downloads to land before closing the browser
+        if watcher.in_flight():
+            print(f"\n⏳ Waiting for {watcher.in_flight()} browser downloads to finish...")
+        for path in watcher.wait_all():
+            print(f"   ✅ Downloaded: {path.name}")
+        if watcher.failed:
+            print(f"   ⚠️  {watcher.failed} browser downloads never arrived")
+        
         print("\n" + "=" * 70)
         print("✅ FBI VAULT DOWNLOAD COMPLETE")
         print(f"📂 Files saved to: {DOWNLOAD_DIR}")
@@ -127,4 +145,6 @@ def download_fbi_vault_documents():
         driver.quit()
 
 if __name__ == "__main__":
-    download_fbi_vault_documents()
+    with METRICS.stage("download"):
+        download_fbi_vault_documents()
+    finish_run("download_fbi_vault")
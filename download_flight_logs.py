@@ -4,11 +4,18 @@ Downloads flight logs from Internet Archive
 """
 
 import requests
+import json
 import os
 
+from http_download import download_file
+from metrics import METRICS, finish_run
+
 DOWNLOAD_DIR = os.path.join(os.getcwd(), 'epstein_documents', 'flight_logs')
 os.makedirs(DOWNLOAD_DIR, exist_ok=True)
 
+# ETag / Last-Modified of each downloaded file, so re-runs only fetch changes
+VALIDATORS_FILE = os.path.join(DOWNLOAD_DIR, 'validators.json')
+
 # Known flight log sources
 FLIGHT_LOG_URLS = [
     # Gawker release (2015)
@@ -18,46 +25,48 @@ FLIGHT_LOG_URLS = [
     # Add more as discovered
 ]
 
-def download_flight_logs():
+def download_flight_logs(limiter=None):
     """Download all available flight log PDFs"""
     
     print("=" * 70)
     print("EPSTEIN FLIGHT LOGS - DOWNLOAD")
     print("=" * 70)
     
+    validators = {}
+    if os.path.exists(VALIDATORS_FILE):
+        with open(VALIDATORS_FILE, 'r') as f:
+            validators = json.load(f)
+    session = requests.Session()
+    
+    def show_progress(downloaded, total_size):
+        if total_size:
+            percent = (downloaded / total_size) * 100
+            print(f"\r   Progress: {percent:.1f}%", end='', flush=True)
+    
     for idx, url in enumerate(FLIGHT_LOG_URLS, 1):
-        try:
-            print(f"\n[{idx}/{len(FLIGHT_LOG_URLS)}] Downloading from: {url}")
-            
-            response = requests.get(url, stream=True, timeout=30)
-            response.raise_for_status()
-            
-            # Get filename from URL
-            filename = url.split('/')[-1]
-            if not filename.endswith('.pdf'):
-                filename = f"flight_logs_{idx}.pdf"
-            
-            filepath = os.path.join(DOWNLOAD_DIR, filename)
-            
-            # Download with progress
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded = 0
-            
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        
-                        if total_size > 0:
-                            percent = (downloaded / total_size) * 100
-                            print(f"\r   Progress: {percent:.1f}%", end='', flush=True)
-            
-            print(f"\n   ✅ Downloaded: {filename} ({downloaded:,} bytes)")
-            
-        except Exception as e:
-            print(f"\n   ❌ Failed: {str(e)}")
-            continue
+        print(f"\n[{idx}/{len(FLIGHT_LOG_URLS)}] Downloading from: {url}")
+        
+        # Get filename from URL
+        filename = url.split('/')[-1]
+        if not filename.endswith('.pdf'):
+            filename = f"flight_logs_{idx}.pdf"
+        
+        filepath = os.path.join(DOWNLOAD_DIR, filename)
+        
+        # Goes to a .part file first, resumes an interrupted download and
+        # skips the transfer entirely if the file hasn't changed
+        result = download_file(session, url, filepath, limiter, validators=validators.get(filename),
+                               timeout=30, on_progress=show_progress)
+        
+        if result["status"] == "not_modified":
+            print(f"   ♻️  Unchanged: {filename}")
+        elif result["status"] == "downloaded":
+            validators[filename] = {"etag": result["etag"], "last_modified": result["last_modified"]}
+            with open(VALIDATORS_FILE, 'w') as f:
+                json.dump(validators, f, indent=2)
+            print(f"\n   ✅ Downloaded: {filename} ({result['bytes']:,} bytes)")
+        else:
+            print(f"\n   ❌ Failed: {result['error']} (run again to resume)")
     
     print("\n" + "=" * 70)
     print("✅ FLIGHT LOGS DOWNLOAD COMPLETE")
@@ -65,4 +74,6 @@ def download_flight_logs():
     print("=" * 70)
 
 if __name__ == "__main__":
-    download_flight_logs()
+    with METRICS.stage("download"):
+        download_flight_logs()
+    finish_run("download_flight_logs")
@@ -0,0 +1,112 @@
+"""
+Download Ledger for the Epstein Documents Downloaders
+
+Append-only JSONL record of every downloaded document, with an in-memory
+id index so "is this already downloaded?" is a constant-time lookup no
+matter how many documents have been fetched. Records are written as they
+happen and fsynced in batches; a torn last line from a crash is dropped
+on load, so at most the unsynced tail of a batch is fetched again.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+class DownloadLedger:
+    """Ids and records of downloaded documents, backed by a JSONL file
+
+    The first time it is opened next to an old download_log.json, the
+    documents from that file are copied into the ledger.
+    """
+
+    def __init__(self, path, legacy_path=None, batch_size=50):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.records = {}
+        self.unsynced = 0
+        self.lock = threading.Lock()
+
+        valid_size = self.load()
+        if valid_size:
+            self.file = open(self.path, 'r+b')
+            self.file.truncate(valid_size)
+            self.file.seek(valid_size)
+        else:
+            self.file = open(self.path, 'wb')
+            if legacy_path is not None and Path(legacy_path).exists():
+                self.import_legacy(Path(legacy_path))
+
+    def load(self):
+        """Read the existing ledger, returning the size of its intact part"""
+        if not self.path.exists():
+            return 0
+        size = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # Torn write from a crash
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self.remember(record)
+                size += len(line)
+        return size
+
+    def import_legacy(self, legacy_path):
+        """Copy the documents of an old download_log.json into the ledger"""
+        with open(legacy_path, 'r') as f:
+            documents = json.load(f).get("documents", [])
+        for record in documents:
+            self.add(record)
+        self.sync()
+        if documents:
+            print(f"📒 Imported {len(documents)} documents from {legacy_path.name}")
+
+    def remember(self, record):
+        self.records[record["id"]] = record
+
+    def __contains__(self, doc_id):
+        return doc_id in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(list(self.records.values()))
+
+    def get(self, doc_id):
+        """The latest record for a document id, or None"""
+        return self.records.get(doc_id)
+
+    def add(self, record):
+        """Record a downloaded document; synced to disk every batch_size records
+
+        Adding an id again (e.g. after re-downloading a changed file)
+        replaces its earlier record.
+        """
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            self.remember(record)
+            self.file.write(line.encode('utf-8'))
+            # Hand the line to the OS right away so a crash of this process
+            # loses nothing; fsync (power loss) only once per batch
+            self.file.flush()
+            self.unsynced += 1
+            if self.unsynced >= self.batch_size:
+                self.sync_locked()
+
+    def sync(self):
+        """Force recorded documents to disk"""
+        with self.lock:
+            self.sync_locked()
+
+    def sync_locked(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+
+    def close(self):
+        self.sync()
+        self.file.close()
@@ -0,0 +1,147 @@
+"""
+Browser Download Tracker for the Selenium Downloaders
+
+Chrome gives no signal when a download finishes, so the Selenium paths
+used to sleep a fixed 2-5 seconds per file and count every click as a
+download. DownloadWatcher watches the download directory instead: a file
+only counts once its partial (.crdownload) name is gone and its size has
+stopped changing, and downloads that never arrive are counted as failed.
+Only PDFs count, and only when they showed up after a download this
+watcher started: other files in the directory (sidecars, PDFs saved by
+the HTTP downloaders) are not ours. It also caps how many downloads run at once, so the browser can fetch
+several files while the next ones are being started.
+"""
+
+import os
+import time
+from collections import deque
+from pathlib import Path
+
+from metrics import METRICS
+
+# Names browsers give files that are still downloading
+PARTIAL_SUFFIXES = ('.crdownload', '.part', '.download', '.tmp')
+
+def is_pdf(name):
+    return name.lower().endswith('.pdf')
+
+def partial_size(entry):
+    try:
+        return entry.stat().st_size
+    except FileNotFoundError:
+        return None  # Finished or cancelled between listing and stat
+
+class DownloadWatcher:
+    """Track downloads started in a browser until their files are complete
+
+    Call started() after each download is triggered, wait_for_slot()
+    before triggering the next one, and wait_all() at the end. Finished
+    files are collected in .finished; downloads that produced no file
+    within `timeout` seconds are counted in .failed.
+
+    Each finished PDF is matched to the oldest outstanding download, if
+    that was started before the file appeared. PDFs already linked into
+    the blob store were saved by an HTTP download and are never matched.
+    """
+
+    def __init__(self, directory, max_in_flight=4, stable_seconds=1.0, timeout=120, poll_interval=0.2):
+        self.directory = Path(directory)
+        self.max_in_flight = max(1, max_in_flight)
+        self.stable_seconds = stable_seconds
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+
+        # Files that were already there aren't ours
+        self.seen = {entry.name for entry in os.scandir(self.directory) if is_pdf(entry.name)}
+        # Partial files (name: (size, changed at)); the ones already there
+        # (.part files kept for resuming, leftovers of a crashed browser)
+        # only count once they change
+        self.partials = {}
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(PARTIAL_SUFFIXES):
+                self.partials[entry.name] = (partial_size(entry), float('-inf'))
+        self.growing = {}
+        self.outstanding = deque()
+        self.finished = []
+        self.failed = 0
+
+    def started(self):
+        """Note that a download was just triggered"""
+        now = time.monotonic()
+        # (started, deadline)
+        self.outstanding.append((now, now + self.timeout))
+
+    def scan(self):
+        """Look at the directory once; returns files that finished since the last scan"""
+        now = time.monotonic()
+        newly_finished = []
+        partials = {}
+        for entry in os.scandir(self.directory):
+            name = entry.name
+            if name.endswith(PARTIAL_SUFFIXES):
+                size = partial_size(entry)
+                previous = self.partials.get(name)
+                partials[name] = previous if previous is not None and previous[0] == size else (size, now)
+                continue
+            if not is_pdf(name) or name in self.seen:
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue  # Renamed away between listing and stat
+
+            # (size, unchanged since, first seen)
+            previous = self.growing.get(name)
+            if previous is None:
+                self.growing[name] = (stat.st_size, now, now)
+            elif previous[0] != stat.st_size:
+                self.growing[name] = (stat.st_size, now, previous[2])
+            elif stat.st_size > 0 and now - previous[1] >= self.stable_seconds:
+                del self.growing[name]
+                self.seen.add(name)
+                if stat.st_nlink > 1 or not self.outstanding or self.outstanding[0][0] > previous[2]:
+                    continue  # Not a download this watcher started
+                self.outstanding.popleft()
+                newly_finished.append(self.directory / name)
+                METRICS.count("downloads_total", status="downloaded", via="browser")
+                METRICS.count("download_bytes_total", stat.st_size)
+
+        self.partials = partials
+        # Partial files that changed lately could still become downloads
+        partial = sum(1 for _, changed in partials.values() if now - changed < self.timeout)
+
+        # A download past its deadline has failed, unless there are still
+        # files in progress that could be it
+        while (self.outstanding and self.outstanding[0][1] < now
+               and len(self.outstanding) > partial + len(self.growing)):
+            self.outstanding.popleft()
+            self.failed += 1
+            METRICS.count("downloads_total", status="failed", via="browser")
+
+        self.finished.extend(newly_finished)
+        return newly_finished
+
+    def in_flight(self):
+        return len(self.outstanding)
+
+    def wait_for_slot(self):
+        """Block until fewer than max_in_flight downloads are running"""
+        self.scan()
+        while self.in_flight() >= self.max_in_flight:
+            time.sleep(self.poll_interval)
+            self.scan()
+
+    def wait_all(self):
+        """Block until every started download has finished or timed out"""
+        self.scan()
+        while self.outstanding or self.growing:
+            time.sleep(self.poll_interval)
+            self.scan()
+            if not self.outstanding and self.growing and not self.growing_recently():
+                break
+        return self.finished
+
+    def growing_recently(self):
+        """True if an untracked file changed size within the timeout"""
+        now = time.monotonic()
+        return any(now - since < self.timeout for _, since in self.growing.values())
@@ -0,0 +1,262 @@
+"""
+Isolated Extraction Workers for process_all_pdfs.py and sync_all.py
+
+pdfplumber can spend tens of minutes (or all the memory on the machine)
+on one malformed or enormous PDF. ExtractionPool runs every extraction in
+a separate worker process with a budget:
+
+    - a wall-clock timeout per document: a worker that overruns it is
+      killed and replaced
+    - a memory limit per worker (POSIX only, via RLIMIT_AS): running out
+      raises MemoryError in the worker instead of swapping the machine
+    - a timeout per page (POSIX only, via SIGALRM): a page that takes too
+      long is skipped and the rest of the document is still extracted
+
+A document that blows its budget or crashes its worker comes back with a
+reason code ("timeout", "memory", "crashed" or "error") so the caller can
+quarantine it instead of retrying it on every rebuild.
+"""
+
+import signal
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import wait
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_TIMEOUT = 300
+DEFAULT_PAGE_TIMEOUT = 60
+DEFAULT_MEMORY_MB = 2048
+
+QUARANTINE_REASONS = ("timeout", "memory", "crashed", "error")
+
+class PageTimeout(Exception):
+    """A page took longer than its time limit"""
+
+@contextmanager
+def page_time_limit(seconds):
+    """Raise PageTimeout in the with block after `seconds` (where SIGALRM exists)"""
+    if (not seconds or not hasattr(signal, "setitimer")
+            or threading.current_thread() is not threading.main_thread()):
+        yield
+        return
+
+    def on_alarm(signum, frame):
+        raise PageTimeout(f"page took longer than {seconds}s")
+
+    previous = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def limit_memory(memory_mb):
+    """Cap this process's address space (no-op where unsupported)"""
+    if not memory_mb or resource is None:
+        return
+    limit = memory_mb * 1024 * 1024
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except (ValueError, OSError):
+        pass
+
+def worker_main(conn, function, memory_mb, page_timeout):
+    """Extract the paths sent over conn until told to stop"""
+    # Ctrl+C is handled by the parent, which then stops the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    limit_memory(memory_mb)
+    conn.send("ready")
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            return
+        if task is None:
+            return
+        try:
+            extracted, seconds, page_timings = function(task, page_timeout)
+            conn.send({"extracted": extracted, "seconds": seconds,
+                       "page_timings": page_timings, "reason": None, "detail": None})
+        except MemoryError:
+            conn.send(failure("memory", "ran out of memory"))
+            return  # Start a fresh worker rather than reuse a fragmented heap
+        except Exception as e:
+            conn.send(failure("error", f"{type(e).__name__}: {e}"[:200]))
+
+def failure(reason, detail, seconds=0.0):
+    return {"extracted": None, "seconds": seconds, "page_timings": [],
+            "reason": reason, "detail": detail}
+
+class Worker:
+    """One extraction process and the task it is working on"""
+
+    def __init__(self, function, memory_mb, page_timeout):
+        self.conn, child_conn = Pipe()
+        self.process = Process(target=worker_main, args=(child_conn, function, memory_mb, page_timeout),
+                               daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.task = None
+        self.started = 0.0
+        # Start-up (importing pdfplumber) doesn't count against the first document
+        if self.conn.poll(60):
+            try:
+                self.conn.recv()
+            except (EOFError, OSError):
+                pass  # Died on start-up; reported as a crash of its first task
+
+    def assign(self, key, path):
+        self.task = key
+        self.started = time.monotonic()
+        self.conn.send(str(path))
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+class ExtractionPool:
+    """Extract PDFs in isolated, budgeted worker processes
+
+    function(path, page_timeout) must return (extracted, seconds,
+    page_timings) and be importable by the workers. Every result is a dict
+    with "extracted", "seconds", "page_timings" and, for quarantined
+    documents, "reason" and "detail".
+    """
+
+    def __init__(self, function, workers=1, timeout=DEFAULT_TIMEOUT,
+                 page_timeout=DEFAULT_PAGE_TIMEOUT, memory_mb=DEFAULT_MEMORY_MB):
+        self.function = function
+        self.size = max(1, workers)
+        self.timeout = timeout
+        self.page_timeout = page_timeout
+        self.memory_mb = memory_mb
+        self.workers = []
+        self.queued = deque()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def spawn(self):
+        return Worker(self.function, self.memory_mb, self.page_timeout)
+
+    def submit(self, path, key=None):
+        """Queue a PDF for extraction; its result is reported under key (default: path)"""
+        self.queued.append((path if key is None else key, path))
+        self.dispatch()
+
+    def pending(self):
+        """Number of PDFs queued or being extracted"""
+        return len(self.queued) + sum(1 for worker in self.workers if worker.task is not None)
+
+    def dispatch(self):
+        while self.queued:
+            idle = next((worker for worker in self.workers if worker.task is None), None)
+            if idle is None:
+                if len(self.workers) >= self.size:
+                    return
+                idle = self.spawn()
+                self.workers.append(idle)
+            key, path = self.queued.popleft()
+            idle.assign(key, path)
+
+    def replace(self, worker, kill):
+        worker.stop(kill=kill)
+        self.workers.remove(worker)
+
+    def results(self, timeout=0.5):
+        """Wait up to `timeout` seconds; returns [(key, result)] that finished"""
+        busy = [worker for worker in self.workers if worker.task is not None]
+        finished = []
+        if not busy:
+            return finished
+
+        # Wake up in time for the next deadline
+        now = time.monotonic()
+        next_deadline = min(worker.started + self.timeout for worker in busy)
+        ready = wait([worker.conn for worker in busy] + [worker.process.sentinel for worker in busy],
+                     timeout=max(0.0, min(timeout, next_deadline - now)))
+
+        for worker in busy:
+            key = worker.task
+            if worker.conn in ready:
+                try:
+                    result = worker.conn.recv()
+                except (EOFError, OSError):
+                    result = None
+                if result is not None:
+                    worker.task = None
+                    finished.append((key, result))
+                    if not worker.process.is_alive() or result["reason"] == "memory":
+                        self.replace(worker, kill=False)
+                    continue
+            if worker.process.sentinel in ready or not worker.process.is_alive():
+                worker.process.join()
+                exitcode = worker.process.exitcode
+                if exitcode is not None and exitcode < 0:
+                    detail = f"worker killed by signal {-exitcode}"
+                else:
+                    detail = f"worker exited with code {exitcode}"
+                # SIGKILL out of nowhere is the kernel's out-of-memory killer
+                reason = "memory" if exitcode == -getattr(signal, "SIGKILL", 9) else "crashed"
+                finished.append((key, failure(reason, detail, time.monotonic() - worker.started)))
+                worker.task = None
+                self.replace(worker, kill=True)
+            elif time.monotonic() - worker.started > self.timeout:
+                finished.append((key, failure("timeout", f"no result after {self.timeout}s",
+                                               time.monotonic() - worker.started)))
+                worker.task = None
+                self.replace(worker, kill=True)
+
+        self.dispatch()
+        return finished
+
+    def imap(self, paths, lookahead=None):
+        """Yield (path, result) for paths in input order
+
+        Up to `lookahead` documents (default 4 per worker) are extracted
+        ahead of the one being waited for, so a slow document doesn't idle
+        the other workers.
+        """
+        paths = list(paths)
+        lookahead = lookahead or self.size * 4
+        done = {}
+        submitted = 0
+        for index in range(len(paths)):
+            while submitted < len(paths) and submitted < index + lookahead:
+                self.submit(paths[submitted], key=submitted)
+                submitted += 1
+            while index not in done:
+                for position, result in self.results():
+                    done[position] = result
+            yield paths[index], done.pop(index)
+
+    def close(self):
+        """Stop every worker (killing any still extracting)"""
+        self.queued.clear()
+        for worker in self.workers:
+            worker.stop(kill=worker.task is not None)
+        self.workers = []
@@ -0,0 +1,236 @@
+"""
+HTTP helpers shared by the downloaders
+
+TokenBucket keeps a whole download run under a request rate no matter how
+many threads are fetching, and backs every thread off together when the
+server answers 429/503 with a Retry-After header. polite_get() is
+session.get() with both applied.
+
+download_file() fetches one file safely: it streams into <name>.part and
+only renames it into place once Content-Length checks out, resumes an
+interrupted .part with a Range request, and revalidates a file we already
+have with If-None-Match / If-Modified-Since so unchanged files cost a 304.
+
+Both record what they do in metrics.METRICS (requests, retries, time
+waiting on the limiter, bytes and seconds per file).
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+from metrics import METRICS
+
+# Status codes that mean "slow down and try again"
+RETRY_STATUSES = (429, 503)
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter
+
+    Allows `rate` requests per second on average and bursts of up to
+    `capacity` requests. pause() stops everyone until a given time.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        started = time.monotonic()
+        try:
+            self.wait_for_token()
+        finally:
+            METRICS.observe("rate_limit_wait_seconds", time.monotonic() - started)
+
+    def wait_for_token(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Hold back every request for the next `seconds` seconds"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+            self.updated = self.paused_until
+
+def retry_after_seconds(value, default=30.0):
+    """Parse a Retry-After header (seconds or an HTTP date)"""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+def polite_get(session, url, limiter=None, max_retries=5, **kwargs):
+    """session.get() that waits for the rate limiter and honours Retry-After
+
+    Returns the last response; after max_retries throttled answers that is
+    the 429/503 response itself.
+    """
+    for attempt in range(max_retries + 1):
+        if limiter is not None:
+            limiter.acquire()
+        started = time.monotonic()
+        try:
+            response = session.get(url, **kwargs)
+        except Exception as e:
+            METRICS.count("http_requests_total", status=type(e).__name__)
+            raise
+        METRICS.observe("http_request_seconds", time.monotonic() - started)
+        METRICS.count("http_requests_total", status=response.status_code)
+        if response.status_code not in RETRY_STATUSES or attempt == max_retries:
+            return response
+
+        wait = retry_after_seconds(response.headers.get('Retry-After'), default=2.0 ** attempt)
+        response.close()
+        METRICS.count("http_retries_total")
+        METRICS.count("http_throttled_seconds_total", wait)
+        print(f"      ⏳ Server asked us to slow down ({response.status_code}), waiting {wait:.0f}s")
+        if limiter is not None:
+            limiter.pause(wait)
+        else:
+            time.sleep(wait)
+    return response
+
+def validators_from(response):
+    """The ETag / Last-Modified of a response, for revalidating it later"""
+    return {
+        "etag": response.headers.get('ETag'),
+        "last_modified": response.headers.get('Last-Modified')
+    }
+
+def download_file(session, url, output_path, limiter=None, validators=None,
+                  timeout=60, chunk_size=65536, on_progress=None):
+    """Download url to output_path, recording how long it took (see transfer_file)"""
+    started = time.monotonic()
+    result = transfer_file(session, url, output_path, limiter, validators, timeout, chunk_size, on_progress)
+    METRICS.observe("download_seconds", time.monotonic() - started, status=result["status"])
+    METRICS.count("downloads_total", status=result["status"])
+    return result
+
+def transfer_file(session, url, output_path, limiter=None, validators=None,
+                  timeout=60, chunk_size=65536, on_progress=None):
+    """Download url to output_path
+
+    validators are the {"etag", "last_modified"} saved from the last
+    download of this file; if output_path exists they turn the request
+    into a conditional one. Returns a dict with "status" ("downloaded",
+    "not_modified" or "failed"), "bytes", the new validators and, on
+    failure, "error". A failed transfer leaves its .part file so the next
+    call resumes it.
+    """
+    output_path = Path(output_path)
+    part_path = output_path.with_name(output_path.name + ".part")
+    meta_path = output_path.with_name(output_path.name + ".part.json")
+
+    headers = {}
+    if validators and output_path.exists():
+        if validators.get("etag"):
+            headers['If-None-Match'] = validators["etag"]
+        if validators.get("last_modified"):
+            headers['If-Modified-Since'] = validators["last_modified"]
+
+    # Resume a partial download, but only if the server still has the same
+    # version of the file (If-Range); otherwise it sends the whole file
+    offset = 0
+    if part_path.exists() and meta_path.exists():
+        with open(meta_path, 'r') as f:
+            part_validators = json.load(f)
+        if_range = part_validators.get("etag") or part_validators.get("last_modified")
+        if if_range:
+            offset = part_path.stat().st_size
+            headers['Range'] = f"bytes={offset}-"
+            headers['If-Range'] = if_range
+
+    try:
+        response = polite_get(session, url, limiter, headers=headers, timeout=timeout, stream=True)
+    except Exception as e:
+        return {"status": "failed", "bytes": 0, "error": str(e)}
+
+    with response:
+        if response.status_code == 304:
+            return {"status": "not_modified", "bytes": output_path.stat().st_size,
+                    "etag": validators.get("etag"), "last_modified": validators.get("last_modified")}
+        if response.status_code == 416 and offset:
+            # The .part is no good for this version of the file; start over
+            part_path.unlink()
+            meta_path.unlink()
+            return transfer_file(session, url, output_path, limiter, validators,
+                                 timeout, chunk_size, on_progress)
+        if response.status_code not in (200, 206):
+            return {"status": "failed", "bytes": 0, "error": f"Status {response.status_code}"}
+
+        if response.status_code == 206:
+            if content_range_start(response) != offset:
+                part_path.unlink()
+                meta_path.unlink()
+                return {"status": "failed", "bytes": 0, "error": "Unexpected Content-Range"}
+            mode = 'ab'
+        else:
+            mode, offset = 'wb', 0
+        new_validators = validators_from(response)
+        with open(meta_path, 'w') as f:
+            json.dump(new_validators, f)
+
+        # Content-Length counts encoded bytes, so it can only be checked
+        # against what we write when the body isn't compressed in transit
+        length = response.headers.get('Content-Length')
+        expected = None
+        if length and length.isdigit() and not response.headers.get('Content-Encoding'):
+            expected = offset + int(length)
+        received = offset
+        try:
+            with open(part_path, mode) as f:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    if chunk:
+                        f.write(chunk)
+                        received += len(chunk)
+                        METRICS.count("download_bytes_total", len(chunk))
+                        if on_progress:
+                            on_progress(received, expected)
+        except Exception as e:
+            return {"status": "failed", "bytes": received, "error": str(e)}
+
+    if expected is not None and received != expected:
+        return {"status": "failed", "bytes": received,
+                "error": f"Incomplete download ({received:,} of {expected:,} bytes)"}
+
+    os.replace(part_path, output_path)
+    meta_path.unlink()
+    return {"status": "downloaded", "bytes": received, **new_validators}
+
+def content_range_start(response):
+    """First byte position of a 206 response's Content-Range, or None"""
+    value = response.headers.get('Content-Range', '')
+    try:
+        return int(value.split()[1].split('-')[0])
+    except (IndexError, ValueError):
+        return None
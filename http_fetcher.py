@@ -0,0 +1,331 @@
+"""
+HTTP-Only Docket Fetcher for the Epstein Documents Downloaders
+
+CourtListener docket and search pages are plain server-rendered HTML, so
+they don't need a browser: this fetches them with requests, pulls the
+links out with the standard library's HTML parser and streams the PDFs
+straight to disk (several at a time, under a shared rate limit). The
+Selenium downloaders use it first and only open Chrome for pages that
+can't be fetched this way (CAPTCHA / bot checks, access denied).
+
+Usage:
+    python http_fetcher.py https://www.courtlistener.com/docket/4355308/giuffre-v-maxwell/
+"""
+
+import argparse
+import hashlib
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import urljoin
+
+import requests
+
+from blob_store import BlobStore, sha256_file
+from download_ledger import DownloadLedger
+from http_download import TokenBucket, download_file, polite_get
+from metrics import METRICS, finish_run
+
+# Text that means the page is a bot check a person has to solve
+CAPTCHA_INDICATORS = [
+    "recaptcha",
+    "captcha",
+    "verify you are human",
+    "confirm you are human",
+    "hcaptcha"
+]
+
+class LinkParser(HTMLParser):
+    """Collect the links, the first <h1> and any rel="next" link of a page"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+        self.heading = None
+        self.next_href = None
+        self.current_link = None
+        self.in_h1 = False
+        self.h1_text = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'a' and attrs.get('href'):
+            self.current_link = [attrs['href'], []]
+            if 'next' in (attrs.get('rel') or '').split():
+                self.next_href = attrs['href']
+        elif tag == 'link' and attrs.get('rel') == 'next' and attrs.get('href'):
+            self.next_href = attrs['href']
+        elif tag == 'h1' and self.heading is None:
+            self.in_h1 = True
+
+    def handle_endtag(self, tag):
+        if tag == 'a' and self.current_link is not None:
+            href, text = self.current_link
+            self.links.append((href, " ".join("".join(text).split())))
+            self.current_link = None
+        elif tag == 'h1' and self.in_h1:
+            self.heading = " ".join("".join(self.h1_text).split())
+            self.in_h1 = False
+
+    def handle_data(self, data):
+        if self.current_link is not None:
+            self.current_link[1].append(data)
+        if self.in_h1:
+            self.h1_text.append(data)
+
+def parse_links(html, base_url):
+    """Parse a page into a LinkParser with absolute link URLs"""
+    parser = LinkParser()
+    parser.feed(html)
+    parser.close()
+    parser.links = [(urljoin(base_url, href), text) for href, text in parser.links]
+    if parser.next_href:
+        parser.next_href = urljoin(base_url, parser.next_href)
+    return parser
+
+def needs_browser(html):
+    """True if the page is a CAPTCHA / bot check rather than real content"""
+    lowered = html.lower()
+    return any(indicator in lowered for indicator in CAPTCHA_INDICATORS)
+
+def is_pdf_link(url):
+    """Links the Selenium downloaders treat as documents"""
+    return '.pdf' in url.lower() or '/pdf/' in url
+
+def parse_docket_page(html, base_url):
+    """Case name, unique PDF links [(url, text)] and next page URL of a docket page"""
+    page = parse_links(html, base_url)
+    seen = set()
+    pdf_links = []
+    for url, text in page.links:
+        if is_pdf_link(url) and url not in seen:
+            seen.add(url)
+            pdf_links.append((url, text))
+    return {
+        "case_name": page.heading or "Unknown Case",
+        "pdf_links": pdf_links,
+        "next_page": page.next_href
+    }
+
+def parse_search_results(html, base_url, blacklist=()):
+    """Docket URLs on a search results page, skipping blacklisted ones"""
+    dockets = []
+    for url, text in parse_links(html, base_url).links:
+        if '/docket/' not in url or url in dockets:
+            continue
+        if any(blocked in text.lower() or blocked in url.lower() for blocked in blacklist):
+            continue
+        dockets.append(url)
+    return dockets
+
+def document_number(url, fallback):
+    """Docket entry number of a PDF URL
+
+    RECAP storage files are named ...<case id>.<entry>.<attachment>.pdf;
+    other links fall back to the first number in the path.
+    """
+    match = re.search(r'\.(\d+)\.(\d+)\.pdf$', url)
+    if match:
+        entry, attachment = match.groups()
+        return entry if attachment == "0" else f"{entry}-{attachment}"
+    match = re.search(r'/(\d+)/', url)
+    return match.group(1) if match else str(fallback)
+
+# Link texts that say nothing about the document
+GENERIC_LINK_TEXT = {"", "download", "download pdf", "pdf", "view", "view pdf", "buy on pacer"}
+
+def safe_name(text, length=50):
+    return "".join(c for c in text if c.isalnum() or c in (' ', '-', '_'))[:length].strip()
+
+def pdf_filename(case_prefix, doc_num, description, pdf_url):
+    """File name of a docket PDF: case, entry number, description and a short hash of its URL
+
+    The hash keeps links apart that share an entry number and description,
+    e.g. non-RECAP links numbered by the first number in their path.
+    """
+    url_hash = hashlib.sha256(pdf_url.encode('utf-8')).hexdigest()[:8]
+    return f"{case_prefix}_{doc_num}_{safe_name(description) or 'Document'}_{url_hash}.pdf"
+
+class HttpDocketFetcher:
+    """Fetch docket pages and their PDFs over plain HTTP
+
+    Downloads go through http_download.download_file() (temp file,
+    resume, revalidation) into the content-addressed BlobStore, and every
+    fetched PDF URL is recorded in epstein_documents/fetch_log.jsonl so
+    re-runs skip it.
+    """
+
+    def __init__(self, output_dir="epstein_documents", concurrency=4, rate=2.0, limiter=None):
+        self.output_dir = Path(output_dir)
+        self.pdfs_dir = self.output_dir / "pdfs"
+        self.pdfs_dir.mkdir(parents=True, exist_ok=True)
+
+        self.concurrency = max(1, concurrency)
+        self.limiter = limiter or TokenBucket(rate)
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': 'EpsteinDocumentResearch/1.0 (Educational Research)'
+        })
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.ledger = DownloadLedger(self.output_dir / "fetch_log.jsonl")
+        self.store = BlobStore(self.output_dir / "blobs")
+        # Paths being downloaded to right now, so two downloads never share one
+        self.reserved = set()
+        self.reserved_lock = threading.Lock()
+
+    def reserve_path(self, path):
+        """path, or path_2, path_3... if a file or another download already has it"""
+        candidate = path
+        n = 1
+        with self.reserved_lock:
+            while candidate in self.reserved or candidate.exists():
+                n += 1
+                candidate = path.with_name(f"{path.stem}_{n}{path.suffix}")
+            self.reserved.add(candidate)
+        return candidate
+
+    def get_page(self, url):
+        """Return a page's HTML, or None if it could not be fetched"""
+        try:
+            response = polite_get(self.session, url, self.limiter, timeout=30)
+        except Exception as e:
+            print(f"   ⚠️  {url}: {e}")
+            return None
+        if response.status_code != 200:
+            print(f"   ⚠️  {url}: status {response.status_code}")
+            return None
+        return response.text
+
+    def search_dockets(self, search_url, blacklist=()):
+        """Docket URLs from a search results page, or None if it needs a browser"""
+        html = self.get_page(search_url)
+        if html is None:
+            return None
+        dockets = parse_search_results(html, search_url, blacklist)
+        if not dockets and needs_browser(html):
+            print(f"   🤖 {search_url} is asking for a CAPTCHA")
+            return None
+        return dockets
+
+    def fetch_docket(self, docket_url):
+        """Download every PDF on a docket (all result pages)
+
+        Returns {"case_name", "downloaded", "failed"}, or None if a page
+        could not be fetched or is a bot check, so the caller can fall
+        back to a browser.
+        """
+        pdf_links = []
+        seen_links = set()
+        seen_pages = set()
+        case_name = None
+        url = docket_url
+        while url and url not in seen_pages:
+            seen_pages.add(url)
+            html = self.get_page(url)
+            if html is None:
+                return None
+            page = parse_docket_page(html, url)
+            if not page["pdf_links"] and needs_browser(html):
+                print(f"   🤖 {url} is asking for a CAPTCHA")
+                return None
+            case_name = case_name or page["case_name"]
+            for link in page["pdf_links"]:
+                if link[0] not in seen_links:
+                    seen_links.add(link[0])
+                    pdf_links.append(link)
+            url = page["next_page"]
+
+        print(f"📋 Case: {case_name}")
+        print(f"📄 Found {len(pdf_links)} PDF documents")
+        prefix = safe_name(case_name.replace(' ', '_'), 40) or "Unknown_Case"
+
+        def fetch(numbered_link):
+            i, (pdf_url, text) = numbered_link
+            return self.download_pdf(pdf_url, prefix, document_number(pdf_url, i), text)
+
+        downloaded = failed = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for ok in executor.map(fetch, enumerate(pdf_links, 1)):
+                if ok is True:
+                    downloaded += 1
+                elif ok is False:
+                    failed += 1
+        self.ledger.sync()
+        return {"case_name": case_name, "downloaded": downloaded, "failed": failed}
+
+    def download_pdf(self, pdf_url, case_prefix, doc_num, text):
+        """Download one PDF; True if new, None if already had it, False on failure"""
+        if pdf_url in self.ledger:
+            return None
+
+        description = text if text.lower() not in GENERIC_LINK_TEXT else "Document"
+        filename = pdf_filename(case_prefix, doc_num, description, pdf_url)
+        # Never write over an existing file: download next to it, then keep
+        # the new file only if its content differs
+        wanted_path = self.pdfs_dir / filename
+        output_path = self.reserve_path(wanted_path)
+        try:
+            result = download_file(self.session, pdf_url, output_path, self.limiter)
+            if result["status"] == "failed":
+                print(f"   ❌ #{doc_num}: {result['error']}")
+                return False
+            if output_path != wanted_path:
+                if wanted_path.exists() and sha256_file(output_path) == sha256_file(wanted_path):
+                    output_path.unlink()
+                    output_path = wanted_path
+                else:
+                    print(f"   ⚠️  #{doc_num}: {filename} already holds other content; saved as {output_path.name}")
+                    filename = output_path.name
+        finally:
+            with self.reserved_lock:
+                self.reserved.discard(output_path)
+
+        try:
+            sha256, duplicate = self.store.adopt(output_path)
+        except OSError as e:
+            # The PDF stays in pdfs/; it isn't recorded, so the next run retries it
+            print(f"   ❌ #{doc_num}: could not file {filename} into the blob store: {e}")
+            return False
+        self.ledger.add({
+            'id': pdf_url,
+            'filename': filename,
+            'case': case_prefix,
+            'entry_number': doc_num,
+            'description': description,
+            'downloaded_at': datetime.now().isoformat(),
+            'bytes': result['bytes'],
+            'sha256': sha256,
+            'etag': result['etag'],
+            'last_modified': result['last_modified']
+        })
+        print(f"   ✅ #{doc_num}: {filename}{' (duplicate, stored once)' if duplicate else ''}")
+        return True
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Download every PDF on CourtListener dockets over plain HTTP")
+    parser.add_argument("dockets", nargs="+", help="docket page URLs")
+    parser.add_argument("--concurrency", type=int, default=4, help="PDFs to download at once (default: 4)")
+    parser.add_argument("--rate", type=float, default=2.0, help="maximum requests per second (default: 2)")
+    args = parser.parse_args()
+
+    fetcher = HttpDocketFetcher(concurrency=args.concurrency, rate=args.rate)
+    with METRICS.stage("download"):
+        for docket_url in args.dockets:
+            print(f"\n📂 Processing: {docket_url}")
+            result = fetcher.fetch_docket(docket_url)
+            if result is None:
+                print("   ⚠️  This docket needs a browser; use download_all_epstein.py for it")
+            else:
+                print(f"   ✅ {result['downloaded']} downloaded, {result['failed']} failed")
+    fetcher.ledger.close()
+    finish_run("http_fetcher")
+
+if __name__ == "__main__":
+    main()
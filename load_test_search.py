@@ -0,0 +1,158 @@
+"""
+Load Test for search_service.py
+
+Keeps a number of HTTP/1.1 connections busy sending search requests to a
+running search service for a fixed time and reports the sustained
+requests/sec, latency percentiles, errors and the service's cache hit
+rate over the run.
+
+Queries are drawn with a Zipf skew (a few hot queries, a long tail of
+rare ones), like real search traffic: by default from topical terms of
+this collection, or one query per line from --queries.
+
+Usage:
+    python search_service.py                        # first, in another terminal
+    python load_test_search.py                      # 32 connections for 20s
+    python load_test_search.py --connections 64 --duration 60 --queries queries.txt
+
+Start the service with --cache-size 0 to measure throughput without the cache.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from urllib.parse import urlencode, urlsplit
+
+DEFAULT_QUERIES = [
+    "maxwell", "epstein", "flight", "island", "deposition", "giuffre", "palm beach",
+    "new york", "massage", "recruit", "pilot", "passenger", "exhibit", "testimony",
+    "flight logs", "little st. james", "virginia", "lolita express", "sealed", "redacted",
+    "plaintiff", "defendant", "witness", "subpoena", "privilege", "confidential",
+    "telephone", "message pad", "photograph", "contact book", "zorro ranch", "new mexico",
+    "london", "paris", "prince", "assistant", "house manager", "employee", "police report",
+    "detective", "grand jury", "non-prosecution agreement", "victim", "minor", "school",
+    "money", "payment", "bank", "email", "transcript"
+]
+
+async def fetch(reader, writer, host, path):
+    """Send one GET on an open connection; returns (status, body)"""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed by the service")
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode('latin-1').partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+async def client(host, port, queries, cumulative, deadline, seed, args, latencies, errors):
+    """One connection sending requests back to back until the deadline"""
+    rng = random.Random(seed)
+    reader = writer = None
+    while time.monotonic() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            params = {"q": rng.choices(queries, cum_weights=cumulative)[0], "per_page": args.per_page}
+            if args.exact:
+                params["exact"] = 1
+            t0 = time.perf_counter()
+            status, _ = await fetch(reader, writer, host, f"/api/search?{urlencode(params)}")
+            latencies.append((time.perf_counter() - t0) * 1000)
+            if status != 200:
+                errors.append(status)
+        except (ConnectionError, asyncio.IncompleteReadError, OSError) as e:
+            errors.append(type(e).__name__)
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            await asyncio.sleep(0.05)
+    if writer is not None:
+        writer.close()
+
+async def get_stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        _, body = await fetch(reader, writer, host, "/api/stats")
+        return json.loads(body)
+    finally:
+        writer.close()
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+async def run(args):
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    if args.queries:
+        with open(args.queries, 'r', encoding='utf-8') as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        queries = list(DEFAULT_QUERIES)
+    cumulative = []
+    total = 0.0
+    for rank in range(1, len(queries) + 1):
+        total += 1 / rank ** args.zipf
+        cumulative.append(total)
+
+    before = await get_stats(host, port)
+    print(f"Service: {before['documents']:,} documents, cache {before['cache']['maxEntries']:,} queries")
+    print(f"Load: {args.connections} connections for {args.duration:g}s, {len(queries)} queries (Zipf s={args.zipf:g})")
+
+    latencies = []
+    errors = []
+    started = time.monotonic()
+    deadline = started + args.duration
+    await asyncio.gather(*(client(host, port, queries, cumulative, deadline, args.seed + n, args,
+                                  latencies, errors)
+                           for n in range(args.connections)))
+    elapsed = time.monotonic() - started
+    after = await get_stats(host, port)
+
+    hits = after["cache"]["hits"] - before["cache"]["hits"]
+    lookups = hits + after["cache"]["misses"] - before["cache"]["misses"]
+    print("\n" + "="*60)
+    print("📊 LOAD TEST RESULTS")
+    print("="*60)
+    print(f"   Requests:   {len(latencies):,} in {elapsed:.1f}s")
+    print(f"   Sustained:  {len(latencies) / elapsed:,.1f} requests/s")
+    if latencies:
+        print(f"   Latency:    p50 {statistics.median(latencies):.1f} ms, p95 {percentile(latencies, 0.95):.1f} ms, "
+              f"p99 {percentile(latencies, 0.99):.1f} ms, max {max(latencies):.1f} ms")
+    print(f"   Cache hits: {hits / lookups:.1%} of {lookups:,} searches" if lookups else "   Cache hits: -")
+    print(f"   Errors:     {len(errors)}" + (f" ({', '.join(sorted(set(map(str, errors))))})" if errors else ""))
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Load test a running search_service.py")
+    parser.add_argument("--url", default="http://127.0.0.1:8081", help="service address")
+    parser.add_argument("--connections", type=int, default=32, help="concurrent connections (default: 32)")
+    parser.add_argument("--duration", type=float, default=20, help="seconds to run (default: 20)")
+    parser.add_argument("--queries", help="file with one query per line (default: built-in topical terms)")
+    parser.add_argument("--zipf", type=float, default=1.0, help="skew of the query mix (default: 1.0)")
+    parser.add_argument("--exact", action="store_true", help="send exact-phrase searches")
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print("\n⏱️  SEARCH SERVICE LOAD TEST")
+    print("="*60)
+    try:
+        asyncio.run(run(args))
+    except (ConnectionError, OSError) as e:
+        print(f"❌ Could not reach {args.url}: {e}")
+        print("Start it first: python search_service.py")
+
+if __name__ == "__main__":
+    main()
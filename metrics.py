@@ -0,0 +1,272 @@
+"""
+Run Metrics for the Downloaders and the Text Extractor
+
+One process-wide registry (METRICS) of counters and timing histograms
+that the download and extraction code records into as it works: requests
+and retries, time spent waiting on the rate limiter, bytes and seconds per
+download, milliseconds per extracted file and per page. At the end of a
+run the scripts print a summary report and export the numbers, both as a
+line of JSON appended to epstein_documents/metrics.jsonl (one line per
+run, easy to compare across nights) and in Prometheus text format in
+epstein_documents/metrics.prom (for a node_exporter textfile collector).
+
+Histograms use fixed buckets like Prometheus does, so recording a value is
+constant time and memory no matter how many files a run processes.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+METRICS_DIR = "epstein_documents"
+
+# Upper bounds (seconds) of the timing histogram buckets
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+def label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+class Histogram:
+    """Count, sum, min, max and bucket counts of observed values"""
+
+    def __init__(self, buckets=TIME_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """Estimate the q-quantile by interpolating inside its bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, bound in enumerate(self.buckets):
+            if self.counts[i] and seen + self.counts[i] >= rank:
+                estimate = lower + (bound - lower) * (rank - seen) / self.counts[i]
+                return min(max(estimate, self.min), self.max)
+            seen += self.counts[i]
+            lower = bound
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts))
+        }
+
+class Metrics:
+    """Thread-safe registry of labelled counters and histograms
+
+    Names follow Prometheus conventions: counters end in _total, timings
+    are in seconds.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.stages = {}
+        self.started = time.time()
+
+    def count(self, name, value=1, **labels):
+        """Add value to a counter"""
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Record one value (usually seconds) in a histogram"""
+        key = (name, label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Time the body of a with block into a histogram"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    @contextmanager
+    def stage(self, name):
+        """Time a whole stage of the run (download, extract, index ...)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(name, time.perf_counter() - started)
+
+    def record_stage(self, name, seconds):
+        with self.lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def counter_value(self, name, **labels):
+        """Sum of a counter over every label set matching labels"""
+        wanted = set(labels.items())
+        with self.lock:
+            return sum(value for (metric, key), value in self.counters.items()
+                       if metric == name and wanted <= set(key))
+
+    def histogram(self, name):
+        """All label sets of a histogram merged into one"""
+        merged = Histogram()
+        with self.lock:
+            for (metric, _), histogram in self.histograms.items():
+                if metric != name:
+                    continue
+                merged.counts = [a + b for a, b in zip(merged.counts, histogram.counts)]
+                merged.count += histogram.count
+                merged.sum += histogram.sum
+                if histogram.min is not None:
+                    merged.min = histogram.min if merged.min is None else min(merged.min, histogram.min)
+                    merged.max = histogram.max if merged.max is None else max(merged.max, histogram.max)
+        return merged
+
+    def snapshot(self):
+        """Everything recorded so far, as a JSON-serialisable dict"""
+        with self.lock:
+            return {
+                "started": datetime.fromtimestamp(self.started).isoformat(),
+                "seconds": round(time.time() - self.started, 3),
+                "stages": {name: round(seconds, 3) for name, seconds in self.stages.items()},
+                "counters": [{"name": name, "labels": dict(key), "value": value}
+                             for (name, key), value in sorted(self.counters.items())],
+                "histograms": [{"name": name, "labels": dict(key), **histogram.snapshot()}
+                               for (name, key), histogram in sorted(self.histograms.items())]
+            }
+
+    def prometheus_text(self):
+        """Everything recorded so far in the Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            typed = set()
+            for (name, key), value in sorted(self.counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                lines.append(f"{name}{format_labels(key)} {value}")
+            for (name, key), histogram in sorted(self.histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} histogram")
+                    typed.add(name)
+                cumulative = 0
+                for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{format_labels(key, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(key)} {histogram.sum}")
+                lines.append(f"{name}_count{format_labels(key)} {histogram.count}")
+            if self.stages:
+                lines.append("# TYPE stage_seconds gauge")
+                for name, seconds in sorted(self.stages.items()):
+                    lines.append(f'stage_seconds{{stage="{name}"}} {seconds:.3f}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, run_name, directory=METRICS_DIR):
+        """Append this run to metrics.jsonl and rewrite metrics.prom"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        record = {"run": run_name, **self.snapshot()}
+        with open(directory / "metrics.jsonl", 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + "\n")
+        prom_file = directory / "metrics.prom"
+        tmp_file = prom_file.with_suffix('.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        tmp_file.replace(prom_file)
+        return directory / "metrics.jsonl"
+
+    def report(self):
+        """Print where the time of this run went"""
+        print("\n📈 RUN METRICS")
+        print("-"*60)
+        for name, seconds in self.stages.items():
+            print(f"   ⏱️  {name}: {seconds:.1f}s")
+
+        requests_sent = self.counter_value("http_requests_total")
+        if requests_sent:
+            retries = self.counter_value("http_retries_total")
+            waited = self.histogram("rate_limit_wait_seconds").sum
+            throttled = self.counter_value("http_throttled_seconds_total")
+            print(f"   🌐 HTTP requests: {requests_sent} ({retries} retried after 429/503)")
+            print(f"      Waiting on the rate limit: {waited:.1f}s, told to back off: {throttled:.1f}s")
+            print_timing("      Response time", self.histogram("http_request_seconds"))
+
+        downloads = self.histogram("download_seconds")
+        files = self.counter_value("downloads_total")
+        if files:
+            downloaded_bytes = self.counter_value("download_bytes_total")
+            elapsed = self.stages.get("download") or downloads.sum
+            print(f"   ⬇️  Files downloaded: {self.counter_value('downloads_total', status='downloaded')}"
+                  f", unchanged: {self.counter_value('downloads_total', status='not_modified')}"
+                  f", failed: {self.counter_value('downloads_total', status='failed')}")
+            print(f"      {downloaded_bytes / 1e6:.1f} MB at {downloaded_bytes / max(elapsed, 1e-9) / 1e6:.2f} MB/s"
+                  f", {files / max(elapsed, 1e-9):.2f} files/s")
+            print_timing("      Per file", downloads)
+
+        files = self.histogram("extract_file_seconds")
+        if files.count:
+            elapsed = self.stages.get("extract") or files.sum
+            cached = self.counter_value("extract_cache_hits_total")
+            print(f"   📄 Files extracted: {files.count} ({cached} more from cache)"
+                  f", {files.count / max(elapsed, 1e-9):.2f} files/s")
+            print_timing("      Per file", files)
+            print_timing("      Per page", self.histogram("extract_page_seconds"))
+            by_backend = {}
+            with self.lock:
+                for (metric, key), value in self.counters.items():
+                    if metric == "extract_pages_total":
+                        backend = dict(key).get("backend", "unknown")
+                        by_backend[backend] = by_backend.get(backend, 0) + value
+            if by_backend:
+                print("      Pages read with: " + ", ".join(f"{name} {count}" for name, count in sorted(by_backend.items())))
+        print("-"*60)
+
+def print_timing(label, histogram):
+    if histogram.count:
+        print(f"{label}: p50 {histogram.quantile(0.5) * 1000:.0f} ms, "
+              f"p95 {histogram.quantile(0.95) * 1000:.0f} ms, max {histogram.max * 1000:.0f} ms")
+
+# The registry every module records into
+METRICS = Metrics()
+
+def finish_run(run_name):
+    """Print the report and export the metrics of this run"""
+    METRICS.report()
+    path = METRICS.export(run_name)
+    print(f"📈 Metrics saved to: {Path(path).absolute()} (and metrics.prom)")
@@ -0,0 +1,185 @@
+"""
+Near-Duplicate Detection for the Epstein Documents
+
+The same exhibit or deposition is often filed again under another docket
+entry, with a new stamp or cover page, so its PDF differs and isn't caught
+as an identical file. NearDuplicateFinder spots such documents by their
+text: each document gets a MinHash signature over its 5-word shingles
+(one-permutation MinHash: every shingle is hashed once), and LSH banding
+puts documents that share a band of the signature in the same bucket, so
+a new document is only compared with the few that collide with it
+instead of with every document seen so far.
+
+process_all_pdfs.py runs it as documents are written. A document whose
+text is at least THRESHOLD similar (estimated Jaccard similarity of the
+shingles) to an earlier one gets "duplicateOf": <id of the earliest
+document of its group>, the canonical one. Every document is still
+indexed; search collapses the matching members of a group into one result
+that lists the others.
+The mapping is also saved as duplicates.json next to the output:
+    {
+      "version": 1,
+      "threshold": <similarity>,
+      "canonical": {"<duplicate doc id>": <canonical doc id>, ...}
+    }
+
+Usage (report the near-duplicates in an existing build):
+    python near_duplicates.py
+    python near_duplicates.py --corpus corpus/ --threshold 0.9
+"""
+
+import argparse
+import hashlib
+import json
+from pathlib import Path
+
+from search_index import tokenize
+
+SHINGLE_WORDS = 5
+NUM_HASHES = 128
+# LSH bands of NUM_HASHES // BANDS values each; two documents collide in
+# at least one band with high probability well below THRESHOLD
+BANDS = 32
+THRESHOLD = 0.8
+# Documents with fewer shingles (cover sheets, notices) are never merged
+MIN_SHINGLES = 50
+
+DUPLICATES_FILE = "duplicates.json"
+DUPLICATES_VERSION = 1
+
+# Hashes are 64-bit; the low bits pick the bin, the rest are compared
+BIN_VALUES = 1 << (64 - (NUM_HASHES - 1).bit_length())
+
+def minhash_signature(text):
+    """MinHash signature (NUM_HASHES ints) of a text's word shingles, or None if it is too short"""
+    tokens = tokenize(text)
+    shingles = len(tokens) - SHINGLE_WORDS + 1
+    if shingles < MIN_SHINGLES:
+        return None
+
+    bins = [None] * NUM_HASHES
+    for i in range(shingles):
+        shingle = " ".join(tokens[i:i + SHINGLE_WORDS]).encode('utf-8')
+        value = int.from_bytes(hashlib.blake2b(shingle, digest_size=8).digest(), 'little')
+        slot, value = value % NUM_HASHES, value // NUM_HASHES
+        if bins[slot] is None or value < bins[slot]:
+            bins[slot] = value
+
+    # Empty bins borrow the next filled bin's value (densification), shifted
+    # by the distance so borrowed values can only equal borrowed values
+    signature = list(bins)
+    for slot in range(NUM_HASHES):
+        if bins[slot] is None:
+            distance = 1
+            while bins[(slot + distance) % NUM_HASHES] is None:
+                distance += 1
+            signature[slot] = bins[(slot + distance) % NUM_HASHES] + distance * BIN_VALUES
+    return signature
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of the shingles behind two signatures"""
+    return sum(a == b for a, b in zip(signature, other)) / NUM_HASHES
+
+class NearDuplicateFinder:
+    """Group documents with nearly the same text, as they are added"""
+
+    def __init__(self, threshold=THRESHOLD, bands=BANDS):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = NUM_HASHES // bands
+        self.buckets = {}
+        self.signatures = {}
+        self.canonical = {}
+
+    def add(self, doc):
+        """Check a document against the ones added before it
+
+        Sets (or clears) doc["duplicateOf"] and returns the canonical doc
+        id, or None if the document isn't a near-duplicate.
+        """
+        doc.pop("duplicateOf", None)
+        signature = minhash_signature(doc["content"])
+        if signature is None:
+            return None
+
+        keys = [(band, hash(tuple(signature[band * self.rows:(band + 1) * self.rows])))
+                for band in range(self.bands)]
+        match = None
+        checked = set()
+        for key in keys:
+            for other in self.buckets.get(key, ()):
+                if other in checked:
+                    continue
+                checked.add(other)
+                if similarity(signature, self.signatures[other]) >= self.threshold:
+                    match = other
+                    break
+            if match is not None:
+                break
+
+        doc_id = doc["id"]
+        for key in keys:
+            self.buckets.setdefault(key, []).append(doc_id)
+        self.signatures[doc_id] = signature
+        if match is None:
+            return None
+        canonical = self.canonical[doc_id] = self.canonical.get(match, match)
+        doc["duplicateOf"] = canonical
+        return canonical
+
+    def groups(self):
+        """{canonical doc id: [duplicate doc ids]}"""
+        groups = {}
+        for doc_id, canonical in self.canonical.items():
+            groups.setdefault(canonical, []).append(doc_id)
+        return groups
+
+    def save(self, path):
+        """Write the duplicate -> canonical mapping as JSON"""
+        path = Path(path)
+        data = {
+            "version": DUPLICATES_VERSION,
+            "threshold": self.threshold,
+            "canonical": {str(doc_id): canonical for doc_id, canonical in sorted(self.canonical.items())}
+        }
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        tmp_path.replace(path)
+        return path
+
+def main():
+    """Main function"""
+    from search_engine import default_corpus_path, load_corpus
+
+    parser = argparse.ArgumentParser(description="Find near-duplicate documents in a build")
+    parser.add_argument("--corpus", help="documents.json or a sharded corpus directory (default: the site's)")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help=f"estimated text similarity that counts as a duplicate (default: {THRESHOLD})")
+    parser.add_argument("--limit", type=int, default=10, help="groups to list (default: 10)")
+    args = parser.parse_args()
+
+    path = Path(args.corpus) if args.corpus else default_corpus_path()
+    documents = load_corpus(path)
+    print(f"\n🧬 NEAR-DUPLICATE DETECTION ({len(documents)} documents, similarity >= {args.threshold:g})")
+    print("="*60)
+
+    finder = NearDuplicateFinder(args.threshold)
+    by_id = {}
+    for doc in documents:
+        doc = dict(doc)
+        finder.add(doc)
+        by_id[doc["id"]] = doc
+
+    groups = sorted(finder.groups().items(), key=lambda group: -len(group[1]))
+    duplicate_chars = sum(len(by_id[doc_id]["content"]) for _, copies in groups for doc_id in copies)
+    total_chars = sum(len(doc["content"]) for doc in documents)
+    print(f"Groups: {len(groups)}, duplicates: {len(finder.canonical)} documents, "
+          f"{duplicate_chars / 1e6:.2f} MB of {total_chars / 1e6:.2f} MB of text")
+    for canonical, copies in groups[:args.limit]:
+        print(f"\n📄 {by_id[canonical]['title']}  (#{canonical}, {len(copies)} cop{'ies' if len(copies) != 1 else 'y'})")
+        for doc_id in copies:
+            print(f"   - #{doc_id} {by_id[doc_id]['source']}: {by_id[doc_id]['title'][:60]}")
+
+if __name__ == "__main__":
+    main()
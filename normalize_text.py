@@ -0,0 +1,110 @@
+"""
+Text Normalization for Extracted Court Documents
+
+Every page of a federal filing repeats the same stamps and running heads,
+e.g. "Case 1:15-cv-07433-LAP Document 1320-12 Filed 01/03/24 Page 3 of 40",
+and extracted text breaks words and spacing along the PDF's layout. Left
+in, they inflate documents.json and the indexes, show up as search hits
+and fill the chat's context.
+
+normalize_pages() runs on a document's page texts between extraction and
+output (process_all_pdfs.py):
+    - lines repeated at the top or bottom of most pages (stamps, running
+      heads, page numbers) are removed, and so are ECF filing stamps on
+      any page; what was removed is kept as metadata instead
+    - words hyphenated across a line break are joined
+    - runs of spaces are collapsed and blank lines squeezed
+
+The extraction cache keeps the raw text, so normalization can change
+without extracting anything again.
+"""
+
+import re
+
+# Lines this far from the top or bottom of a page can be running heads
+EDGE_LINES = 3
+
+# A line is boilerplate when it repeats on this share of the pages with
+# text (and on at least MIN_PAGES of them)
+MIN_SHARE = 0.5
+MIN_PAGES = 3
+
+# Stamp of the federal courts' electronic filing system (CM/ECF)
+ECF_STAMP_RE = re.compile(
+    r"Case\s+(?P<case>\d+:\d{2}-[a-z]{2,4}-\d+(?:-[A-Z]+)*)\s+Document\s+(?P<document>[\d-]+)\s+"
+    r"Filed\s+(?P<filed>\d{1,2}/\d{1,2}/\d{2,4})\s+Page\s+\d+\s+of\s+\d+(?:\s+Page\s*ID\s*#?:?\s*\d+)?",
+    re.IGNORECASE
+)
+
+HYPHENATED_RE = re.compile(r"([a-z])-\n([a-z])")
+SPACES_RE = re.compile(r"[^\S\n]+")
+BLANK_LINES_RE = re.compile(r"\n{3,}")
+DIGITS_RE = re.compile(r"\d+")
+
+def line_key(line):
+    """What repeats of a line have in common: case, spacing and numbers (page 3 of 40) aside"""
+    return DIGITS_RE.sub("#", " ".join(line.split()).lower())
+
+def edge_lines(lines):
+    """Indexes of the first and last few non-blank lines of a page
+
+    Up to EDGE_LINES at each end, and no more than a third of the page's
+    lines, so the body of a short page isn't taken for its margins.
+    """
+    filled = [i for i, line in enumerate(lines) if line.strip()]
+    count = min(EDGE_LINES, max(1, len(filled) // 3))
+    return sorted(set(filled[:count] + filled[-count:]))
+
+def clean_text(text):
+    """Join hyphenated line breaks and collapse whitespace"""
+    text = "\n".join(SPACES_RE.sub(" ", line).strip() for line in text.split("\n"))
+    text = HYPHENATED_RE.sub(r"\1\2", text)
+    return BLANK_LINES_RE.sub("\n\n", text).strip()
+
+def normalize_pages(pages):
+    """Normalize a document's page texts
+
+    Returns (pages, metadata). Pages keep their count and order; a page
+    can end up empty. metadata has "boilerplate", one {"text", "pages"}
+    entry (an example of the line and how many pages had it) per kind of
+    line removed, and "filing" ({"case", "document", "filed"}) from the
+    first ECF stamp, each only if there was any.
+    """
+    page_lines = [(text or "").split("\n") for text in pages]
+    edges = [edge_lines(lines) for lines in page_lines]
+
+    # On how many pages each kind of edge line appears
+    pages_with = {}
+    for lines, indexes in zip(page_lines, edges):
+        for key in {line_key(lines[i]) for i in indexes}:
+            pages_with[key] = pages_with.get(key, 0) + 1
+    with_text = sum(1 for indexes in edges if indexes)
+    threshold = max(MIN_PAGES, MIN_SHARE * with_text)
+    repeated = {key for key, count in pages_with.items() if count >= threshold}
+
+    removed = {}
+    filing = None
+    normalized = []
+    for lines, indexes in zip(page_lines, edges):
+        drop = set()
+        for i in indexes:
+            if line_key(lines[i]) in repeated:
+                drop.add(i)
+        for i, line in enumerate(lines):
+            stamp = ECF_STAMP_RE.fullmatch(line.strip())
+            if stamp:
+                drop.add(i)
+                if filing is None:
+                    filing = {name: stamp.group(name) for name in ("case", "document", "filed")}
+        for key in {line_key(lines[i]) for i in drop}:
+            example = next(" ".join(lines[i].split()) for i in sorted(drop) if line_key(lines[i]) == key)
+            entry = removed.setdefault(key, {"text": example, "pages": 0})
+            entry["pages"] += 1
+        normalized.append(clean_text("\n".join(line for i, line in enumerate(lines) if i not in drop)))
+
+    metadata = {}
+    if removed:
+        metadata["boilerplate"] = sorted(removed.values(), key=lambda entry: -entry["pages"])
+    if filing:
+        metadata["filing"] = filing
+    return normalized, metadata
@@ -0,0 +1,99 @@
+"""
+OCR for Scanned Pages, with a Page-Level Cache
+
+Many filings are scanned images with no text layer, so extraction gets
+nothing out of them. PageOcr renders such a page with PDFium and reads it
+with a local Tesseract (the `tesseract` command, https://github.com/tesseract-ocr/tesseract).
+The text is cached in epstein_documents/ocr_cache/ under a hash of what
+the page shows (its embedded scan and anything drawn over it), so a page
+is never OCRed twice, even when the same scan is filed again inside
+another PDF, and a cached page isn't even rendered.
+
+process_all_pdfs.py --ocr uses it for pages without a text layer only;
+its worker processes OCR several documents at once.
+
+Requirements:
+    Tesseract (apt install tesseract-ocr / brew install tesseract) and pillow
+"""
+
+import hashlib
+import io
+import os
+import shutil
+import subprocess
+from pathlib import Path
+
+from pdf_backends import available_backends
+
+OCR_CACHE_DIR = "epstein_documents/ocr_cache"
+DEFAULT_DPI = 300
+DEFAULT_LANGUAGE = "eng"
+
+def tesseract_available(command="tesseract"):
+    return shutil.which(command) is not None
+
+def page_ocr_for(workers, language=DEFAULT_LANGUAGE):
+    """A PageOcr for a run with `workers` extraction processes, or None (with a warning) if OCR can't run here"""
+    if not tesseract_available():
+        print("⚠️  OCR needs Tesseract (apt install tesseract-ocr / brew install tesseract); skipping OCR")
+        return None
+    if "pdfium" not in available_backends():
+        print("⚠️  OCR needs pypdfium2 to render pages: pip install pypdfium2; skipping OCR")
+        return None
+    # Each worker OCRs its own document; Tesseract only gets threads of its
+    # own when there is a single worker
+    ocr = PageOcr(language=language, threads=1 if workers > 1 else (os.cpu_count() or 1))
+    print(f"🔍 OCR for scanned pages ({language}), cached in {ocr.cache_dir}")
+    return ocr
+
+class PageOcr:
+    """OCR rendered pages with Tesseract, caching the text by page hash
+
+    Plain settings only, so it can be handed to extraction worker processes.
+    """
+
+    def __init__(self, cache_dir=OCR_CACHE_DIR, language=DEFAULT_LANGUAGE, dpi=DEFAULT_DPI,
+                 command="tesseract", threads=1):
+        self.cache_dir = Path(cache_dir)
+        self.language = language
+        self.dpi = dpi
+        self.command = command
+        # Tesseract's own threads; 1 when documents are already OCRed in parallel
+        self.threads = threads
+
+    def cache_path(self, page_digest):
+        """Where the text of a page is cached; the key covers the settings that affect it"""
+        key = hashlib.sha256(f"{self.language}:{self.dpi}:{page_digest}".encode()).hexdigest()
+        return self.cache_dir / key[:2] / f"{key}.txt"
+
+    def page_text(self, page_digest, render, timeout=None):
+        """Text of a page; returns (text, cached)
+
+        page_digest identifies what the page shows (see
+        PdfiumReader.page_digest) and render(dpi) returns it as a PIL image,
+        which is only needed if the page isn't cached yet.
+        """
+        cache_path = self.cache_path(page_digest)
+        if cache_path.exists():
+            return cache_path.read_text(encoding='utf-8'), True
+
+        text = self.run_tesseract(render(self.dpi), timeout)
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(text, encoding='utf-8')
+        os.replace(tmp_path, cache_path)
+        return text, False
+
+    def run_tesseract(self, image, timeout=None):
+        """OCR one image; raises RuntimeError if Tesseract fails"""
+        png = io.BytesIO()
+        image.save(png, format="PNG")
+        env = dict(os.environ, OMP_THREAD_LIMIT=str(self.threads))
+        result = subprocess.run(
+            [self.command, "stdin", "stdout", "-l", self.language, "--dpi", str(self.dpi)],
+            input=png.getvalue(), capture_output=True, timeout=timeout, env=env
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"tesseract failed: {result.stderr.decode('utf-8', 'replace').strip()[:200]}")
+        # Tesseract ends each page with a form feed
+        return result.stdout.decode('utf-8', 'replace').strip()
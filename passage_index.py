@@ -0,0 +1,210 @@
+"""
+Passage Index for the Epstein Documents Search Tool
+
+Splits every document into overlapping passages at extraction time and
+stores per-passage term statistics, so the chat can fetch the few
+passages that best answer a question (BM25 over passages) instead of
+sending the first characters of whole documents.
+
+Index file format (gzipped JSON):
+    {
+      "version": 1,
+      "documents": <number of documents indexed>,
+      "passageWords": <words per passage>,
+      "overlapWords": <words shared by neighbouring passages>,
+      "docs": [<doc id of each passage>, ...],
+      "starts": [<character offset where the passage starts>, ...],
+      "ends": [<character offset where the passage ends>, ...],
+      "pages": [<1-based page of the passage start, 0 if unknown>, ...],
+      "lengths": [<number of terms in the passage>, ...],
+      "terms": {"<term>": "<base64 postings>", ...}
+    }
+
+Terms are the same as in search_index.py. Each term's postings are
+unsigned LEB128 varints:
+    passage_delta, term_frequency
+repeated for every passage containing the term, in increasing passage
+order (passage numbers as deltas from the previous one, the first from 0).
+
+"documents" lets readers tell whether the index belongs to the corpus
+they loaded; an index written before it was added has none and doesn't
+match any corpus.
+"""
+
+import base64
+import bisect
+import gzip
+import json
+import math
+import os
+from pathlib import Path
+
+from search_index import TOKEN_RE, decode_varints, encode_varint, tokenize
+
+PASSAGE_INDEX_VERSION = 1
+
+# Roughly a paragraph of a court filing per passage
+PASSAGE_WORDS = 120
+OVERLAP_WORDS = 30
+
+# BM25 parameters, as in search_engine.py
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+def split_passages(content, passage_words=PASSAGE_WORDS, overlap_words=OVERLAP_WORDS):
+    """Yield (start, end, terms) for overlapping passages of content"""
+    words = list(TOKEN_RE.finditer(content))
+    step = passage_words - overlap_words
+    for first in range(0, max(len(words) - overlap_words, 1), step):
+        window = words[first:first + passage_words]
+        if not window:
+            break
+        yield window[0].start(), window[-1].end(), [m.group().lower() for m in window]
+
+class PassageIndex:
+    """Term statistics for document passages, built in memory or loaded from disk"""
+
+    def __init__(self, passage_words=PASSAGE_WORDS, overlap_words=OVERLAP_WORDS):
+        self.passage_words = passage_words
+        self.overlap_words = overlap_words
+        self.documents = 0
+        self.docs = []
+        self.starts = []
+        self.ends = []
+        self.pages = []
+        self.lengths = []
+        self.terms = {}
+        self.last_passage = {}
+
+    def add(self, doc):
+        """Split a document into passages and index them"""
+        self.documents += 1
+        page_offsets = doc.get("pageOffsets") or []
+        for start, end, terms in split_passages(doc["content"], self.passage_words, self.overlap_words):
+            passage = len(self.docs)
+            self.docs.append(doc["id"])
+            self.starts.append(start)
+            self.ends.append(end)
+            self.pages.append(bisect.bisect_right(page_offsets, start) if page_offsets else 0)
+            self.lengths.append(len(terms))
+
+            frequencies = {}
+            for term in terms:
+                frequencies[term] = frequencies.get(term, 0) + 1
+            for term, tf in frequencies.items():
+                out = self.terms.get(term)
+                if out is None:
+                    out = self.terms[term] = bytearray()
+                encode_varint(passage - self.last_passage.get(term, 0), out)
+                encode_varint(tf, out)
+                self.last_passage[term] = passage
+
+    def postings(self, term):
+        """Return {passage: term frequency} for a term"""
+        encoded = self.terms.get(term)
+        if encoded is None:
+            return {}
+        if isinstance(encoded, str):
+            encoded = base64.b64decode(encoded)
+        numbers = decode_varints(encoded)
+        postings = {}
+        passage = 0
+        for delta in numbers:
+            passage += delta
+            postings[passage] = next(numbers)
+        return postings
+
+    def top_passages(self, query, k=5):
+        """The k best passages for a query by BM25, as
+        [{"doc", "start", "end", "page", "score"}], at most one per
+        overlapping stretch of a document"""
+        total = len(self.docs)
+        if not total:
+            return []
+        average_length = sum(self.lengths) / total
+
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.postings(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for passage, tf in postings.items():
+                norm = 1 - BM25_B + BM25_B * self.lengths[passage] / average_length
+                scores[passage] = scores.get(passage, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+
+        results = []
+        for passage in sorted(scores, key=lambda p: (-scores[p], p)):
+            # Neighbouring passages share text; keep only the best of them
+            if any(r["doc"] == self.docs[passage] and r["start"] < self.ends[passage]
+                   and self.starts[passage] < r["end"] for r in results):
+                continue
+            results.append({
+                "doc": self.docs[passage],
+                "start": self.starts[passage],
+                "end": self.ends[passage],
+                "page": self.pages[passage] or None,
+                "score": scores[passage]
+            })
+            if len(results) == k:
+                break
+        return results
+
+    def save(self, path):
+        """Write the index as gzipped JSON"""
+        index = {
+            "version": PASSAGE_INDEX_VERSION,
+            "documents": self.documents,
+            "passageWords": self.passage_words,
+            "overlapWords": self.overlap_words,
+            "docs": self.docs,
+            "starts": self.starts,
+            "ends": self.ends,
+            "pages": self.pages,
+            "lengths": self.lengths,
+            "terms": {
+                term: encoded if isinstance(encoded, str) else base64.b64encode(encoded).decode('ascii')
+                for term, encoded in sorted(self.terms.items())
+            }
+        }
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=9) as f:
+            json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def matches(self, documents):
+        """True if the index was built from these documents (a list of docs)"""
+        ids = {doc["id"] for doc in documents}
+        return self.documents == len(documents) and all(doc_id in ids for doc_id in set(self.docs))
+
+    @classmethod
+    def load(cls, path):
+        """Load an index file written by save()"""
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") != PASSAGE_INDEX_VERSION:
+            raise ValueError(f"Unsupported passage index version: {data.get('version')}")
+        index = cls(data["passageWords"], data["overlapWords"])
+        index.documents = data.get("documents")
+        index.docs = data["docs"]
+        index.starts = data["starts"]
+        index.ends = data["ends"]
+        index.pages = data["pages"]
+        index.lengths = data["lengths"]
+        index.terms = data["terms"]
+        return index
+
+class PassageIndexWriter:
+    """Corpus writer that builds a PassageIndex and saves it on close()"""
+
+    def __init__(self, output_file):
+        self.output_path = Path(output_file)
+        self.index = PassageIndex()
+
+    def add(self, doc):
+        self.index.add(doc)
+
+    def close(self):
+        self.index.save(self.output_path)
@@ -0,0 +1,179 @@
+"""
+PDF Text Backends for process_all_pdfs.py
+
+pdfplumber works out the position and font of every character on a page
+before it assembles the text, which is far more than a plain court filing
+needs. PDFium (pypdfium2, already installed as a pdfplumber dependency)
+reads the text layer directly and is many times faster. The "auto"
+backend reads every page with PDFium and only falls back to pdfplumber
+for pages where that comes back empty or garbled although the page does
+have text on it. Pages with no text layer at all (scans) are left to
+ocr.py.
+
+Each backend is a context manager over one open PDF:
+
+    with open_backend("pdfium", path) as reader:
+        for index in range(len(reader)):
+            text = reader.page_text(index)
+"""
+
+import hashlib
+import unicodedata
+
+try:
+    import pypdfium2
+    import pypdfium2.raw as pdfium_raw
+except ImportError:
+    pypdfium2 = None
+
+import pdfplumber
+
+BACKEND_CHOICES = ("auto", "pdfium", "pdfplumber")
+DEFAULT_BACKEND = "auto"
+
+# Share of non-space characters that may be unprintable before a page's
+# text counts as garbled (broken font encodings come out as these)
+GARBLED_RATIO = 0.05
+
+class PdfplumberReader:
+    """Text of each page, laid out by pdfplumber"""
+
+    name = "pdfplumber"
+
+    def __init__(self, path):
+        self.pdf = pdfplumber.open(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.pdf.close()
+
+    def __len__(self):
+        return len(self.pdf.pages)
+
+    def page_text(self, index):
+        page = self.pdf.pages[index]
+        try:
+            return page.extract_text() or ""
+        finally:
+            # Drop the cached layout objects; they dominate memory on long PDFs
+            page.close()
+
+    def has_text(self, index):
+        return bool(self.pdf.pages[index].chars)
+
+    def has_images(self, index):
+        return bool(self.pdf.pages[index].images)
+
+class PdfiumReader:
+    """Text of each page straight from the text layer, via PDFium"""
+
+    name = "pdfium"
+
+    def __init__(self, path):
+        self.pdf = pypdfium2.PdfDocument(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.pdf.close()
+
+    def __len__(self):
+        return len(self.pdf)
+
+    def page_text(self, index):
+        page = self.pdf[index]
+        try:
+            textpage = page.get_textpage()
+            try:
+                text = textpage.get_text_range()
+            finally:
+                textpage.close()
+        finally:
+            page.close()
+        # PDFium uses Windows line endings and marks hyphens at line ends with \x02
+        return text.replace("\r\n", "\n").replace("\r", "\n").replace("\x02", "-")
+
+    def has_objects(self, index, kind):
+        page = self.pdf[index]
+        try:
+            for _ in page.get_objects(filter=[kind], max_depth=2):
+                return True
+            return False
+        finally:
+            page.close()
+
+    def has_text(self, index):
+        """True if the page has text objects (a scanned page has none)"""
+        return self.has_objects(index, pdfium_raw.FPDF_PAGEOBJ_TEXT)
+
+    def has_images(self, index):
+        return self.has_objects(index, pdfium_raw.FPDF_PAGEOBJ_IMAGE)
+
+    def page_digest(self, index):
+        """SHA-256 of what a scanned page shows, without rendering it
+
+        Covers the page size and rotation, every embedded image as stored
+        with its placement, and the position of everything else on the page
+        (redaction boxes drawn over a scan, for instance).
+        """
+        page = self.pdf[index]
+        try:
+            digest = hashlib.sha256(repr((page.get_size(), page.get_rotation())).encode())
+            for obj in page.get_objects(max_depth=2):
+                if obj.type == pdfium_raw.FPDF_PAGEOBJ_IMAGE:
+                    digest.update(repr(obj.get_matrix().get()).encode())
+                    digest.update(bytes(obj.get_data()))
+                else:
+                    digest.update(repr((obj.type, obj.get_pos())).encode())
+            return digest.hexdigest()
+        finally:
+            page.close()
+
+    def render(self, index, dpi):
+        """The page as a greyscale PIL image at dpi (needs pillow)"""
+        page = self.pdf[index]
+        try:
+            bitmap = page.render(scale=dpi / 72, grayscale=True)
+            try:
+                # to_pil() shares the bitmap's buffer, which close() frees
+                return bitmap.to_pil().copy()
+            finally:
+                bitmap.close()
+        finally:
+            page.close()
+
+READERS = {
+    "pdfium": PdfiumReader,
+    "pdfplumber": PdfplumberReader
+}
+
+def available_backends():
+    """Backends that can run here (PDFium needs pypdfium2)"""
+    return [name for name in READERS if name != "pdfium" or pypdfium2 is not None]
+
+def primary_backend(backend):
+    """The reader that goes through every page for a backend choice"""
+    if backend == "auto":
+        return "pdfium" if pypdfium2 is not None else "pdfplumber"
+    if backend == "pdfium" and pypdfium2 is None:
+        raise ImportError("the pdfium backend needs pypdfium2: pip install pypdfium2")
+    return backend
+
+def open_backend(name, path):
+    return READERS[name](path)
+
+def looks_garbled(text):
+    """True if too much of text is unprintable (replacement, private-use or control characters)"""
+    chars = [c for c in text if not c.isspace()]
+    if not chars:
+        return False
+    bad = sum(1 for c in chars
+              if c == "�" or unicodedata.category(c) in ("Cc", "Co", "Cs", "Cn"))
+    return bad / len(chars) > GARBLED_RATIO
+
+def needs_fallback(text):
+    """True if a fast-path page should be read again with pdfplumber"""
+    return not text.strip() or looks_garbled(text)
@@ -4,40 +4,457 @@ Batch PDF Text Extractor for Epstein Documents
 Processes all downloaded PDFs and creates a complete documents.json database.
 
 Requirements:
-    pip install pdfplumber
+    pip install pdfplumber     # also installs pypdfium2, the fast text backend
 
 Usage:
     python process_all_pdfs.py
+    python process_all_pdfs.py --workers 16    # extract in parallel
+    python process_all_pdfs.py --force         # ignore the extraction cache
+    python process_all_pdfs.py --restart       # ignore an interrupted run's checkpoint
+    python process_all_pdfs.py --format sharded  # corpus/ manifest + content shards
+    python process_all_pdfs.py --format sqlite   # documents.db with an FTS5 index
+    python process_all_pdfs.py --timeout 120 --max-memory-mb 1024  # tighter budget per PDF
+    python process_all_pdfs.py --backend pdfplumber   # slow layout-aware extraction for every page
+    python process_all_pdfs.py --workers 0 --ocr      # OCR scanned pages too (needs tesseract)
+
+Extracted text is cached in epstein_documents/text_cache/ (one file per PDF
+SHA-256) and tracked in epstein_documents/extraction_manifest.json, so a
+rebuild only re-extracts new or changed PDFs. Progress is appended to
+documents_checkpoint.jsonl as it happens; if a run is interrupted or
+crashes, the next run picks up where it left off.
+
+Each PDF is extracted in an isolated worker process (see extraction_pool.py)
+with a time limit per document and per page and a memory limit per worker.
+A PDF that exceeds them, or crashes its worker, is quarantined with a
+reason code in the manifest and skipped on later runs (--retry-quarantined
+tries again), so one pathological exhibit can't hold up a rebuild.
+
+With --ocr, pages that have no text layer (scans) are OCRed with Tesseract
+(see ocr.py); the text of each page is cached, so no page is OCRed twice.
+
+Before a document is written its text is normalized (see normalize_text.py):
+stamps and running heads repeated on its pages are moved into the
+document's "boilerplate" and "filing" fields, hyphenated line breaks are
+joined and whitespace is collapsed. --no-normalize keeps the raw text.
+
+Documents whose text nearly repeats an earlier one (the same exhibit filed
+again under another entry) are marked "duplicateOf" the earlier one and
+listed in duplicates.json (see near_duplicates.py); search shows each group
+of them as one result. --no-dedupe leaves them unmarked.
+
+A positional inverted index (search_index.json.gz, see search_index.py) is
+written next to the output so the site can find matching documents without
+scanning them all. --no-index skips it and deletes the one an earlier build
+left there, which would describe other documents.
 """
 
-import pdfplumber
+import argparse
+import hashlib
 import json
 import os
+import time
+from contextlib import ExitStack
+from functools import partial
 from pathlib import Path
 from datetime import datetime
 from tqdm import tqdm
 
-def extract_text_from_pdf(pdf_path):
-    """Extract all text from a PDF file"""
+from corpus_writers import DocumentsJsonWriter, ShardedCorpusWriter, SqliteCorpusWriter
+from search_index import InvertedIndexWriter
+from passage_index import PassageIndexWriter
+from pdf_backends import (BACKEND_CHOICES, DEFAULT_BACKEND, available_backends, needs_fallback,
+                          open_backend, primary_backend)
+from extraction_pool import (DEFAULT_MEMORY_MB, DEFAULT_PAGE_TIMEOUT, DEFAULT_TIMEOUT,
+                             ExtractionPool, PageTimeout, page_time_limit)
+from metrics import METRICS, finish_run
+from ocr import page_ocr_for
+from normalize_text import normalize_pages
+from near_duplicates import DUPLICATES_FILE, NearDuplicateFinder
+
+MANIFEST_FILE = "epstein_documents/extraction_manifest.json"
+TEXT_CACHE_DIR = "epstein_documents/text_cache"
+CHECKPOINT_FILE = "documents_checkpoint.jsonl"
+
+def sha256_file(path):
+    """Return the hex SHA-256 of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ExtractionCache:
+    """Manifest of extracted PDFs plus their cached text, keyed by SHA-256
+    
+    The manifest records size, mtime and hash for every PDF path, so an
+    unchanged file is recognised from a stat() call without re-hashing it.
+    Text lives in text_cache/<sha256>.json together with its page offsets;
+    files that yielded no text are remembered as "failed", and files that
+    blew their extraction budget as "quarantined" (with a reason code), so
+    they aren't retried on every run.
+    """
+    
+    def __init__(self, manifest_file=MANIFEST_FILE, cache_dir=TEXT_CACHE_DIR):
+        self.manifest_file = Path(manifest_file)
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.files = self.load_manifest()
+        self.seen = set()
+    
+    def load_manifest(self):
+        """Load the manifest of previously extracted files"""
+        if self.manifest_file.exists():
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f).get("files", {})
+        return {}
+    
+    def save_manifest(self):
+        """Save the manifest, dropping PDFs that weren't seen this run"""
+        files = {key: entry for key, entry in self.files.items() if key in self.seen}
+        tmp_file = self.manifest_file.with_suffix('.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                "lastUpdated": datetime.now().isoformat(),
+                "files": files
+            }, f, indent=2)
+        os.replace(tmp_file, self.manifest_file)
+    
+    def fingerprint(self, pdf_file):
+        """Return the SHA-256 of pdf_file, re-hashing only if size/mtime changed"""
+        key = str(pdf_file)
+        stat = os.stat(pdf_file)
+        self.seen.add(key)
+        
+        entry = self.files.get(key)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+            return entry["sha256"]
+        
+        sha256 = sha256_file(pdf_file)
+        same = entry and entry["sha256"] == sha256
+        self.files[key] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "sha256": sha256,
+            "status": entry["status"] if same else None
+        }
+        if same and entry.get("quarantine"):
+            self.files[key]["quarantine"] = entry["quarantine"]
+        return sha256
+    
+    def text_path(self, sha256):
+        return self.cache_dir / f"{sha256}.json"
+    
+    def lookup(self, pdf_file, retry_quarantined=False, ocr=False):
+        """Return (hit, extracted) for pdf_file; extracted is None for known failures
+
+        With ocr set, PDFs that came out empty or with scanned pages left
+        unread are misses, so they are extracted again with OCR.
+        """
+        entry = self.files[str(pdf_file)]
+        if entry["status"] == "failed":
+            return not ocr, None
+        if entry["status"] == "quarantined" and not retry_quarantined:
+            return True, None
+        
+        text_path = self.text_path(entry["sha256"])
+        if text_path.exists():
+            with open(text_path, 'r', encoding='utf-8') as f:
+                extracted = json.load(f)
+            if ocr and "image" in extracted.get("pageBackends", []):
+                return False, None
+            return True, extracted
+        return False, None
+    
+    def store(self, pdf_file, extracted):
+        """Record the extraction result for pdf_file"""
+        entry = self.files[str(pdf_file)]
+        if extracted:
+            text_path = self.text_path(entry["sha256"])
+            tmp_path = text_path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(extracted, f, ensure_ascii=False)
+            os.replace(tmp_path, text_path)
+            entry["status"] = "ok"
+        else:
+            entry["status"] = "failed"
+        entry.pop("quarantine", None)
+    
+    def quarantine(self, pdf_file, reason, detail):
+        """Record that pdf_file blew its extraction budget, so later runs skip it"""
+        entry = self.files[str(pdf_file)]
+        entry["status"] = "quarantined"
+        entry["quarantine"] = {"reason": reason, "detail": detail,
+                               "at": datetime.now().isoformat()}
+    
+    def quarantine_reason(self, pdf_file):
+        """The reason code pdf_file was quarantined with, or None"""
+        entry = self.files.get(str(pdf_file))
+        if entry and entry["status"] == "quarantined":
+            return entry["quarantine"]["reason"]
+        return None
+
+class CheckpointLog:
+    """Append-only JSONL log of finished files, used to resume a crashed run
+    
+    The first line identifies the set of PDFs being processed; every
+    following line records one finished file. Lines are fsynced in batches,
+    and a torn final line from a crash is discarded on load.
+    """
+    
+    def __init__(self, pdf_files, path=CHECKPOINT_FILE, batch_size=100):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.fingerprint = self.fingerprint_files(pdf_files)
+        self.unsynced = 0
+        self.file = None
+    
+    @staticmethod
+    def fingerprint_files(pdf_files):
+        """Hash the file list (names, sizes, mtimes) this checkpoint belongs to"""
+        digest = hashlib.sha256()
+        for pdf_file in pdf_files:
+            stat = os.stat(pdf_file)
+            digest.update(f"{pdf_file}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8'))
+        return digest.hexdigest()
+    
+    def open(self, resume=True):
+        """Open the log, returning the indexes finished by a previous run"""
+        self.finished = set()
+        self.valid_size = 0
+        
+        if resume and self.path.exists():
+            with open(self.path, 'rb') as f:
+                header = None
+                size = 0
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # Torn write from a crash
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    if header is None:
+                        header = record
+                        if header.get("fingerprint") != self.fingerprint:
+                            break
+                    else:
+                        self.finished.add(record["index"])
+                    size += len(line)
+            if header is not None and header.get("fingerprint") == self.fingerprint:
+                self.valid_size = size
+            else:
+                self.finished = set()
+        
+        if self.valid_size:
+            self.file = open(self.path, 'r+b')
+            self.file.truncate(self.valid_size)
+            self.file.seek(self.valid_size)
+        else:
+            self.file = open(self.path, 'wb')
+            self.write({"checkpoint": 1, "fingerprint": self.fingerprint})
+            self.sync()
+        return self.finished
+    
+    def replay(self):
+        """Yield the records finished by a previous run, one at a time"""
+        if not self.valid_size:
+            return
+        with open(self.path, 'rb') as f:
+            f.readline()  # Header
+            while f.tell() < self.valid_size:
+                yield json.loads(f.readline())
+    
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        self.file.write(line.encode('utf-8'))
+    
+    def append(self, record):
+        """Append a record; returns True when a batch was synced to disk"""
+        self.write(record)
+        self.unsynced += 1
+        if self.unsynced >= self.batch_size:
+            self.sync()
+            return True
+        return False
+    
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+    
+    def close(self, complete):
+        """Close the log, deleting it if the run finished"""
+        self.sync()
+        self.file.close()
+        if complete:
+            self.path.unlink()
+
+def read_page(reader, index, page_timeout):
+    """Text of one page, or "" if it fails or takes longer than page_timeout seconds"""
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            full_text = ""
-            for page_num, page in enumerate(pdf.pages, 1):
-                try:
-                    text = page.extract_text()
-                    if text:
-                        full_text += text + "\n\n"
-                except Exception as page_error:
-                    # Skip problematic pages but continue with rest of document
-                    print(f"      ⚠️  Skipping page {page_num}: {str(page_error)[:50]}")
-                    continue
-            return full_text.strip() if full_text.strip() else None
-    except KeyboardInterrupt:
-        raise  # Allow user to stop with Ctrl+C
+        with page_time_limit(page_timeout):
+            return reader.page_text(index)
+    except MemoryError:
+        raise  # The whole document is over budget
+    except PageTimeout:
+        print(f"      ⏱️  Skipping page {index + 1}: took longer than {page_timeout}s")
+    except Exception as page_error:
+        # Skip problematic pages but continue with rest of document
+        print(f"      ⚠️  Skipping page {index + 1}: {str(page_error)[:50]}")
+    return ""
+
+def ocr_page(ocr, renderer, index, page_timeout):
+    """OCR a scanned page; returns (text, backend used)
+
+    The backend is "ocr", "ocr-cache" if the page was OCRed before, or
+    "image" if OCR failed.
+    """
+    try:
+        with page_time_limit(page_timeout):
+            text, cached = ocr.page_text(renderer.page_digest(index),
+                                         partial(renderer.render, index), timeout=page_timeout)
+        return text, "ocr-cache" if cached else "ocr"
+    except MemoryError:
+        raise
+    except PageTimeout:
+        print(f"      ⏱️  Skipping OCR of page {index + 1}: took longer than {page_timeout}s")
+    except Exception as ocr_error:
+        print(f"      ⚠️  Skipping OCR of page {index + 1}: {str(ocr_error)[:50]}")
+    return "", "image"
+
+def extract_pages(pdf_path, page_timings=None, page_timeout=None, backend=DEFAULT_BACKEND, ocr=None):
+    """Extract the text of each page of a PDF file ("" for pages without text)
+
+    backend is "pdfium", "pdfplumber" or "auto" (PDFium, with pdfplumber
+    for pages PDFium can't read; see pdf_backends.py). Scanned pages (images
+    without a text layer) are OCRed with ocr, a PageOcr, if one is given.
+    If page_timings is a list, a (backend used, seconds) pair is appended
+    to it for each page; scanned pages that weren't OCRed count as "image".
+    A page that takes longer than page_timeout seconds is skipped.
+    """
+    primary = primary_backend(backend)
+    try:
+        with ExitStack() as stack:
+            try:
+                reader = stack.enter_context(open_backend(primary, pdf_path))
+            except (KeyboardInterrupt, MemoryError):
+                raise
+            except Exception:
+                if backend != "auto" or primary == "pdfplumber":
+                    raise
+                # PDFium rejects some damaged files that pdfplumber can repair
+                primary = "pdfplumber"
+                reader = stack.enter_context(open_backend(primary, pdf_path))
+            fallback = None
+            renderer = reader if primary == "pdfium" else None
+            
+            pages = []
+            for index in range(len(reader)):
+                started = time.perf_counter()
+                used = primary
+                text = read_page(reader, index, page_timeout)
+                if needs_fallback(text):
+                    if not reader.has_text(index):
+                        if reader.has_images(index):
+                            used = "image"
+                            if ocr is not None:
+                                if renderer is None:
+                                    renderer = stack.enter_context(open_backend("pdfium", pdf_path))
+                                text, used = ocr_page(ocr, renderer, index, page_timeout)
+                    elif backend == "auto" and primary != "pdfplumber":
+                        if fallback is None:
+                            fallback = stack.enter_context(open_backend("pdfplumber", pdf_path))
+                        used = "pdfplumber"
+                        text = read_page(fallback, index, page_timeout)
+                pages.append(text)
+                if page_timings is not None:
+                    page_timings.append((used, time.perf_counter() - started))
+            return pages
+    except (KeyboardInterrupt, MemoryError):
+        raise  # Allow user to stop with Ctrl+C; let the worker report running out of memory
     except Exception as e:
         print(f"      ❌ Error: {str(e)[:100]}")
         return None
 
+def join_pages(pages):
+    """Join page texts into one content string
+
+    Returns (content, page_offsets), where page_offsets[n] is the character
+    offset in content at which page n + 1 starts. Pages without text start
+    where the next page does.
+    """
+    raw = ""
+    offsets = []
+    for text in pages:
+        offsets.append(len(raw))
+        if text:
+            raw += text + "\n\n"
+    
+    content = raw.strip()
+    leading = len(raw) - len(raw.lstrip())
+    offsets = [min(max(0, offset - leading), len(content)) for offset in offsets]
+    return content, offsets
+
+def extract_document(pdf_path, page_timings=None, page_timeout=None, backend=DEFAULT_BACKEND, ocr=None):
+    """Extract a PDF into {"content", "pageOffsets"}, or None if it has no text"""
+    if page_timings is None:
+        page_timings = []
+    pages = extract_pages(pdf_path, page_timings, page_timeout, backend, ocr)
+    if not pages:
+        return None
+    content, page_offsets = join_pages(pages)
+    if not content:
+        return None
+    # Which backend read each page stays in the text cache; it isn't
+    # copied into the corpus
+    return {"content": content, "pageOffsets": page_offsets,
+            "pageBackends": [used for used, _ in page_timings]}
+
+def split_pages(content, page_offsets):
+    """Undo join_pages(): the text of each page"""
+    ends = page_offsets[1:] + [len(content)]
+    return [content[start:end] for start, end in zip(page_offsets, ends)]
+
+def normalize_document(extracted):
+    """Normalize an extracted document's text (see normalize_text.py)
+
+    Returns a new {"content", "pageOffsets", ...} with the "boilerplate" and
+    "filing" metadata that was found, or the document unchanged if nothing
+    but boilerplate would be left of it.
+    """
+    pages, metadata = normalize_pages(split_pages(extracted["content"], extracted["pageOffsets"]))
+    content, page_offsets = join_pages(pages)
+    if not content:
+        return extracted
+    return {"content": content, "pageOffsets": page_offsets, **metadata}
+
+def extract_document_timed(pdf_path, page_timeout=None, backend=DEFAULT_BACKEND, ocr=None):
+    """extract_document() plus its timings, for recording in the parent process
+
+    Returns (extracted, seconds, page_timings). Worker processes have their
+    own copy of METRICS, so they hand the timings back instead.
+    """
+    started = time.perf_counter()
+    page_timings = []
+    extracted = extract_document(pdf_path, page_timings, page_timeout, backend, ocr)
+    return extracted, time.perf_counter() - started, page_timings
+
+def record_extraction(result):
+    """Record the timings of one ExtractionPool result in METRICS"""
+    METRICS.observe("extract_file_seconds", result["seconds"])
+    for used, page_time in result["page_timings"]:
+        METRICS.observe("extract_page_seconds", page_time, backend=used)
+        METRICS.count("extract_pages_total", backend=used)
+    if result["reason"]:
+        METRICS.count("extract_files_total", status="quarantined", reason=result["reason"])
+    else:
+        METRICS.count("extract_files_total", status="ok" if result["extracted"] else "failed")
+
+def extract_text_from_pdf(pdf_path):
+    """Extract all text from a PDF file"""
+    extracted = extract_document(pdf_path)
+    return extracted["content"] if extracted else None
+
 def parse_filename(filename):
     """Parse information from filename"""
     # Format: CaseName_EntryNum_Description.pdf
@@ -49,7 +466,78 @@ def parse_filename(filename):
     
     return case_name, entry_num, description
 
-def process_all_pdfs(pdfs_dir="epstein_documents/pdfs", output_file="documents.json"):
+def drop_duplicates(pdf_files, cache=None):
+    """Split pdf_files into distinct PDFs and (duplicate, original) pairs
+
+    The same filing is often downloaded under several names; only the
+    first file (in sorted order) with a given SHA-256 is processed.
+    """
+    first_by_sha = {}
+    unique = []
+    duplicates = []
+    for pdf_file in pdf_files:
+        sha256 = cache.fingerprint(pdf_file) if cache is not None else sha256_file(pdf_file)
+        if sha256 in first_by_sha:
+            duplicates.append((pdf_file, first_by_sha[sha256]))
+        else:
+            first_by_sha[sha256] = pdf_file
+            unique.append(pdf_file)
+    return unique, duplicates
+
+def iter_extracted(pdf_files, workers=1, cache=None, force=False, timeout=DEFAULT_TIMEOUT,
+                   page_timeout=DEFAULT_PAGE_TIMEOUT, memory_mb=DEFAULT_MEMORY_MB,
+                   retry_quarantined=False, backend=DEFAULT_BACKEND, ocr=None):
+    """Yield (pdf_file, extracted, cached, reason) tuples in input order
+
+    Files already in the cache are served from it (unless force is set);
+    the rest are extracted in isolated worker processes (see
+    extraction_pool.py). reason is the quarantine reason code of a PDF that
+    blew its budget now or on an earlier run, else None. Results are
+    always yielded in the order of pdf_files so document ids stay
+    deterministic.
+    """
+    cached = {}
+    if cache is not None:
+        for pdf_file in pdf_files:
+            cache.fingerprint(pdf_file)
+            if not force:
+                hit, extracted = cache.lookup(pdf_file, retry_quarantined, ocr is not None)
+                if hit:
+                    cached[pdf_file] = extracted
+    
+    pending = [pdf_file for pdf_file in pdf_files if pdf_file not in cached]
+    if cache is not None:
+        print(f"♻️  {len(cached)} files unchanged since last run, {len(pending)} to extract\n")
+    
+    pool = ExtractionPool(partial(extract_document_timed, backend=backend, ocr=ocr), min(workers, max(len(pending), 1)),
+                          timeout, page_timeout, memory_mb)
+    results = pool.imap(pending)
+    
+    try:
+        for pdf_file in pdf_files:
+            if pdf_file in cached:
+                METRICS.count("extract_cache_hits_total")
+                reason = cache.quarantine_reason(pdf_file) if cache is not None else None
+                yield pdf_file, cached[pdf_file], True, reason
+                continue
+            
+            _, result = next(results)
+            record_extraction(result)
+            if cache is not None:
+                if result["reason"]:
+                    cache.quarantine(pdf_file, result["reason"], result["detail"])
+                else:
+                    cache.store(pdf_file, result["extracted"])
+            yield pdf_file, result["extracted"], False, result["reason"]
+    finally:
+        # Stop the workers, abandoning queued files if we stopped early (Ctrl+C)
+        pool.close()
+
+def process_all_pdfs(pdfs_dir="epstein_documents/pdfs", output_file="documents.json", workers=1,
+                     use_cache=True, force=False, resume=True, output_format="json", corpus_dir="corpus",
+                     build_index=True, timeout=DEFAULT_TIMEOUT, page_timeout=DEFAULT_PAGE_TIMEOUT,
+                     memory_mb=DEFAULT_MEMORY_MB, retry_quarantined=False, backend=DEFAULT_BACKEND,
+                     ocr=None, normalize=True, dedupe=True):
     """Process all PDFs and create documents.json"""
     
     pdfs_path = Path(pdfs_dir)
@@ -59,134 +547,255 @@ def process_all_pdfs(pdfs_dir="epstein_documents/pdfs", output_file="documents.j
         print("Run download_all_documents.py first!")
         return
     
-    # Find all PDFs
-    pdf_files = list(pdfs_path.glob("*.pdf"))
+    # Find all PDFs (sorted so ids are stable between runs)
+    pdf_files = sorted(pdfs_path.glob("*.pdf"))
     
     if not pdf_files:
         print(f"❌ No PDF files found in {pdfs_path}")
         return
     
     print(f"\n📚 Found {len(pdf_files)} PDF files")
+    
+    failed = []
+    quarantined = {}
+    stats = CorpusStats()
+    # UTF-8 bytes of this run's documents before and after normalization
+    raw_bytes = normalized_bytes = 0
+    cache = ExtractionCache() if use_cache else None
+    
+    # Identical PDFs are extracted and indexed once
+    pdf_files, duplicates = drop_duplicates(pdf_files, cache)
+    if duplicates:
+        print(f"🧬 Skipping {len(duplicates)} duplicate PDFs (same content as another file)")
+    
     print("🔄 Extracting text from all documents...")
+    if workers > 1:
+        print(f"⚡ Using {workers} worker processes")
     print("(This may take a while)\n")
+    envelope = {
+        "lastUpdated": datetime.now().strftime("%Y-%m-%d"),
+        "source": "Official court documents from CourtListener.com",
+        "disclaimer": "All documents are publicly available official court records"
+    }
+    if output_format == "sharded":
+        writer = ShardedCorpusWriter(corpus_dir, envelope)
+        index_file = Path(corpus_dir) / "search_index.json.gz"
+        passage_file = Path(corpus_dir) / "passages.json.gz"
+        duplicates_file = Path(corpus_dir) / DUPLICATES_FILE
+    elif output_format == "sqlite":
+        # The database's own full-text index stands in for the JSON indexes
+        writer = SqliteCorpusWriter(Path(output_file).with_suffix(".db"), envelope)
+        build_index = False
+        duplicates_file = Path(output_file).with_name(DUPLICATES_FILE)
+    else:
+        writer = DocumentsJsonWriter(output_file, envelope)
+        index_file = Path(output_file).with_name("search_index.json.gz")
+        passage_file = Path(output_file).with_name("passages.json.gz")
+        duplicates_file = Path(output_file).with_name(DUPLICATES_FILE)
     
-    documents = []
-    failed = []
+    # Every output receives each finished document in id order
+    writers = [writer]
+    if build_index:
+        writers.append(InvertedIndexWriter(index_file))
+        writers.append(PassageIndexWriter(passage_file))
+    # Marks near-duplicates before the outputs store them
+    finder = NearDuplicateFinder() if dedupe else None
+    
+    # Pick up where an interrupted run left off
+    checkpoint = CheckpointLog(pdf_files)
+    finished = checkpoint.open(resume)
+    if finished:
+        print(f"⏩ Resuming from checkpoint: {len(finished)} files already processed\n")
+        for record in checkpoint.replay():
+            if record.get("reason"):
+                quarantined[record["filename"]] = record["reason"]
+            elif record.get("failed"):
+                failed.append(record["filename"])
+            else:
+                if finder is not None:
+                    finder.add(record["document"])
+                for w in writers:
+                    w.add(record["document"])
+                stats.add(record["document"])
+    
+    remaining = [(i, pdf_file) for i, pdf_file in enumerate(pdf_files, 1) if i not in finished]
+    if cache is not None:
+        # Keep already-processed files in the manifest
+        for i, pdf_file in enumerate(pdf_files, 1):
+            if i in finished:
+                cache.fingerprint(pdf_file)
     
     # Process each PDF
-    for i, pdf_file in enumerate(pdf_files, 1):
-        print(f"[{i}/{len(pdf_files)}] Processing: {pdf_file.name[:60]}...")
-        
-        try:
-            # Extract text
-            content = extract_text_from_pdf(pdf_file)
+    completed = False
+    extract_started = time.perf_counter()
+    try:
+        extracted = iter_extracted([pdf_file for _, pdf_file in remaining], workers, cache, force,
+                                   timeout, page_timeout, memory_mb, retry_quarantined, backend, ocr)
+        for (i, _), (pdf_file, result, cached, reason) in zip(remaining, extracted):
+            print(f"[{i}/{len(pdf_files)}] Processing: {pdf_file.name[:60]}...")
             
-            if content:
-                # Parse filename for metadata
-                case_name, entry_num, description = parse_filename(pdf_file.name)
-                
-                # Create document entry
-                doc_entry = {
-                    "id": i,
-                    "title": description,
-                    "source": f"{case_name} - Entry #{entry_num}",
-                    "date": "Various",  # Could parse from content if needed
-                    "page": "Multiple",
-                    "content": content,
-                    "filename": pdf_file.name
-                }
+            try:
+                if result:
+                    if normalize:
+                        raw_bytes += len(result["content"].encode('utf-8'))
+                        result = normalize_document(result)
+                        normalized_bytes += len(result["content"].encode('utf-8'))
+                    content = result["content"]
+
+                    # Parse filename for metadata
+                    case_name, entry_num, description = parse_filename(pdf_file.name)
+                    
+                    # Create document entry
+                    doc_entry = {
+                        "id": i,
+                        "title": description,
+                        "source": f"{case_name} - Entry #{entry_num}",
+                        "date": "Various",  # Could parse from content if needed
+                        "page": "Multiple",
+                        "content": content,
+                        "filename": pdf_file.name,
+                        "pageOffsets": result["pageOffsets"]
+                    }
+                    for key in ("boilerplate", "filing"):
+                        if key in result:
+                            doc_entry[key] = result[key]
+                    if finder is not None:
+                        finder.add(doc_entry)
+                    
+                    for w in writers:
+                        w.add(doc_entry)
+                    stats.add(doc_entry)
+                    record = {"index": i, "filename": pdf_file.name, "document": doc_entry}
+                    print(f"   ✅ Extracted {len(content)} characters{' (cached)' if cached else ''}"
+                          + (f", near-duplicate of #{doc_entry['duplicateOf']}" if "duplicateOf" in doc_entry else ""))
+                elif reason:
+                    quarantined[pdf_file.name] = reason
+                    record = {"index": i, "filename": pdf_file.name, "failed": True, "reason": reason}
+                    print(f"   🧪 Quarantined ({reason}){' on an earlier run' if cached else ''}")
+                else:
+                    failed.append(pdf_file.name)
+                    record = {"index": i, "filename": pdf_file.name, "failed": True}
+                    print(f"   ⚠️  Failed to extract text")
                 
-                documents.append(doc_entry)
-                print(f"   ✅ Extracted {len(content)} characters")
-            else:
+                # Checkpoint is synced to disk every 100 files
+                if checkpoint.append(record):
+                    if cache is not None:
+                        cache.save_manifest()
+                    done = writer.count + len(failed) + len(quarantined)
+                    print(f"\n   💾 Checkpoint saved: {done}/{len(pdf_files)} files\n")
+                    
+            except Exception as e:
+                print(f"   ❌ Unexpected error: {str(e)[:100]}")
                 failed.append(pdf_file.name)
-                print(f"   ⚠️  Failed to extract text")
-            
-            # Save checkpoint every 100 files
-            if i % 100 == 0:
-                checkpoint_data = {
-                    "lastUpdated": datetime.now().strftime("%Y-%m-%d"),
-                    "totalDocuments": len(documents),
-                    "source": "Official court documents from CourtListener.com",
-                    "disclaimer": "All documents are publicly available official court records",
-                    "documents": documents,
-                    "checkpoint": f"{i}/{len(pdf_files)} files processed"
-                }
-                with open("documents_checkpoint.json", 'w', encoding='utf-8') as f:
-                    json.dump(checkpoint_data, f, indent=2, ensure_ascii=False)
-                print(f"\n   💾 Checkpoint saved: {i}/{len(pdf_files)} files\n")
-                
-        except KeyboardInterrupt:
-            print("\n\n⚠️  Processing interrupted by user. Saving progress...")
-            break
-        except Exception as e:
-            print(f"   ❌ Unexpected error: {str(e)[:100]}")
-            failed.append(pdf_file.name)
-            continue
-    
-    # Create final JSON structure
-    output_data = {
-        "lastUpdated": datetime.now().strftime("%Y-%m-%d"),
-        "totalDocuments": len(documents),
-        "source": "Official court documents from CourtListener.com",
-        "disclaimer": "All documents are publicly available official court records",
-        "documents": documents
-    }
+                continue
+        completed = True
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Processing interrupted by user. Saving progress...")
+        print(f"   Run again to resume from {checkpoint.path}")
+    finally:
+        checkpoint.close(completed)
+        METRICS.record_stage("extract", time.perf_counter() - extract_started)
+    
+    if cache is not None:
+        cache.save_manifest()
     
-    # Save to JSON
-    output_path = Path(output_file)
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(output_data, f, indent=2, ensure_ascii=False)
+    # Finish the output
+    with METRICS.stage("write"):
+        for w in writers:
+            w.close()
+        if finder is not None:
+            finder.save(duplicates_file)
+        # The site would trust an index from an earlier build and miss or
+        # misplace matches in the new documents
+        if not build_index and output_format != "sqlite":
+            for stale_file in (index_file, passage_file):
+                if stale_file.exists():
+                    stale_file.unlink()
+                    print(f"🗑️  Removed {stale_file.name} left by an earlier build")
+    output_path = writer.output_path
     
     # Print summary
     print("\n" + "="*60)
     print("✅ PROCESSING COMPLETE")
     print("="*60)
-    print(f"Successfully processed: {len(documents)} documents")
+    print(f"Successfully processed: {writer.count} documents")
     print(f"Failed: {len(failed)} documents")
+    print(f"Quarantined: {len(quarantined)} documents")
+    print(f"Duplicates skipped: {len(duplicates)} files")
+    if raw_bytes:
+        saved = raw_bytes - normalized_bytes
+        METRICS.count("normalize_bytes_saved_total", saved)
+        print(f"Normalization saved: {saved / 1e6:.2f} MB of {raw_bytes / 1e6:.2f} MB "
+              f"({saved / raw_bytes:.1%}) of boilerplate and whitespace")
     print(f"\nOutput saved to: {output_path.absolute()}")
+    if finder is not None:
+        print(f"Near-duplicates: {len(finder.canonical)} documents repeating {len(finder.groups())} others "
+              f"(mapping in {duplicates_file.absolute()})")
+    if build_index:
+        print(f"Search index saved to: {index_file.absolute()}")
+        print(f"Passage index saved to: {passage_file.absolute()}")
     
     if failed:
         print("\n⚠️  Failed files:")
         for f in failed:
             print(f"   - {f}")
     
+    if quarantined:
+        print("\n🧪 Quarantined files (over the time/memory budget; --retry-quarantined to try again):")
+        for filename, reason in quarantined.items():
+            print(f"   - [{reason}] {filename}")
+    
     # Save failed list
-    if failed:
+    if failed or quarantined:
         failed_log = Path("epstein_documents/failed_extractions.txt")
         with open(failed_log, 'w') as f:
             f.write("Files that failed text extraction:\n\n")
             for filename in failed:
                 f.write(f"{filename}\n")
+            if quarantined:
+                f.write("\nQuarantined files (reason code, file):\n\n")
+                for filename, reason in quarantined.items():
+                    f.write(f"{reason}\t{filename}\n")
         print(f"\nFailed files logged to: {failed_log.absolute()}")
     
     print(f"\n🎉 Your search tool is now ready!")
-    print(f"   Open index.html in your browser to search all {len(documents)} documents")
+    if output_format == "sqlite":
+        print(f"   Search all {writer.count} documents with: python search_engine.py \"your query\" --corpus {output_path}")
+    else:
+        print(f"   Open index.html in your browser to search all {writer.count} documents")
     
     # Generate statistics
-    generate_statistics(documents)
+    generate_statistics(stats)
 
-def generate_statistics(documents):
-    """Generate statistics about the document collection"""
-    stats_file = Path("epstein_documents/STATISTICS.txt")
+class CorpusStats:
+    """Running totals for STATISTICS.txt, so documents needn't stay in memory"""
     
-    # Count by case
-    by_case = {}
-    total_chars = 0
+    def __init__(self):
+        self.count = 0
+        self.total_chars = 0
+        self.by_case = {}
     
-    for doc in documents:
+    def add(self, doc):
         case = doc['source'].split(' - ')[0] if ' - ' in doc['source'] else "Unknown"
-        if case not in by_case:
-            by_case[case] = 0
-        by_case[case] += 1
-        total_chars += len(doc['content'])
+        if case not in self.by_case:
+            self.by_case[case] = 0
+        self.by_case[case] += 1
+        self.total_chars += len(doc['content'])
+        self.count += 1
+
+def generate_statistics(stats):
+    """Generate statistics about the document collection"""
+    stats_file = Path("epstein_documents/STATISTICS.txt")
+    
+    by_case = stats.by_case
+    total_chars = stats.total_chars
     
     with open(stats_file, 'w', encoding='utf-8') as f:
         f.write("DOCUMENT COLLECTION STATISTICS\n")
         f.write("="*60 + "\n\n")
-        f.write(f"Total Documents: {len(documents)}\n")
+        f.write(f"Total Documents: {stats.count}\n")
         f.write(f"Total Characters: {total_chars:,}\n")
-        f.write(f"Average per Document: {total_chars // len(documents):,} characters\n\n")
+        f.write(f"Average per Document: {total_chars // max(stats.count, 1):,} characters\n\n")
         
         f.write("Documents by Case:\n")
         f.write("-"*40 + "\n")
@@ -201,6 +810,40 @@ def generate_statistics(documents):
 
 def main():
     """Main function"""
+    parser = argparse.ArgumentParser(description="Extract text from all downloaded PDFs")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of extraction processes (default: 1, 0 = one per CPU core)")
+    parser.add_argument("--force", action="store_true",
+                        help="re-extract every PDF, ignoring the extraction cache")
+    parser.add_argument("--restart", action="store_true",
+                        help="start over instead of resuming an interrupted run")
+    parser.add_argument("--format", choices=["json", "sharded", "sqlite"], default="json",
+                        help="json: a single documents.json; sharded: corpus/manifest.json "
+                             "plus gzipped content shards loaded on demand; sqlite: documents.db "
+                             "with a full-text index (see sqlite_corpus.py)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help=f"seconds one PDF may take before it is quarantined (default: {DEFAULT_TIMEOUT})")
+    parser.add_argument("--page-timeout", type=float, default=DEFAULT_PAGE_TIMEOUT,
+                        help=f"seconds one page may take before it is skipped (default: {DEFAULT_PAGE_TIMEOUT})")
+    parser.add_argument("--max-memory-mb", type=int, default=DEFAULT_MEMORY_MB,
+                        help=f"memory limit of each extraction process (default: {DEFAULT_MEMORY_MB}, 0 = none)")
+    parser.add_argument("--retry-quarantined", action="store_true",
+                        help="try quarantined PDFs again instead of skipping them")
+    parser.add_argument("--backend", choices=BACKEND_CHOICES, default=DEFAULT_BACKEND,
+                        help="auto: fast PDFium text layer, pdfplumber for pages it can't read (default); "
+                             "pdfium or pdfplumber: only that one")
+    parser.add_argument("--ocr", action="store_true",
+                        help="OCR scanned pages that have no text layer (needs tesseract and pillow)")
+    parser.add_argument("--ocr-lang", default="eng",
+                        help="Tesseract language(s) for --ocr, e.g. eng+fra (default: eng)")
+    parser.add_argument("--no-normalize", action="store_true",
+                        help="keep page stamps, running heads and the raw spacing in the text")
+    parser.add_argument("--no-dedupe", action="store_true",
+                        help="don't mark near-duplicate documents, so search lists every copy")
+    parser.add_argument("--no-index", action="store_true",
+                        help="skip building search_index.json.gz and passages.json.gz (and delete old ones)")
+    args = parser.parse_args()
+    
     print("\n📄 EPSTEIN DOCUMENTS - TEXT EXTRACTION")
     print("="*60)
     print("Processing all downloaded PDFs...")
@@ -212,8 +855,18 @@ def main():
         print("✅ Using tqdm for progress bars")
     except ImportError:
         print("⚠️  Install tqdm for better progress tracking: pip install tqdm")
+    if "pdfium" not in available_backends() and args.backend == "auto":
+        print("⚠️  Install pypdfium2 for much faster extraction: pip install pypdfium2")
     
-    process_all_pdfs()
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    ocr = page_ocr_for(workers, args.ocr_lang) if args.ocr else None
+    process_all_pdfs(workers=workers, force=args.force, resume=not args.restart,
+                     output_format=args.format, build_index=not args.no_index,
+                     timeout=args.timeout, page_timeout=args.page_timeout,
+                     memory_mb=args.max_memory_mb, retry_quarantined=args.retry_quarantined,
+                     backend=args.backend, ocr=ocr, normalize=not args.no_normalize,
+                     dedupe=not args.no_dedupe)
+    finish_run("process_all_pdfs")
 
 if __name__ == "__main__":
     main()
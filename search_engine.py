@@ -0,0 +1,521 @@
+"""
+Epstein Documents Search Engine
+
+Python version of the site's search (searchDocuments() in app.js) over the
+corpus built by process_all_pdfs.py, so queries can be run and benchmarked
+outside the browser. Supports the same exact/flexible and case-insensitive
+modes, narrows each query with the inverted index from search_index.py, and
+can rank results with BM25 instead of raw match counts. Match offsets also
+come from the index (no document is scanned to find them), and
+highlight_excerpt() cuts a highlighted snippet from them.
+
+Usage:
+    python search_engine.py "ghislaine maxwell"
+    python search_engine.py "flight logs" --exact
+    python search_engine.py "deposition island" --rank bm25 --limit 20
+    python search_engine.py "Maxwell" --case-sensitive --corpus corpus/
+    python search_engine.py "who flew to the island" --passages
+    python search_engine.py '"flight logs" depos*' --corpus documents.db   # SQLite FTS5 build
+"""
+
+import argparse
+import bisect
+import gzip
+import html
+import json
+import math
+import re
+from pathlib import Path
+
+from passage_index import PassageIndex
+from search_index import InvertedIndex, tokenize
+from sqlite_corpus import SqliteCorpus
+
+# Above this many possible match starts, scanning the documents with a
+# regex is faster than checking them one by one in Python
+MAX_INDEXED_STARTS = 20_000
+
+# BM25 parameters (the usual defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+def default_corpus_path():
+    """The sharded build if there is one, otherwise documents.json (or documents.db if that's all there is)"""
+    if Path("corpus/manifest.json").exists():
+        return Path("corpus")
+    if not Path("documents.json").exists() and Path("documents.db").exists():
+        return Path("documents.db")
+    return Path("documents.json")
+
+def load_corpus(path):
+    """Load documents from documents.json or a sharded corpus directory"""
+    path = Path(path)
+    if path.is_dir() or path.name == "manifest.json":
+        corpus_dir = path if path.is_dir() else path.parent
+        with open(corpus_dir / "manifest.json", 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        documents = manifest["documents"]
+        shard_entries = {}
+        for shard in manifest["shards"]:
+            with gzip.open(corpus_dir / shard["file"], 'rt', encoding='utf-8') as f:
+                for entry in json.load(f):
+                    shard_entries[entry["id"]] = entry
+        for doc in documents:
+            entry = shard_entries[doc["id"]]
+            doc["content"] = entry["content"]
+            if "pageOffsets" in entry:
+                doc["pageOffsets"] = entry["pageOffsets"]
+        return documents
+
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get("documents", [])
+
+def index_path_for(path, name="search_index.json.gz"):
+    """Where process_all_pdfs.py writes an index for a given corpus path"""
+    path = Path(path)
+    if path.is_dir():
+        return path / name
+    return path.with_name(name)
+
+class SearchEngine:
+    """Search over a list of documents using an InvertedIndex
+
+    The index only narrows down which documents are checked; matching
+    itself follows app.js exactly, so results are the same as a full scan.
+    Matching near-duplicates ("duplicateOf", see near_duplicates.py) are
+    collapsed into one result that lists the others.
+    """
+
+    def __init__(self, documents, index=None, use_index=True):
+        self.documents = documents
+        self.position_by_id = {doc["id"]: i for i, doc in enumerate(documents)}
+        self.use_index = use_index
+
+        if index is None or index.ids != [doc["id"] for doc in documents]:
+            index = InvertedIndex()
+            for doc in documents:
+                index.add(doc)
+        self.index = index
+        self.vocabulary = sorted(index.terms)
+        self.vocabulary_cache = {}
+        self.lowered = {}
+
+        self.length_by_id = dict(zip(index.ids, index.lengths))
+        self.average_length = sum(index.lengths) / max(len(index.lengths), 1)
+
+    @classmethod
+    def from_path(cls, path=None, use_index=True):
+        """Load a corpus and, if present and current, its prebuilt index"""
+        path = Path(path) if path else default_corpus_path()
+        documents = load_corpus(path)
+        index = None
+        index_file = index_path_for(path)
+        if index_file.exists():
+            index = InvertedIndex.load(index_file)
+        return cls(documents, index, use_index)
+
+    def vocabulary_matches(self, token, mode):
+        """Index terms that contain / start with / end with / equal a token"""
+        key = (mode, token)
+        matches = self.vocabulary_cache.get(key)
+        if matches is None:
+            if mode == "equals":
+                matches = [token] if token in self.index.terms else []
+            elif mode == "startswith":
+                matches = [term for term in self.vocabulary if term.startswith(token)]
+            elif mode == "endswith":
+                matches = [term for term in self.vocabulary if term.endswith(token)]
+            else:
+                matches = [term for term in self.vocabulary if token in term]
+            self.vocabulary_cache[key] = matches
+        return matches
+
+    def phrase_candidates(self, tokens):
+        """Doc ids whose text could contain a run of query tokens
+
+        Inside a match the first token can end a word, the last can start
+        one and the rest must be whole words at consecutive positions.
+        """
+        last = len(tokens) - 1
+        if last == 0:
+            # A single token needs no position checks
+            docs = set()
+            for term in self.vocabulary_matches(tokens[0], "includes"):
+                docs.update(self.index.postings(term))
+            return docs
+
+        per_token = []
+        for k, token in enumerate(tokens):
+            mode = "endswith" if k == 0 else "startswith" if k == last else "equals"
+            docs = {}
+            for term in self.vocabulary_matches(token, mode):
+                for doc_id, positions in self.index.postings(term).items():
+                    docs.setdefault(doc_id, set()).update(positions)
+            per_token.append(docs)
+
+        candidates = set()
+        for doc_id, first_positions in per_token[0].items():
+            if not all(doc_id in docs for docs in per_token):
+                continue
+            for p in first_positions:
+                if all(p + k in per_token[k][doc_id] for k in range(1, last + 1)):
+                    candidates.add(doc_id)
+                    break
+        return candidates
+
+    def documents_to_search(self, query, exact=False):
+        """Documents that could match query, in corpus order"""
+        if not self.use_index:
+            return self.documents
+
+        groups = [query] if exact else query.split()
+        candidates = None
+        for group in groups:
+            tokens = tokenize(group)
+            if not tokens:
+                continue
+            docs = self.phrase_candidates(tokens)
+            if not exact:
+                # Flexible search also accepts a term found only in the title
+                term = group.lower()
+                docs.update(doc["id"] for doc in self.documents
+                            if term in (doc.get("title") or "").lower())
+            candidates = docs if candidates is None else candidates & docs
+
+        if candidates is None:
+            return self.documents
+        positions = sorted(self.position_by_id[doc_id] for doc_id in candidates)
+        return [self.documents[i] for i in positions]
+
+    def lowercase_content(self, doc):
+        """Lowercased content, cached per document"""
+        lowered = self.lowered.get(doc["id"])
+        if lowered is None:
+            lowered = self.lowered[doc["id"]] = doc["content"].lower()
+        return lowered
+
+    def find_all(self, term, doc, case_insensitive):
+        """Offsets of every match of term in the document's content"""
+        if case_insensitive:
+            lowered = self.lowercase_content(doc)
+            # Plain matching on lowercased text is much faster than
+            # re.IGNORECASE, but only safe if lowercasing kept the offsets
+            if len(lowered) == len(doc["content"]):
+                return [m.start() for m in re.finditer(re.escape(term), lowered)]
+            return [m.start() for m in re.finditer(re.escape(term), doc["content"], re.IGNORECASE)]
+        return [m.start() for m in re.finditer(re.escape(term), doc["content"])]
+
+    def term_offsets(self, term, case_insensitive):
+        """{doc_id: [offsets]} of every match of term, found from the index
+
+        term is the text searched for (already lowercased if
+        case_insensitive). Every match contains the term's first token
+        inside some indexed word, so the offsets of the index words that
+        contain it give every place a match can start; those are checked
+        against a slice of the content instead of scanning documents.
+        Matches don't overlap, as with re.finditer. Returns None if the
+        index can't answer (no offsets in it, or no letters or digits in
+        term) or if the term is so common that scanning is faster.
+        "Shifted" documents (see search_index.py) are left out.
+        """
+        tokens = tokenize(term)
+        if not self.index.has_offsets or not tokens or len(term.lower()) != len(term):
+            return None
+        first = tokens[0]
+        if self.index.estimated_occurrences(self.vocabulary_matches(first, "includes")) > MAX_INDEXED_STARTS:
+            return None
+        lead = term.lower().index(first)
+        width = len(term)
+        # A lone lowercase token is matched by the index words themselves
+        check = not (case_insensitive and term == first)
+
+        starts_by_doc = {}
+        for word in self.vocabulary_matches(first, "includes"):
+            inner = [k - lead for k in range(len(word) - len(first) + 1) if word.startswith(first, k)]
+            for doc_id, offsets in self.index.offsets(word).items():
+                starts = starts_by_doc.setdefault(doc_id, [])
+                for offset in offsets:
+                    starts.extend(offset + k for k in inner)
+
+        found = {}
+        for doc_id, starts in starts_by_doc.items():
+            if doc_id in self.index.shifted:
+                continue
+            if check:
+                content = self.documents[self.position_by_id[doc_id]]["content"]
+                if case_insensitive:
+                    starts = [start for start in starts if start >= 0 and content[start:start + width].lower() == term]
+                else:
+                    starts = [start for start in starts if start >= 0 and content[start:start + width] == term]
+            starts.sort()
+            matches = []
+            end = 0
+            for start in starts:
+                if start >= end:
+                    matches.append(start)
+                    end = start + width
+            if matches:
+                found[doc_id] = matches
+        return found
+
+    def match_document(self, doc, search_query, case_insensitive, exact, found=None):
+        """Query matches in a document, as searchDocuments() finds them
+
+        Returns [(term length, [offsets])], one entry per search term, or []
+        if the document doesn't match.
+
+        found maps each search term to its term_offsets(); where that is
+        None (or for shifted documents) the document's text is scanned.
+        """
+        terms = [search_query] if exact else search_query.split()
+        if found is None or doc["id"] in self.index.shifted:
+            found = {}
+
+        def matches_of(term):
+            if found.get(term) is not None:
+                return found[term].get(doc["id"], [])
+            return self.find_all(term, doc, case_insensitive)
+
+        if not exact:
+            title = doc.get("title") or ""
+            title = title.lower() if case_insensitive else title
+            for term in terms:
+                if term in title:
+                    continue
+                if found.get(term) is not None:
+                    if doc["id"] not in found[term]:
+                        return []
+                else:
+                    content = self.lowercase_content(doc) if case_insensitive else doc["content"]
+                    if term not in content:
+                        return []
+
+        term_matches = [(len(term), matches_of(term)) for term in terms]
+        return term_matches if any(offsets for _, offsets in term_matches) else []
+
+    def bm25_scores(self, query, doc_ids):
+        """BM25 score of each doc id for the query's terms"""
+        scores = dict.fromkeys(doc_ids, 0.0)
+        total_docs = len(self.documents)
+        for token in set(tokenize(query)):
+            frequencies = {}
+            for term in self.vocabulary_matches(token, "includes"):
+                for doc_id, positions in self.index.postings(term).items():
+                    frequencies[doc_id] = frequencies.get(doc_id, 0) + len(positions)
+            if not frequencies:
+                continue
+
+            df = len(frequencies)
+            idf = math.log(1 + (total_docs - df + 0.5) / (df + 0.5))
+            for doc_id in doc_ids:
+                tf = frequencies.get(doc_id, 0)
+                if tf:
+                    norm = 1 - BM25_B + BM25_B * self.length_by_id[doc_id] / self.average_length
+                    scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+        return scores
+
+    def search(self, query, case_insensitive=True, exact=False, rank="matches"):
+        """Search the corpus
+
+        Returns a list of {"document", "matches", "terms", "relevance",
+        "score", "duplicates"} dicts, where terms is [(length, sorted
+        offsets)] per search term, for highlight_excerpt(), and duplicates
+        are the ids of the document's near-duplicates that matched too (see
+        collapse_duplicates()).
+        rank="matches" orders by number of matches like the site does;
+        rank="bm25" orders by BM25 score.
+        """
+        query = query.strip()
+        if not query:
+            return []
+        search_query = query.lower() if case_insensitive else query
+
+        found = None
+        if self.use_index:
+            terms = [search_query] if exact else search_query.split()
+            found = {term: self.term_offsets(term, case_insensitive) for term in terms}
+
+        results = []
+        for doc in self.documents_to_search(query, exact):
+            term_matches = self.match_document(doc, search_query, case_insensitive, exact, found)
+            if term_matches:
+                matches = []
+                for _, offsets in term_matches:
+                    matches.extend(offsets)
+                results.append({
+                    "document": doc,
+                    "matches": matches,
+                    "terms": term_matches,
+                    "relevance": len(matches),
+                    "score": float(len(matches))
+                })
+
+        if rank == "bm25":
+            scores = self.bm25_scores(query, [result["document"]["id"] for result in results])
+            for result in results:
+                result["score"] = scores[result["document"]["id"]]
+            results.sort(key=lambda result: result["score"], reverse=True)
+        else:
+            results.sort(key=lambda result: result["relevance"], reverse=True)
+        return collapse_duplicates(results)
+
+def collapse_duplicates(results):
+    """One result per group of near-duplicates, best first
+
+    Each group is shown by its canonical document if that matched, else by
+    its best-ranked copy, at the place of the group's best result; the ids
+    of the other matching documents go in its "duplicates".
+    """
+    groups = {}
+    for result in results:
+        doc = result["document"]
+        canonical = doc.get("duplicateOf")
+        groups.setdefault(doc["id"] if canonical is None else canonical, []).append(result)
+
+    collapsed = []
+    for canonical, members in groups.items():
+        shown = next((result for result in members if result["document"]["id"] == canonical), members[0])
+        shown["duplicates"] = [result["document"]["id"] for result in members if result is not shown]
+        collapsed.append(shown)
+    return collapsed
+
+def page_for_offset(doc, offset):
+    """1-based page number containing a character offset, or None if unknown"""
+    page_offsets = doc.get("pageOffsets")
+    if not page_offsets:
+        return None
+    return max(1, bisect.bisect_right(page_offsets, offset))
+
+def get_excerpt(content, match_position=0, length=300):
+    """Excerpt around a match, like getExcerpt() in app.js"""
+    start = max(0, match_position - 100)
+    end = min(len(content), start + length)
+    excerpt = " ".join(content[start:end].split())
+    if start > 0:
+        excerpt = "..." + excerpt
+    if end < len(content):
+        excerpt = excerpt + "..."
+    return excerpt
+
+def excerpt_matches(term_matches, match_position=0, length=300):
+    """The matches from a result's "terms" that fall inside its excerpt, in the same shape"""
+    start = max(0, match_position - 100)
+    end = start + length
+    trimmed = []
+    for width, offsets in term_matches:
+        # Matches that start before the excerpt can still reach into it
+        first = bisect.bisect_left(offsets, start - width + 1)
+        last = bisect.bisect_left(offsets, end, first)
+        if first < last:
+            trimmed.append((width, offsets[first:last]))
+    return trimmed
+
+def highlight_excerpt(content, term_matches, match_position=0, length=300):
+    """get_excerpt() as HTML, with the matches inside it in <mark>
+
+    term_matches is a search result's "terms" (or excerpt_matches() of
+    them). Only the matches inside the excerpt are looked at, so this costs
+    the same however long the document is.
+    """
+    start = max(0, match_position - 100)
+    end = min(len(content), start + length)
+    spans = sorted((offset, width)
+                   for width, offsets in excerpt_matches(term_matches, match_position, length)
+                   for offset in offsets)
+    pieces = []
+    cursor = start
+    for offset, width in spans:
+        stop = min(offset + width, end)
+        if stop <= cursor:
+            continue
+        offset = max(offset, cursor)
+        pieces.append(html.escape(content[cursor:offset]))
+        pieces.append("<mark>" + html.escape(content[offset:stop]) + "</mark>")
+        cursor = stop
+    pieces.append(html.escape(content[cursor:end]))
+    excerpt = " ".join("".join(pieces).split())
+    if start > 0:
+        excerpt = "..." + excerpt
+    if end < len(content):
+        excerpt = excerpt + "..."
+    return excerpt
+
+def show_passages(args):
+    """Print the top passages for a question from passages.json.gz"""
+    path = Path(args.corpus) if args.corpus else default_corpus_path()
+    corpus = load_corpus(path)
+    passages = PassageIndex.load(index_path_for(path, "passages.json.gz"))
+    if not passages.matches(corpus):
+        print("❌ passages.json.gz was built from other documents; rebuild it with process_all_pdfs.py")
+        return
+    documents = {doc["id"]: doc for doc in corpus}
+    results = passages.top_passages(args.query, args.limit)
+
+    print(f"\n💬 Top {len(results)} passage{'s' if len(results) != 1 else ''} for \"{args.query}\"")
+    print("="*60)
+    for result in results:
+        doc = documents[result["doc"]]
+        page = f", page {result['page']}" if result["page"] else ""
+        print(f"\n📄 {doc['title']}  (BM25 {result['score']:.2f})")
+        print(f"   Source: {doc['source']}{page}")
+        print(f"   {' '.join(doc['content'][result['start']:result['end']].split())}")
+
+def show_sqlite_results(path, args):
+    """Print the best-matching documents from a documents.db (BM25-ranked by FTS5)"""
+    with SqliteCorpus(path) as corpus:
+        total = corpus.count(args.query, args.exact)
+        results = corpus.search(args.query, args.exact, args.limit)
+
+    print(f"\n🔍 Found {total} document{'s' if total != 1 else ''} matching \"{args.query}\"")
+    print("="*60)
+    for result in results:
+        print(f"\n📄 {result['title']}  (BM25 {result['score']:.2f})")
+        print(f"   Source: {result['source']}, page {result['page']}")
+        if result["duplicates"]:
+            print(f"   Also filed as {len(result['duplicates'])} other document{'s' if len(result['duplicates']) != 1 else ''}: "
+                  + ", ".join(f"#{doc_id}" for doc_id in result["duplicates"]))
+        print(f"   {result['snippet']}")
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Search the extracted Epstein documents")
+    parser.add_argument("query", help="text to search for")
+    parser.add_argument("--corpus", help="documents.json, a sharded corpus directory or documents.db "
+                                         "(default: corpus/ if built, else documents.json)")
+    parser.add_argument("--exact", action="store_true", help="match the exact phrase")
+    parser.add_argument("--case-sensitive", action="store_true", help="match letter case")
+    parser.add_argument("--rank", choices=["matches", "bm25"], default="matches",
+                        help="order by number of matches (like the site) or BM25 score")
+    parser.add_argument("--limit", type=int, default=10, help="number of results to show")
+    parser.add_argument("--passages", action="store_true",
+                        help="show the best-matching passages (what the chat uses as context)")
+    args = parser.parse_args()
+
+    if args.passages:
+        show_passages(args)
+        return
+
+    path = Path(args.corpus) if args.corpus else default_corpus_path()
+    if path.suffix == ".db":
+        # Whole-word FTS5 matching, always ranked by BM25
+        show_sqlite_results(path, args)
+        return
+
+    engine = SearchEngine.from_path(path)
+    results = engine.search(args.query, not args.case_sensitive, args.exact, args.rank)
+
+    print(f"\n🔍 Found {len(results)} document{'s' if len(results) != 1 else ''} matching \"{args.query}\"")
+    print("="*60)
+    for result in results[:args.limit]:
+        doc = result["document"]
+        score = f", BM25 {result['score']:.2f}" if args.rank == "bm25" else ""
+        print(f"\n📄 {doc['title']}  ({result['relevance']} matches{score})")
+        page = page_for_offset(doc, result['matches'][0])
+        print(f"   Source: {doc['source']}" + (f", page {page}" if page else ""))
+        if result["duplicates"]:
+            print(f"   Also filed as {len(result['duplicates'])} other document{'s' if len(result['duplicates']) != 1 else ''}: "
+                  + ", ".join(f"#{doc_id}" for doc_id in result["duplicates"]))
+        print(f"   {get_excerpt(doc['content'], result['matches'][0])}")
+
+if __name__ == "__main__":
+    main()
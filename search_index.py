@@ -0,0 +1,223 @@
+"""
+Inverted Index for the Epstein Documents Search Tool
+
+Builds a compact positional index (term -> documents, word positions and
+character offsets) at extraction time so clients don't have to scan every
+document's text, neither to find the documents that match nor to find
+where in them the matches are.
+
+Index file format (gzipped JSON):
+    {
+      "version": 2,
+      "documents": <number of documents indexed>,
+      "ids": [<doc id>, ...],
+      "lengths": [<number of terms in the document>, ...],
+      "shifted": [<doc id>, ...],
+      "terms": {"<term>": "<base64 postings>", ...}
+    }
+
+Terms are lowercased runs of letters/digits. Each term's postings are a
+sequence of unsigned LEB128 varints:
+    doc_id_delta, count, position_delta, offset_delta, position_delta, offset_delta, ...
+repeated for every document containing the term, in increasing doc id
+order. Doc ids are deltas from the previous document in the list (the
+first from 0). Positions are word offsets in the document content and
+offsets are the character offsets where the term starts, each as deltas
+from the previous one (the first from 0).
+
+Offsets are counted in the lowercased content. "shifted" lists the
+documents where lowercasing changed the length of the text, or that have
+characters outside the Basic Multilingual Plane (app.js counts those as
+two), so offsets don't line up with the original; matches in those have
+to be found by scanning. Version 1 indexes (positions only) can still be loaded.
+"""
+
+import base64
+import gzip
+import json
+import os
+import re
+from pathlib import Path
+
+INDEX_VERSION = 2
+
+# Letters and digits only; matches /[\p{L}\p{N}]+/u in app.js
+TOKEN_RE = re.compile(r"[^\W_]+")
+
+ASTRAL_RE = re.compile("[\U00010000-\U0010FFFF]")
+
+def tokenize(text):
+    """Return the lowercased index terms of text, in order"""
+    # Lowercase first, like app.js, so both sides split text the same way
+    return TOKEN_RE.findall(text.lower())
+
+def encode_varint(value, out):
+    """Append value to out as an unsigned LEB128 varint"""
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def decode_varints(data):
+    """Yield the unsigned LEB128 varints in data"""
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            yield value
+            value = shift = 0
+
+def decode_postings(data, with_offsets=True):
+    """Decode a term's varint postings into ({doc_id: [positions]}, {doc_id: [offsets]})
+
+    The offsets are {} for version 1 postings (with_offsets=False).
+    """
+    numbers = decode_varints(data)
+    postings = {}
+    offsets = {}
+    doc_id = 0
+    for doc_delta in numbers:
+        doc_id += doc_delta
+        positions = []
+        position = 0
+        if with_offsets:
+            doc_offsets = offsets[doc_id] = []
+            offset = 0
+            for _ in range(next(numbers)):
+                position += next(numbers)
+                positions.append(position)
+                offset += next(numbers)
+                doc_offsets.append(offset)
+        else:
+            for _ in range(next(numbers)):
+                position += next(numbers)
+                positions.append(position)
+        postings[doc_id] = positions
+    return postings, offsets
+
+class InvertedIndex:
+    """Positional inverted index, built in memory or loaded from disk
+
+    Postings stay varint-encoded per term and are only decoded when a term
+    is looked up, so memory grows with the size of the index rather than
+    the corpus text. Documents must be added in increasing id order.
+    """
+
+    def __init__(self):
+        self.terms = {}
+        self.ids = []
+        self.lengths = []
+        self.shifted = set()
+        self.has_offsets = True
+        self.last_doc = {}
+        self.decoded = {}
+
+    def add(self, doc):
+        """Index a document's content"""
+        doc_id = doc["id"]
+        lowered = doc["content"].lower()
+        if len(lowered) != len(doc["content"]) or ASTRAL_RE.search(doc["content"]):
+            self.shifted.add(doc_id)
+        occurrences = {}
+        length = 0
+        for position, match in enumerate(TOKEN_RE.finditer(lowered)):
+            term = match.group()
+            if term in occurrences:
+                occurrences[term].append((position, match.start()))
+            else:
+                occurrences[term] = [(position, match.start())]
+            length = position + 1
+
+        for term, term_occurrences in occurrences.items():
+            out = self.terms.get(term)
+            if out is None:
+                out = self.terms[term] = bytearray()
+            encode_varint(doc_id - self.last_doc.get(term, 0), out)
+            encode_varint(len(term_occurrences), out)
+            previous_position = previous_offset = 0
+            for position, offset in term_occurrences:
+                encode_varint(position - previous_position, out)
+                encode_varint(offset - previous_offset, out)
+                previous_position, previous_offset = position, offset
+            self.last_doc[term] = doc_id
+        self.ids.append(doc_id)
+        self.lengths.append(length)
+
+    def decode(self, term):
+        """({doc_id: [positions]}, {doc_id: [offsets]}) for a term, decoded once"""
+        decoded = self.decoded.get(term)
+        if decoded is None:
+            encoded = self.terms.get(term)
+            if encoded is None:
+                return {}, {}
+            if isinstance(encoded, str):
+                encoded = base64.b64decode(encoded)
+            decoded = self.decoded[term] = decode_postings(encoded, self.has_offsets)
+        return decoded
+
+    def estimated_occurrences(self, terms):
+        """Rough number of occurrences of terms in all documents, without decoding them"""
+        size = 0
+        for term in terms:
+            encoded = self.terms.get(term)
+            if encoded is not None:
+                size += len(encoded) * 3 // 4 if isinstance(encoded, str) else len(encoded)
+        # A position and an offset take at least a byte each, usually three together
+        return size // 3
+
+    def postings(self, term):
+        """Return {doc_id: [positions]} for a term ({} if it isn't indexed)"""
+        return self.decode(term)[0]
+
+    def offsets(self, term):
+        """Return {doc_id: [character offsets]} for a term ({} if it isn't indexed)"""
+        return self.decode(term)[1]
+
+    def save(self, path):
+        """Write the index as gzipped JSON"""
+        index = {
+            "version": INDEX_VERSION,
+            "documents": len(self.ids),
+            "ids": self.ids,
+            "lengths": self.lengths,
+            "shifted": sorted(self.shifted),
+            "terms": {
+                term: encoded if isinstance(encoded, str) else base64.b64encode(encoded).decode('ascii')
+                for term, encoded in sorted(self.terms.items())
+            }
+        }
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=9) as f:
+            json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Load an index file written by save()"""
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") not in (1, INDEX_VERSION):
+            raise ValueError(f"Unsupported index version: {data.get('version')}")
+        index = cls()
+        index.terms = data["terms"]
+        index.ids = data["ids"]
+        index.lengths = data["lengths"]
+        index.shifted = set(data.get("shifted", []))
+        index.has_offsets = data["version"] >= 2
+        return index
+
+class InvertedIndexWriter:
+    """Corpus writer that builds an InvertedIndex and saves it on close()"""
+
+    def __init__(self, output_file):
+        self.output_path = Path(output_file)
+        self.index = InvertedIndex()
+
+    def add(self, doc):
+        self.index.add(doc)
+
+    def close(self):
+        self.index.save(self.output_path)
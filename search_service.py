@@ -0,0 +1,370 @@
+"""
+Search API Service for the Epstein Documents
+
+Serves search over the corpus built by process_all_pdfs.py so a browser
+doesn't have to download every document to search them. Matching is
+search_engine.SearchEngine's, the same as searchDocuments() in app.js
+(flexible or exact, case-insensitive by default), plus pagination and
+optional BM25 ranking.
+
+Hot queries are answered from a bounded LRU cache. The service checks the
+corpus every few seconds; when process_all_pdfs.py swaps in a new build,
+it loads it in the background, switches over and empties the cache.
+
+Only the Python standard library is needed (asyncio).
+
+Usage:
+    python search_service.py                               # corpus/ or documents.json, port 8081
+    python search_service.py --corpus corpus/ --port 9000 --cache-size 4096
+
+    GET /api/search?q=flight+logs&exact=1&page=2&per_page=20
+        q               text to search for (required)
+        exact           1: match the exact phrase
+        case_sensitive  1: match letter case
+        rank            matches (default, like the site) or bm25
+        page, per_page  1-based page of results, up to 100 per page
+        Each hit has a plain "excerpt", the same as HTML with the matches in
+        <mark> ("snippet"), the [offset, length] of those matches in the
+        document ("highlights") and the ids of near-duplicates of it that
+        matched too and were folded into it ("duplicates").
+    GET /api/health     documents loaded and the corpus build being served
+    GET /api/stats      request and error counts and cache hit rate
+
+A request that fails unexpectedly is logged and answered with a 500 and
+{"error": "internal error"}.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import traceback
+from collections import OrderedDict
+from http import HTTPStatus
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from search_engine import (SearchEngine, default_corpus_path, excerpt_matches, get_excerpt, highlight_excerpt,
+                           index_path_for, page_for_offset)
+
+DEFAULT_PORT = 8081
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+RELOAD_INTERVAL = 5.0
+
+class LruCache:
+    """A dict that forgets its least recently used entries beyond max_entries"""
+
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+def corpus_signature(path):
+    """Changes whenever a new build of the corpus at path is swapped in"""
+    path = Path(path)
+    files = [path / "manifest.json" if path.is_dir() else path, index_path_for(path)]
+    signature = []
+    for file in files:
+        try:
+            stat = os.stat(file)
+            signature.append((stat.st_mtime_ns, stat.st_size, stat.st_ino))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+def flag(params, name):
+    return params.get(name, ["0"])[0].lower() in ("1", "true", "yes", "on")
+
+def positive_int(params, name, default):
+    try:
+        return max(1, int(params.get(name, [default])[0]))
+    except ValueError:
+        raise ValueError(f"{name} must be a whole number")
+
+class SearchService:
+    """Answer /api/search over one loaded corpus build, reloading it when it changes"""
+
+    def __init__(self, corpus_path, cache_size=DEFAULT_CACHE_SIZE, reload_interval=RELOAD_INTERVAL):
+        self.corpus_path = Path(corpus_path)
+        self.cache = LruCache(cache_size)
+        self.reload_interval = reload_interval
+        self.engine = None
+        self.signature = None
+        self.build = None
+        # Searches being computed, so a burst of one query runs it once
+        self.in_flight = {}
+        self.requests = 0
+        self.errors = 0
+        self.started = time.time()
+
+    def load(self):
+        """Load the corpus as it is now; returns (engine, signature)"""
+        signature = corpus_signature(self.corpus_path)
+        return SearchEngine.from_path(self.corpus_path), signature
+
+    def swap_in(self, engine, signature):
+        """Serve a newly loaded build; cached results of the old one are dropped"""
+        self.engine = engine
+        self.signature = signature
+        self.build = f"{signature[0][0] if signature[0] else 0:x}"
+        self.cache.clear()
+
+    async def watch_corpus(self):
+        """Reload the corpus whenever a new build replaces it"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            if corpus_signature(self.corpus_path) == self.signature:
+                continue
+            try:
+                # The old build keeps serving while the new one loads
+                engine, signature = await loop.run_in_executor(None, self.load)
+            except Exception as e:
+                print(f"⚠️  Could not load the new corpus build ({e}); still serving the previous one")
+                continue
+            self.swap_in(engine, signature)
+            print(f"🔄 Switched to a new corpus build: {len(engine.documents)} documents")
+
+    def run_search(self, engine, query, case_insensitive, exact, rank):
+        """Every match as (document position, relevance, score, first match offset, excerpt matches,
+        near-duplicate ids), best first
+
+        Only the matches inside each result's excerpt are kept, so pages of
+        hits are cut and highlighted without looking at the rest of the text.
+        """
+        position_by_id = engine.position_by_id
+        results = []
+        for result in engine.search(query, case_insensitive, exact, rank):
+            first_match = min(result["matches"])
+            results.append((position_by_id[result["document"]["id"]], result["relevance"], result["score"],
+                            first_match, excerpt_matches(result["terms"], first_match), result["duplicates"]))
+        return results
+
+    async def ranked_results(self, query, case_insensitive, exact, rank):
+        engine = self.engine
+        key = (self.build, query, case_insensitive, exact, rank)
+        results = self.cache.get(key)
+        if results is not None:
+            return engine, results, True
+
+        pending = self.in_flight.get(key)
+        if pending is None:
+            loop = asyncio.get_running_loop()
+            pending = loop.run_in_executor(None, self.run_search, engine, query, case_insensitive, exact, rank)
+            self.in_flight[key] = pending
+            try:
+                results = await pending
+            finally:
+                del self.in_flight[key]
+            # Don't cache results from a build that was swapped out meanwhile
+            if engine is self.engine:
+                self.cache.put(key, results)
+        else:
+            results = await pending
+        return engine, results, False
+
+    async def search(self, params):
+        query = params.get("q", [""])[0].strip()
+        if not query:
+            raise ValueError("q is required")
+        case_insensitive = not flag(params, "case_sensitive")
+        exact = flag(params, "exact")
+        rank = params.get("rank", ["matches"])[0]
+        if rank not in ("matches", "bm25"):
+            raise ValueError("rank must be matches or bm25")
+        page = positive_int(params, "page", 1)
+        per_page = min(MAX_PER_PAGE, positive_int(params, "per_page", DEFAULT_PER_PAGE))
+
+        started = time.perf_counter()
+        engine, results, cached = await self.ranked_results(query, case_insensitive, exact, rank)
+        hits = []
+        for position, relevance, score, first_match, term_matches, duplicates in results[(page - 1) * per_page:page * per_page]:
+            doc = engine.documents[position]
+            hits.append({
+                "id": doc["id"],
+                "title": doc.get("title"),
+                "source": doc.get("source"),
+                "date": doc.get("date"),
+                "filename": doc.get("filename"),
+                "relevance": relevance,
+                "score": round(score, 4),
+                "page": page_for_offset(doc, first_match),
+                "duplicates": duplicates,
+                "excerpt": get_excerpt(doc["content"], first_match),
+                "snippet": highlight_excerpt(doc["content"], term_matches, first_match),
+                "highlights": sorted([offset, width] for width, offsets in term_matches for offset in offsets)
+            })
+        return {
+            "query": query,
+            "total": len(results),
+            "page": page,
+            "perPage": per_page,
+            "pages": (len(results) + per_page - 1) // per_page,
+            "build": self.build,
+            "cached": cached,
+            "ms": round((time.perf_counter() - started) * 1000, 2),
+            "results": hits
+        }
+
+    def stats(self):
+        lookups = self.cache.hits + self.cache.misses
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "uptimeSeconds": round(time.time() - self.started),
+            "documents": len(self.engine.documents),
+            "build": self.build,
+            "cache": {
+                "entries": len(self.cache),
+                "maxEntries": self.cache.max_entries,
+                "hits": self.cache.hits,
+                "misses": self.cache.misses,
+                "hitRate": round(self.cache.hits / lookups, 4) if lookups else 0.0
+            }
+        }
+
+    async def route(self, method, target):
+        """(status, payload) for one request"""
+        if method not in ("GET", "HEAD"):
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "only GET is supported"}
+        url = urlsplit(target)
+        params = parse_qs(url.query)
+        try:
+            if url.path == "/api/search":
+                return HTTPStatus.OK, await self.search(params)
+            if url.path == "/api/health":
+                return HTTPStatus.OK, {"status": "ok", "documents": len(self.engine.documents),
+                                       "build": self.build}
+            if url.path == "/api/stats":
+                return HTTPStatus.OK, self.stats()
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}
+        except Exception as e:
+            # A bug in one request mustn't drop the connection without an answer
+            self.errors += 1
+            print(f"❌ {method} {target} failed: {e!r}")
+            traceback.print_exc()
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "internal error"}
+        return HTTPStatus.NOT_FOUND, {"error": f"no such endpoint: {url.path}"}
+
+    async def handle_connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection (kept alive unless asked not to)"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self.respond(writer, HTTPStatus.BAD_REQUEST, {"error": "malformed request"}, False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode('latin-1').partition(":")
+                    headers[name.strip().lower()] = value.strip().lower()
+                if headers.get("content-length"):
+                    await reader.readexactly(int(headers["content-length"]))
+
+                self.requests += 1
+                connection = headers.get("connection", "")
+                keep_alive = connection == "keep-alive" or (version == "HTTP/1.1" and connection != "close")
+                status, payload = await self.route(method, target)
+                await self.respond(writer, status, payload, keep_alive, head=method == "HEAD")
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload, keep_alive, head=False):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head_lines = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            "Content-Type: application/json; charset=utf-8",
+            f"Content-Length: {len(body)}",
+            "Access-Control-Allow-Origin: *",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}"
+        ]
+        writer.write(("\r\n".join(head_lines) + "\r\n\r\n").encode('latin-1') + (b"" if head else body))
+        await writer.drain()
+
+    async def serve(self, host, port):
+        """Load the corpus and serve until interrupted"""
+        loop = asyncio.get_running_loop()
+        t0 = time.perf_counter()
+        self.swap_in(*await loop.run_in_executor(None, self.load))
+        print(f"📚 Loaded {len(self.engine.documents)} documents from {self.corpus_path} "
+              f"in {time.perf_counter() - t0:.1f}s")
+
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        watcher = asyncio.create_task(self.watch_corpus())
+        print(f"🔍 Search API on http://{host}:{port}/api/search?q=...")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher.cancel()
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Serve search over the extracted Epstein documents")
+    parser.add_argument("--corpus", help="documents.json or a sharded corpus directory "
+                                         "(default: corpus/ if built, else documents.json)")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port (default: {DEFAULT_PORT})")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE,
+                        help=f"queries whose results are kept (default: {DEFAULT_CACHE_SIZE})")
+    parser.add_argument("--reload-interval", type=float, default=RELOAD_INTERVAL,
+                        help=f"seconds between checks for a new corpus build (default: {RELOAD_INTERVAL:g})")
+    args = parser.parse_args()
+
+    print("\n🔍 EPSTEIN DOCUMENTS - SEARCH SERVICE")
+    print("="*60)
+    corpus_path = Path(args.corpus) if args.corpus else default_corpus_path()
+    if not corpus_path.exists():
+        print(f"❌ Corpus not found: {corpus_path}")
+        print("Run process_all_pdfs.py first!")
+        return
+    if corpus_path.suffix == ".db":
+        print("❌ The service searches the json or sharded build; query documents.db with search_engine.py")
+        return
+
+    service = SearchService(corpus_path, args.cache_size, args.reload_interval)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n👋 Search service stopped")
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,10 @@
 Browser-Based Epstein Document Downloader
 Uses Selenium to automate downloading ALL documents like a real browser
 
+The docket page and its PDFs are fetched over plain HTTP first
+(http_fetcher.py); Chrome is only started if that doesn't work, e.g. when
+CourtListener asks for a CAPTCHA.
+
 Requirements:
     pip install selenium webdriver-manager
 
@@ -22,12 +26,24 @@ from pathlib import Path
 import json
 from datetime import datetime
 
+from blob_store import BlobStore
+from download_watcher import DownloadWatcher
+from http_fetcher import HttpDocketFetcher
+from metrics import METRICS, finish_run
+
 class BrowserDocumentDownloader:
-    def __init__(self, output_dir="epstein_documents"):
+    def __init__(self, output_dir="epstein_documents", use_http=True):
         self.output_dir = Path(output_dir)
         self.pdfs_dir = self.output_dir / "pdfs"
         self.pdfs_dir.mkdir(parents=True, exist_ok=True)
         
+        self.driver = None
+        self.fetcher = HttpDocketFetcher(output_dir) if use_http else None
+        self.downloaded_count = 0
+        self.log_file = self.output_dir / "download_log.txt"
+    
+    def start_browser(self):
+        """Start Chrome (only when a page can't be fetched over HTTP)"""
         # Setup Chrome options
         chrome_options = Options()
         chrome_options.add_experimental_option('prefs', {
@@ -45,9 +61,6 @@ class BrowserDocumentDownloader:
             service=Service(ChromeDriverManager().install()),
             options=chrome_options
         )
-        
-        self.downloaded_count = 0
-        self.log_file = self.output_dir / "download_log.txt"
     
     def log(self, message):
         """Log to file and console"""
@@ -61,6 +74,17 @@ class BrowserDocumentDownloader:
         """Download all documents from Giuffre v. Maxwell case"""
         url = "https://www.courtlistener.com/docket/4355308/giuffre-v-maxwell/"
         
+        if self.fetcher is not None:
+            self.log(f"Fetching case over HTTP: {url}")
+            result = self.fetcher.fetch_docket(url)
+            if result is not None:
+                self.downloaded_count += result["downloaded"]
+                self.log(f"\n✅ Giuffre v. Maxwell complete: {self.downloaded_count} documents")
+                return
+            self.log("Page needs a browser, starting Chrome...")
+        
+        if self.driver is None:
+            self.start_browser()
         self.log(f"Opening case: {url}")
         self.driver.get(url)
         time.sleep(3)  # Let page load
@@ -89,48 +113,40 @@ class BrowserDocumentDownloader:
                 total_docs = len(pdf_links)
                 self.log(f"Found {total_docs} potential document links")
             
-            # Download each document
-            for i, link in enumerate(pdf_links, 1):
+            # Read the links up front; navigating makes the elements stale
+            documents = [(link.get_attribute('href'), link.text) for link in pdf_links]
+            watcher = DownloadWatcher(self.pdfs_dir)
+            
+            # Download each document, a few at a time
+            for i, (href, text) in enumerate(documents, 1):
                 try:
-                    href = link.get_attribute('href')
-                    text = link.text
-                    
+                    watcher.wait_for_slot()
                     self.log(f"\n[{i}/{total_docs}] Downloading: {text[:60]}")
                     self.log(f"  URL: {href}")
                     
-                    # Open in new tab
-                    self.driver.execute_script("window.open('');")
-                    self.driver.switch_to.window(self.driver.window_handles[1])
-                    
-                    # Navigate to document
+                    # Navigate to document; Chrome saves it instead of showing it
                     self.driver.get(href)
-                    time.sleep(2)  # Wait for download
+                    watcher.started()
                     
-                    # Close tab and switch back
-                    self.driver.close()
-                    self.driver.switch_to.window(self.driver.window_handles[0])
-                    
-                    self.downloaded_count += 1
-                    self.log(f"  ✅ Downloaded ({self.downloaded_count} total)")
+                    for path in watcher.scan():
+                        self.log(f"  ✅ Saved {path.name}")
                     
                     # Be nice to the server
                     time.sleep(1)
                     
                     # Every 10 documents, take a longer break
                     if i % 10 == 0:
-                        self.log(f"  💾 Progress: {i}/{total_docs} documents processed")
+                        self.log(f"  💾 Progress: {i}/{total_docs} documents requested, {len(watcher.finished)} saved")
                         time.sleep(3)
                     
                 except Exception as e:
                     self.log(f"  ❌ Error: {e}")
-                    # Try to get back to main window
-                    try:
-                        if len(self.driver.window_handles) > 1:
-                            self.driver.switch_to.window(self.driver.window_handles[0])
-                    except:
-                        pass
                     continue
             
+            # Only count files that actually landed on disk
+            self.downloaded_count += len(watcher.wait_all())
+            if watcher.failed:
+                self.log(f"⚠️  {watcher.failed} downloads never arrived")
             self.log(f"\n✅ Giuffre v. Maxwell complete: {self.downloaded_count} documents")
             
         except Exception as e:
@@ -155,12 +171,18 @@ class BrowserDocumentDownloader:
         finally:
             self.log("\n" + "="*60)
             self.log(f"✅ COMPLETE: Downloaded {self.downloaded_count} documents")
+            
+            # File the downloads into the content-addressed store so
+            # repeated filings share one copy
+            files, duplicates = BlobStore(self.output_dir / "blobs").adopt_dir(self.pdfs_dir)
+            self.log(f"🧬 Stored {files} new PDFs ({duplicates} duplicates of existing ones)")
             self.log("="*60)
             self.log(f"PDFs saved to: {self.pdfs_dir.absolute()}")
             self.log(f"Log saved to: {self.log_file.absolute()}")
             
-            input("\nPress Enter to close browser and continue...")
-            self.driver.quit()
+            if self.driver is not None:
+                input("\nPress Enter to close browser and continue...")
+                self.driver.quit()
 
 def main():
     print("\n⚖️  AUTOMATED EPSTEIN DOCUMENT DOWNLOADER")
@@ -174,16 +196,20 @@ def main():
     downloader = BrowserDocumentDownloader()
     
     try:
-        downloader.download_all()
+        with METRICS.stage("download"):
+            downloader.download_all()
     except KeyboardInterrupt:
         print("\n\n⚠️  Cancelled by user")
-        downloader.driver.quit()
+        if downloader.driver is not None:
+            downloader.driver.quit()
     except Exception as e:
         print(f"\n\n❌ Error: {e}")
         try:
-            downloader.driver.quit()
+            if downloader.driver is not None:
+                downloader.driver.quit()
         except:
             pass
+    finish_run("selenium_downloader")
     
     print("\n🎉 Next steps:")
     print("1. Check the epstein_documents/pdfs/ folder")
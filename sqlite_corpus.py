@@ -0,0 +1,160 @@
+"""
+SQLite Full-Text Search over the Epstein Documents
+
+Queries the documents.db written by `process_all_pdfs.py --format sqlite`
+(see SqliteCorpusWriter in corpus_writers.py). The FTS5 index ranks pages
+with BM25 and cuts snippets around the matches, straight from the file:
+nothing is loaded up front, so a query takes milliseconds however large
+the corpus gets.
+
+Query syntax (as in search_engine.py --corpus documents.db):
+    ghislaine maxwell        pages with both words
+    "flight logs"            the exact phrase
+    depos*                   words starting with "depos"
+    maxwell OR giuffre       either word
+
+Words are matched whole (case and accents ignored), unlike the site's
+substring search; use a prefix* for partial words.
+"""
+
+import json
+import re
+import sqlite3
+from pathlib import Path
+
+# FTS5 BM25 weights of the title and text columns
+TITLE_WEIGHT = 2.0
+TEXT_WEIGHT = 1.0
+
+SNIPPET_TOKENS = 24
+
+QUERY_PARTS = re.compile(r'"([^"]*)"(\*?)|(\S+)')
+
+def fts_query(query, exact=False):
+    """Turn a search box query into an FTS5 MATCH expression
+
+    Every word and "quoted phrase" must match, a trailing * makes a prefix
+    search and a bare OR joins its neighbours; everything else is quoted,
+    so punctuation in a query can't be read as FTS5 syntax.
+    """
+    if exact:
+        return '"' + query.replace('"', '""') + '"'
+    parts = []
+    for phrase, phrase_star, word in QUERY_PARTS.findall(query):
+        if word == "OR" and parts and parts[-1] != "OR":
+            parts.append("OR")
+            continue
+        text, star = (phrase, phrase_star) if not word else (word.rstrip("*"), "*" if word.endswith("*") else "")
+        if re.search(r"\w", text):
+            parts.append('"' + text.replace('"', '""') + '"' + star)
+    if parts and parts[-1] == "OR":
+        parts.pop()
+    return " ".join(parts)
+
+class SqliteCorpus:
+    """Read-only access to a documents.db"""
+
+    def __init__(self, path="documents.db"):
+        self.path = Path(path)
+        if not self.path.exists():
+            raise FileNotFoundError(f"{self.path} not found; build it with process_all_pdfs.py --format sqlite")
+        self.db = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        self.meta = {key: json.loads(value) for key, value in self.db.execute("SELECT key, value FROM meta")}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.meta["totalDocuments"]
+
+    def search(self, query, exact=False, limit=10):
+        """Best-matching documents for a query, best first
+
+        Each result is a dict with the document's "id", "title", "source"
+        and "filename", the best-matching "page", its BM25 "score" (higher
+        is better), a "snippet" with matches in [brackets] and
+        "duplicates", the ids of its near-duplicates that matched too.
+        Matching near-duplicates come as one result, placed by the best of
+        them: the canonical document if it matched, otherwise the best copy.
+        """
+        expression = fts_query(query, exact)
+        if not expression:
+            return []
+        # Each document's best page, ranked with the column weights; groups
+        # of near-duplicates ranked by their best document; only the top
+        # `limit` groups leave SQLite
+        rows = self.db.execute(f"""
+            WITH hits AS (
+                SELECT pages.doc_id, pages.id AS row_id, pages.page,
+                       bm25(pages_fts, {TITLE_WEIGHT}, {TEXT_WEIGHT}) AS rank
+                FROM pages_fts
+                JOIN pages ON pages.id = pages_fts.rowid
+                WHERE pages_fts MATCH ?
+            ), best AS (
+                SELECT hits.doc_id, hits.row_id, hits.page, min(hits.rank) AS rank,
+                       coalesce(json_extract(documents.metadata, '$.duplicateOf'), hits.doc_id) AS canonical
+                FROM hits JOIN documents ON documents.id = hits.doc_id
+                GROUP BY hits.doc_id
+            ), top_groups AS (
+                SELECT canonical, min(rank) AS rank FROM best
+                GROUP BY canonical ORDER BY rank LIMIT ?
+            )
+            SELECT best.row_id, best.doc_id, best.page, -best.rank, best.canonical,
+                   documents.title, documents.source, documents.filename
+            FROM top_groups
+            JOIN best ON best.canonical = top_groups.canonical
+            JOIN documents ON documents.id = best.doc_id
+            ORDER BY top_groups.rank, best.rank
+        """, (expression, limit))
+
+        groups = {}
+        for row_id, doc_id, page, score, canonical, title, source, filename in rows:
+            groups.setdefault(canonical, {})[doc_id] = {
+                "id": doc_id, "title": title, "source": source, "filename": filename,
+                "page": page, "score": score, "row": row_id}
+
+        results = []
+        for canonical, members in groups.items():
+            result = members.get(canonical) or next(iter(members.values()))
+            result["duplicates"] = [doc_id for doc_id in members if doc_id != result["id"]]
+            snippet = self.db.execute(f"""
+                SELECT snippet(pages_fts, 1, '[', ']', '...', {SNIPPET_TOKENS})
+                FROM pages_fts WHERE pages_fts MATCH ? AND rowid = ?
+            """, (expression, result.pop("row"))).fetchone()[0]
+            result["snippet"] = " ".join(snippet.split())
+            results.append(result)
+        return results
+
+    def count(self, query, exact=False):
+        """Number of results for a query (near-duplicates count once)"""
+        expression = fts_query(query, exact)
+        if not expression:
+            return 0
+        return self.db.execute("""
+            SELECT count(DISTINCT coalesce(json_extract(documents.metadata, '$.duplicateOf'), pages.doc_id))
+            FROM pages_fts
+            JOIN pages ON pages.id = pages_fts.rowid
+            JOIN documents ON documents.id = pages.doc_id
+            WHERE pages_fts MATCH ?
+        """, (expression,)).fetchone()[0]
+
+    def document(self, doc_id):
+        """A document as process_all_pdfs.py built it (content and pageOffsets included), or None"""
+        row = self.db.execute("SELECT id, title, source, filename, metadata FROM documents WHERE id = ?",
+                              (doc_id,)).fetchone()
+        if row is None:
+            return None
+        doc = {"id": row[0], "title": row[1], "source": row[2]}
+        doc.update(json.loads(row[4]))
+        pages = self.db.execute("SELECT start, text FROM pages WHERE doc_id = ? ORDER BY page",
+                                (doc_id,)).fetchall()
+        doc["content"] = "".join(text for _, text in pages)
+        doc["filename"] = row[3]
+        doc["pageOffsets"] = [start for start, _ in pages]
+        return doc
+
+    def close(self):
+        self.db.close()
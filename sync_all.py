@@ -0,0 +1,277 @@
+"""
+One-Command Sync for the Epstein Documents Database
+
+Runs every downloader at the same time instead of one after another, each
+source under its own rate limit (sources that hit the same site share
+one), and extracts PDFs while the downloads are still running: new files
+in epstein_documents/pdfs/ go onto a work queue that a pool of extraction
+processes drains into the extraction cache. When the last source finishes,
+process_all_pdfs.py builds the corpus and indexes from that cache, so a
+full refresh takes about as long as the slowest stage rather than the sum
+of all of them.
+
+Usage:
+    python sync_all.py
+    python sync_all.py --workers 8 --format sharded
+    python sync_all.py --sources courtlistener flight_logs    # skip the rest
+    python sync_all.py --ocr                                  # OCR scanned pages too
+"""
+
+import argparse
+import os
+import queue
+import threading
+import time
+from functools import partial
+from pathlib import Path
+
+from extraction_pool import ExtractionPool
+from http_download import TokenBucket
+from metrics import METRICS, finish_run
+from ocr import page_ocr_for
+from process_all_pdfs import ExtractionCache, extract_document_timed, process_all_pdfs, record_extraction
+
+PDFS_DIR = "epstein_documents/pdfs"
+
+# Requests per second allowed to each site; sources on the same site share it
+SITE_RATES = {
+    "courtlistener.com": 2.0,
+    "documentcloud.org": 1.0,
+    "vault.fbi.gov": 0.5
+}
+
+def run_courtlistener(limiter, concurrency):
+    from download_all_documents import EpsteinDocumentDownloader
+    downloader = EpsteinDocumentDownloader(concurrency=concurrency, limiter=limiter)
+    try:
+        downloader.download_all()
+    finally:
+        downloader.downloaded.close()
+
+def run_dockets(limiter, concurrency):
+    from download_all_epstein import ComprehensiveEpsteinDownloader
+    downloader = ComprehensiveEpsteinDownloader(concurrency=concurrency, limiter=limiter)
+    try:
+        downloader.download_all()
+    finally:
+        downloader.fetcher.ledger.close()
+
+def run_fbi_vault(limiter, concurrency):
+    from download_fbi_vault import download_fbi_vault_documents
+    download_fbi_vault_documents(limiter)
+
+def run_flight_logs(limiter, concurrency):
+    from download_flight_logs import download_flight_logs
+    download_flight_logs(limiter)
+
+# name: (site, function); imported lazily so a missing browser driver only
+# affects the sources that need it
+SOURCES = {
+    "courtlistener": ("courtlistener.com", run_courtlistener),
+    "dockets": ("courtlistener.com", run_dockets),
+    "fbi_vault": ("vault.fbi.gov", run_fbi_vault),
+    "flight_logs": ("documentcloud.org", run_flight_logs)
+}
+
+class SourceRunner(threading.Thread):
+    """Run one download source in the background, recording how it went"""
+
+    def __init__(self, name, function, limiter, concurrency):
+        super().__init__(name=name, daemon=True)
+        self.function = function
+        self.limiter = limiter
+        self.concurrency = concurrency
+        self.error = None
+        self.seconds = 0.0
+
+    def run(self):
+        started = time.monotonic()
+        try:
+            self.function(self.limiter, self.concurrency)
+        except BaseException as e:
+            self.error = e
+            print(f"❌ [{self.name}] stopped: {e}")
+        finally:
+            self.seconds = time.monotonic() - started
+            METRICS.record_stage(f"download:{self.name}", self.seconds)
+
+class PdfFeed(threading.Thread):
+    """Put every complete PDF that appears in a directory onto a queue
+
+    The downloaders only give a file its .pdf name once it is complete
+    (a .part / .crdownload is renamed into place), so anything matching
+    *.pdf is ready to extract. PDFs already present when the feed starts
+    are queued too, in case an earlier sync was stopped before extracting
+    them.
+    """
+
+    def __init__(self, directory, work_queue, poll_interval=1.0):
+        super().__init__(name="pdf-feed", daemon=True)
+        self.directory = Path(directory)
+        self.work_queue = work_queue
+        self.poll_interval = poll_interval
+        self.seen = set()
+        self.stopping = threading.Event()
+
+    def scan(self):
+        for pdf_file in sorted(self.directory.glob("*.pdf")):
+            if pdf_file not in self.seen:
+                self.seen.add(pdf_file)
+                self.work_queue.put(pdf_file)
+
+    def run(self):
+        while not self.stopping.wait(self.poll_interval):
+            self.scan()
+        self.scan()  # Files that landed after the last poll
+
+    def stop(self):
+        """Pick up the last files, then stop"""
+        self.stopping.set()
+        self.join()
+
+def extract_from_queue(work_queue, feed, cache, workers, ocr=None):
+    """Extract queued PDFs into the cache until the feed stops and the queue is empty
+
+    Extraction runs in isolated worker processes with the same time and
+    memory budget as process_all_pdfs.py; the cache and its manifest are
+    only touched from this thread. Returns (extracted, cached, failed)
+    counts, where failed includes quarantined PDFs.
+    """
+    extracted = cached = failed = 0
+    claimed = set()
+    with ExtractionPool(partial(extract_document_timed, ocr=ocr), workers) as pool:
+        while True:
+            # Keep the pool busy without queueing the whole backlog at once
+            while pool.pending() < workers * 2:
+                try:
+                    pdf_file = work_queue.get(timeout=0.5 if not pool.pending() else 0)
+                except queue.Empty:
+                    break
+                try:
+                    sha256 = cache.fingerprint(pdf_file)
+                except FileNotFoundError:
+                    continue  # Renamed or replaced before we got to it
+                # The same PDF under another name is extracted once
+                hit, _ = cache.lookup(pdf_file, ocr=ocr is not None)
+                if hit or sha256 in claimed:
+                    cached += 1
+                    METRICS.count("extract_cache_hits_total")
+                    continue
+                claimed.add(sha256)
+                pool.submit(pdf_file)
+
+            if not pool.pending():
+                if not feed.is_alive() and work_queue.empty():
+                    break
+                continue
+
+            for pdf_file, result in pool.results():
+                record_extraction(result)
+                if result["reason"]:
+                    cache.quarantine(pdf_file, result["reason"], result["detail"])
+                    failed += 1
+                    print(f"   🧪 Quarantined {pdf_file.name[:60]} ({result['reason']}: {result['detail']})")
+                    continue
+                cache.store(pdf_file, result["extracted"])
+                if result["extracted"]:
+                    extracted += 1
+                    print(f"   📄 Extracted {pdf_file.name[:60]} ({len(result['extracted']['content']):,} characters)")
+                else:
+                    failed += 1
+                    print(f"   ⚠️  No text in {pdf_file.name[:60]}")
+                if (extracted + failed) % 100 == 0:
+                    cache.save_manifest()
+    return extracted, cached, failed
+
+def sync_all(sources, workers=1, concurrency=4, output_format="json", build=True, ocr=None):
+    """Download from every source concurrently, extracting as PDFs arrive"""
+    print("\n🔄 EPSTEIN DOCUMENTS - FULL SYNC")
+    print("="*60)
+    started = time.monotonic()
+
+    # One limiter per site, shared by every source that talks to it
+    limiters = {}
+    runners = []
+    for name in sources:
+        site, function = SOURCES[name]
+        if site not in limiters:
+            limiters[site] = TokenBucket(SITE_RATES[site])
+        runners.append(SourceRunner(name, function, limiters[site], concurrency))
+        print(f"   ⬇️  {name} ({site}, {SITE_RATES[site]:g} requests/s)")
+    print(f"   ⚙️  {workers} extraction workers")
+    print("="*60)
+
+    Path(PDFS_DIR).mkdir(parents=True, exist_ok=True)
+    cache = ExtractionCache()
+    # Mark every file the corpus will be built from as seen, so saving the
+    # manifest mid-sync doesn't drop entries process_all_pdfs needs
+    for pdf_file in sorted(Path(PDFS_DIR).glob("*.pdf")):
+        cache.fingerprint(pdf_file)
+
+    work_queue = queue.Queue()
+    feed = PdfFeed(PDFS_DIR, work_queue)
+    feed.start()
+    for runner in runners:
+        runner.start()
+
+    # Stop feeding once every source is done (the feed then makes a final pass)
+    def stop_feed_when_done():
+        for runner in runners:
+            runner.join()
+        feed.stop()
+    threading.Thread(target=stop_feed_when_done, name="sync-watch", daemon=True).start()
+
+    try:
+        with METRICS.stage("extract"):
+            extracted, cached, failed = extract_from_queue(work_queue, feed, cache, workers, ocr)
+    finally:
+        cache.save_manifest()
+    download_seconds = max((runner.seconds for runner in runners), default=0.0)
+    METRICS.record_stage("download", download_seconds)
+
+    print("\n" + "="*60)
+    print("📥 DOWNLOADS FINISHED")
+    print("="*60)
+    for runner in runners:
+        status = f"❌ {runner.error}" if runner.error else "✅"
+        print(f"   {runner.name:<14} {runner.seconds:7.1f}s  {status}")
+    print(f"   Extracted while downloading: {extracted} new, {cached} already cached, {failed} without text")
+
+    if build:
+        # Everything is in the extraction cache now, so this only assembles
+        # the corpus and indexes
+        with METRICS.stage("build"):
+            process_all_pdfs(PDFS_DIR, workers=workers, output_format=output_format, ocr=ocr)
+
+    print(f"\n⏱️  Sync took {time.monotonic() - started:.1f}s (slowest download {download_seconds:.1f}s)")
+    return not any(runner.error for runner in runners)
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Download from every source at once and extract PDFs as they arrive")
+    parser.add_argument("--sources", nargs="+", choices=list(SOURCES), default=list(SOURCES),
+                        help="sources to sync (default: all)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="number of extraction processes (default: 0 = one per CPU core)")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="downloads in flight per source (default: 4)")
+    parser.add_argument("--format", choices=["json", "sharded", "sqlite"], default="json",
+                        help="corpus format, as in process_all_pdfs.py")
+    parser.add_argument("--no-build", action="store_true",
+                        help="only download and extract; don't rebuild the corpus and indexes")
+    parser.add_argument("--ocr", action="store_true",
+                        help="OCR scanned pages, as in process_all_pdfs.py")
+    parser.add_argument("--ocr-lang", default="eng", help="Tesseract language(s) for --ocr")
+    args = parser.parse_args()
+
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    ocr = page_ocr_for(workers, args.ocr_lang) if args.ocr else None
+    try:
+        sync_all(args.sources, workers=workers, concurrency=args.concurrency,
+                 output_format=args.format, build=not args.no_build, ocr=ocr)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Sync interrupted. Downloads and extractions so far are kept; run again to continue.")
+    finish_run("sync_all")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Shared fixtures: the repo's top-level modules and a local stub HTTP server"""
+
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+sys.path.insert(0, str(ROOT))
+
+class StubServer:
+    """HTTP server answering from canned responses
+
+    routes maps a path (query string included) to a list of (status,
+    headers, body) answers, given in turn; the last one repeats. Every
+    request is logged with its time, and `max_in_flight` is the most
+    requests handled at once.
+    """
+
+    def __init__(self, delay=0.0):
+        self.routes = {}
+        self.delay = delay
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def add(self, path, *answers):
+        self.routes[path] = list(answers)
+
+    def times(self, path):
+        return [when for requested, when in self.requests if requested == path]
+
+    def answer(self, path):
+        with self.lock:
+            self.requests.append((path, time.monotonic()))
+            answers = self.routes.get(path)
+            if not answers:
+                return 404, {}, b"not found"
+            return answers.pop(0) if len(answers) > 1 else answers[0]
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, headers, body = stub.answer(self.path)
+                with stub.lock:
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    time.sleep(stub.delay)
+                    if isinstance(body, str):
+                        body = body.encode("utf-8")
+                    self.send_response(status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with stub.lock:
+                        stub.in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+@pytest.fixture
+def stub_server():
+    server = StubServer()
+    server.thread.start()
+    yield server
+    server.server.shutdown()
+    server.server.server_close()
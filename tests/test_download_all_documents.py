@@ -0,0 +1,85 @@
+"""download_all_documents.py against a local stub of CourtListener"""
+
+import json
+
+from download_all_documents import EpsteinDocumentDownloader
+
+DOCKET_ID = 4355308
+
+def serve_docket(stub_server, entries):
+    """Serve a docket's JSON and one PDF per RECAP document; returns {document id: (PDF path, content)}"""
+    docket = {"docket_entries": []}
+    pdfs = {}
+    for entry_number, documents in entries.items():
+        recap_documents = []
+        for attachment, description in documents:
+            doc_id = len(pdfs) + 1
+            path = f"/recap/gov.uscourts.nysd.447706/gov.uscourts.nysd.447706.{entry_number}.{attachment}.pdf"
+            pdfs[doc_id] = (path, f"%PDF-1.4 entry {entry_number} attachment {attachment}")
+            recap_documents.append({"id": doc_id, "filepath_local": path, "document_number": str(entry_number),
+                                    "attachment_number": attachment or None, "description": description})
+            stub_server.add(path, (200, {"Content-Type": "application/pdf"}, pdfs[doc_id][1]))
+        docket["docket_entries"].append({"entry_number": entry_number, "description": f"Entry {entry_number}",
+                                         "recap_documents": recap_documents})
+    stub_server.add(f"/docket/{DOCKET_ID}/json/", (200, {"Content-Type": "application/json"}, json.dumps(docket)))
+    return pdfs
+
+def ledger(downloader):
+    downloader.save_log()
+    return [json.loads(line) for line in downloader.log_file.read_text().splitlines()]
+
+def pdf_times(stub_server):
+    return sorted(when for path, when in stub_server.requests if path.endswith(".pdf"))
+
+def test_attachments_get_their_own_files(stub_server, tmp_path):
+    pdfs = serve_docket(stub_server, {
+        1: [(0, "Complaint")],
+        5: [(0, "Exhibit"), (1, "Exhibit"), (2, "Exhibit")],
+    })
+    downloader = EpsteinDocumentDownloader(tmp_path, concurrency=4, rate=1000, site_url=stub_server.url)
+
+    downloader.download_case("Giuffre v. Maxwell", DOCKET_ID)
+
+    records = ledger(downloader)
+    assert sorted(record["entry_number"] for record in records) == ["1", "5", "5-1", "5-2"]
+    assert len({record["filename"] for record in records}) == 4
+    for record in records:
+        assert (tmp_path / "pdfs" / record["filename"]).read_text() == pdfs[record["id"]][1]
+
+def test_downloads_run_concurrently(stub_server, tmp_path):
+    stub_server.delay = 0.2
+    serve_docket(stub_server, {entry: [(0, "Order")] for entry in range(1, 10)})
+    downloader = EpsteinDocumentDownloader(tmp_path, concurrency=3, rate=1000, site_url=stub_server.url)
+
+    downloader.download_case("Giuffre v. Maxwell", DOCKET_ID)
+
+    assert len(ledger(downloader)) == 9
+    assert stub_server.max_in_flight == 3
+
+def test_token_bucket_limits_the_request_rate(stub_server, tmp_path):
+    serve_docket(stub_server, {entry: [(0, "Order")] for entry in range(1, 9)})
+    rate = 10.0
+    downloader = EpsteinDocumentDownloader(tmp_path, concurrency=4, rate=rate, site_url=stub_server.url)
+
+    downloader.download_case("Giuffre v. Maxwell", DOCKET_ID)
+
+    assert len(ledger(downloader)) == 8
+    # 9 requests (docket + 8 PDFs) at 10/s: at least 0.8s from first to last
+    times = sorted(when for _, when in stub_server.requests)
+    assert len(times) == 9
+    assert times[-1] - times[0] >= (len(times) - 1) / rate * 0.9
+
+def test_retry_after_pauses_every_download(stub_server, tmp_path):
+    pdfs = serve_docket(stub_server, {entry: [(0, "Order")] for entry in range(1, 7)})
+    throttled, content = pdfs[1]
+    stub_server.add(throttled, (429, {"Retry-After": "1"}, "slow down"),
+                    (200, {"Content-Type": "application/pdf"}, content))
+    downloader = EpsteinDocumentDownloader(tmp_path, concurrency=3, rate=50, site_url=stub_server.url)
+
+    downloader.download_case("Giuffre v. Maxwell", DOCKET_ID)
+
+    assert len(ledger(downloader)) == 6
+    refused, retried = stub_server.times(throttled)
+    assert retried - refused >= 0.9
+    # No other download was sent while the limiter was paused
+    assert not [when for when in pdf_times(stub_server) if refused + 0.2 < when < refused + 0.9]
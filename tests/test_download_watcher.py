@@ -0,0 +1,80 @@
+"""Which files DownloadWatcher counts as finished browser downloads"""
+
+import os
+import time
+
+from download_watcher import DownloadWatcher
+
+def settle(watcher):
+    """Scan until files seen once have had time to count as stable"""
+    finished = watcher.scan()
+    time.sleep(watcher.stable_seconds)
+    return finished + watcher.scan()
+
+def test_counts_a_pdf_from_a_started_download(tmp_path):
+    (tmp_path / "old.pdf").write_bytes(b"%PDF old")
+    watcher = DownloadWatcher(tmp_path, stable_seconds=0.05, timeout=60)
+
+    watcher.started()
+    (tmp_path / "entry_1.pdf.crdownload").write_bytes(b"%PDF partial")
+    assert settle(watcher) == []
+    (tmp_path / "entry_1.pdf.crdownload").rename(tmp_path / "entry_1.pdf")
+
+    assert settle(watcher) == [tmp_path / "entry_1.pdf"]
+    assert watcher.in_flight() == 0
+    assert watcher.failed == 0
+
+def test_ignores_files_it_did_not_start(tmp_path):
+    watcher = DownloadWatcher(tmp_path, stable_seconds=0.05, timeout=60)
+
+    # Written while no browser download was outstanding
+    (tmp_path / "http_entry.pdf").write_bytes(b"%PDF http")
+    settle(watcher)
+    watcher.started()
+    # Sidecars of HTTP downloads, and a PDF already filed into the blob store
+    (tmp_path / "entry_2.pdf.part.json").write_text('{"etag": "x"}')
+    (tmp_path / "entry_3.pdf.link").write_bytes(b"%PDF link")
+    (tmp_path / "blob").write_bytes(b"%PDF blob")
+    os.link(tmp_path / "blob", tmp_path / "entry_4.pdf")
+
+    assert settle(watcher) == []
+    assert watcher.finished == []
+    assert watcher.in_flight() == 1
+
+def test_download_that_never_arrives_fails(tmp_path):
+    watcher = DownloadWatcher(tmp_path, stable_seconds=0.05, timeout=0.1)
+
+    watcher.started()
+    time.sleep(0.15)
+    watcher.scan()
+
+    assert watcher.in_flight() == 0
+    assert watcher.failed == 1
+
+def test_old_partial_files_do_not_hold_off_failures(tmp_path):
+    # A .part kept for resuming an HTTP download and a crashed browser's leftover
+    (tmp_path / "entry_2.pdf.part").write_bytes(b"%PDF half")
+    (tmp_path / "Unconfirmed 1234.crdownload").write_bytes(b"%PDF half")
+    watcher = DownloadWatcher(tmp_path, stable_seconds=0.05, timeout=0.2, poll_interval=0.02)
+
+    watcher.started()
+    started = time.monotonic()
+    assert watcher.wait_all() == []
+
+    assert watcher.failed == 1
+    assert time.monotonic() - started < 2
+
+def test_new_partial_file_holds_off_failure_until_it_stalls(tmp_path):
+    watcher = DownloadWatcher(tmp_path, stable_seconds=0.05, timeout=0.3, poll_interval=0.02)
+
+    watcher.started()
+    time.sleep(0.2)
+    (tmp_path / "entry_3.pdf.crdownload").write_bytes(b"%PDF slow")
+    watcher.scan()
+    time.sleep(0.15)
+    # Past the download's deadline, but its partial file changed lately
+    watcher.scan()
+    assert (watcher.in_flight(), watcher.failed) == (1, 0)
+
+    assert watcher.wait_all() == []
+    assert watcher.failed == 1
@@ -0,0 +1,69 @@
+"""Budgets and quarantine of extraction_pool.py and process_all_pdfs.py"""
+
+import os
+import time
+from pathlib import Path
+
+import process_all_pdfs
+from extraction_pool import ExtractionPool, PageTimeout, page_time_limit
+from process_all_pdfs import ExtractionCache, iter_extracted
+
+def fake_extract(path, page_timeout, backend=None, ocr=None):
+    """Stands in for extract_document_timed(); what it does depends on the file name"""
+    name = Path(path).stem
+    if name == "slow":
+        time.sleep(30)
+    elif name == "crash":
+        os._exit(3)
+    elif name == "broken":
+        raise ValueError("not a PDF")
+    elif name == "huge":
+        bytearray(4 * 1024 ** 3)
+    pages = []
+    for page in range(3):
+        try:
+            with page_time_limit(page_timeout):
+                if name == "stuck_page" and page == 1:
+                    time.sleep(30)
+                pages.append(f"page {page}")
+        except PageTimeout:
+            pages.append("")
+    return {"content": " ".join(pages), "pages": pages}, 0.01, []
+
+def test_bad_pdfs_come_back_with_a_reason():
+    paths = ["a.pdf", "slow.pdf", "crash.pdf", "broken.pdf", "huge.pdf", "stuck_page.pdf", "b.pdf"]
+    started = time.monotonic()
+
+    with ExtractionPool(fake_extract, workers=3, timeout=2, page_timeout=0.5, memory_mb=1024) as pool:
+        results = dict(pool.imap(paths))
+
+    assert time.monotonic() - started < 20
+    assert {path: result["reason"] for path, result in results.items()} == {
+        "a.pdf": None, "slow.pdf": "timeout", "crash.pdf": "crashed", "broken.pdf": "error",
+        "huge.pdf": "memory", "stuck_page.pdf": None, "b.pdf": None,
+    }
+    assert results["broken.pdf"]["detail"] == "ValueError: not a PDF"
+    assert results["stuck_page.pdf"]["extracted"]["pages"] == ["page 0", "", "page 2"]
+    assert results["b.pdf"]["extracted"]["content"] == "page 0 page 1 page 2"
+
+def test_quarantined_pdfs_are_skipped_until_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr(process_all_pdfs, "extract_document_timed", fake_extract)
+    pdfs = []
+    for name in ("good", "crash"):
+        pdfs.append(tmp_path / f"{name}.pdf")
+        pdfs[-1].write_bytes(b"%PDF-1.4 " + name.encode())
+
+    def run(**options):
+        cache = ExtractionCache(tmp_path / "manifest.json", tmp_path / "text_cache")
+        results = [(pdf.name, cached, reason) for pdf, _, cached, reason in iter_extracted(pdfs, cache=cache, **options)]
+        cache.save_manifest()
+        return results
+
+    assert run() == [("good.pdf", False, None), ("crash.pdf", False, "crashed")]
+    # Later runs don't extract it again, but still report it as quarantined
+    assert run() == [("good.pdf", True, None), ("crash.pdf", True, "crashed")]
+    assert run(retry_quarantined=True) == [("good.pdf", True, None), ("crash.pdf", False, "crashed")]
+
+    # A new version of the file is extracted again
+    pdfs[1].write_bytes(b"%PDF-1.4 refiled")
+    assert run()[1] == ("crash.pdf", False, "crashed")
@@ -0,0 +1,148 @@
+"""Docket parsing, PDF file names and downloads of http_fetcher.py"""
+
+import json
+
+import pytest
+
+from conftest import FIXTURES
+from http_fetcher import (HttpDocketFetcher, document_number, needs_browser, parse_docket_page,
+                          pdf_filename)
+
+DOCKET_URL = "https://www.courtlistener.com/docket/4355308/doe-v-epstein/"
+RECAP = "https://www.courtlistener.com/recap/gov.uscourts.nysd.447706/gov.uscourts.nysd.447706"
+
+def fixture(name):
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+def test_parse_docket_page():
+    page = parse_docket_page(fixture("docket_page1.html"), DOCKET_URL)
+
+    assert page["case_name"] == "Doe v. Epstein, 2015"
+    assert page["next_page"] == DOCKET_URL + "?page=2"
+    # Absolute URLs, in page order, each once; "Buy on PACER" isn't a PDF
+    assert page["pdf_links"] == [
+        (f"{RECAP}.1.0.pdf", "Download PDF"),
+        (f"{RECAP}.1.1.pdf", "Exhibit A & Index"),
+        (f"{RECAP}.2.0.pdf", "Download PDF"),
+        ("https://www.courtlistener.com/docket/2015/pdf/letter-a.pdf", "Download"),
+        ("https://www.courtlistener.com/docket/2015/pdf/letter-b.pdf", "Download"),
+    ]
+
+def test_parse_last_docket_page():
+    page = parse_docket_page(fixture("docket_page2.html"), DOCKET_URL + "?page=2")
+
+    assert page["next_page"] is None
+    assert [url for url, _ in page["pdf_links"]] == [f"{RECAP}.6.0.pdf", f"{RECAP}.1.0.pdf"]
+
+def test_needs_browser():
+    assert needs_browser(fixture("captcha.html"))
+    assert not needs_browser(fixture("docket_page1.html"))
+    assert not parse_docket_page(fixture("captcha.html"), DOCKET_URL)["pdf_links"]
+
+@pytest.mark.parametrize("url, expected", [
+    (f"{RECAP}.1.0.pdf", "1"),
+    (f"{RECAP}.1.1.pdf", "1-1"),
+    (f"{RECAP}.1320.12.pdf", "1320-12"),
+    ("https://www.courtlistener.com/docket/2015/pdf/letter-a.pdf", "2015"),
+    ("https://example.com/files/letter.pdf", "7"),
+])
+def test_document_number(url, expected):
+    assert document_number(url, 7) == expected
+
+def test_pdf_filename():
+    name = pdf_filename("Doe_v_Epstein_2015", "1-1", "Exhibit A & Index", f"{RECAP}.1.1.pdf")
+
+    assert name.startswith("Doe_v_Epstein_2015_1-1_Exhibit A  Index_")
+    assert name.endswith(".pdf")
+    assert name == pdf_filename("Doe_v_Epstein_2015", "1-1", "Exhibit A & Index", f"{RECAP}.1.1.pdf")
+
+def test_pdf_filenames_of_colliding_links_differ():
+    # Both letters are numbered 2015 (the first number in their path) and
+    # have generic link text, so only their URLs tell them apart
+    links = parse_docket_page(fixture("docket_page1.html"), DOCKET_URL)["pdf_links"]
+    letters = [url for url, _ in links if "letter" in url]
+    numbers = {document_number(url, i) for i, url in enumerate(letters, 1)}
+    names = {pdf_filename("Doe_v_Epstein_2015", "2015", "Document", url) for url in letters}
+
+    assert numbers == {"2015"}
+    assert len(names) == 2
+
+def serve_docket(stub_server):
+    """The fixture docket (two pages) and its PDFs, each PDF with its own content"""
+    path = "/docket/4355308/doe-v-epstein/"
+    stub_server.add(path, (200, {}, fixture("docket_page1.html")))
+    stub_server.add(path + "?page=2", (200, {}, fixture("docket_page2.html")))
+    pdfs = {}
+    for entry in ("1.0", "1.1", "2.0", "6.0"):
+        pdfs[f"/recap/gov.uscourts.nysd.447706/gov.uscourts.nysd.447706.{entry}.pdf"] = f"%PDF-1.4 entry {entry}"
+    for letter in ("letter-a", "letter-b"):
+        pdfs[f"/docket/2015/pdf/{letter}.pdf"] = f"%PDF-1.4 {letter}"
+    for pdf_path, body in pdfs.items():
+        stub_server.add(pdf_path, (200, {"Content-Type": "application/pdf"}, body))
+    return stub_server.url + path, pdfs
+
+def test_fetch_docket_keeps_every_pdf(stub_server, tmp_path):
+    docket_url, pdfs = serve_docket(stub_server)
+    fetcher = HttpDocketFetcher(tmp_path, concurrency=4, rate=1000)
+
+    result = fetcher.fetch_docket(docket_url)
+    fetcher.ledger.close()
+
+    assert result == {"case_name": "Doe v. Epstein, 2015", "downloaded": 6, "failed": 0}
+    records = [json.loads(line) for line in (tmp_path / "fetch_log.jsonl").read_text().splitlines()]
+    assert len(records) == 6
+    # Every record's file holds that record's PDF, the colliding letters included
+    for record in records:
+        pdf_path = record["id"][len(stub_server.url):]
+        assert (tmp_path / "pdfs" / record["filename"]).read_text() == pdfs[pdf_path]
+    assert len({record["filename"] for record in records}) == 6
+
+def test_download_pdf_does_not_overwrite_other_content(stub_server, tmp_path):
+    stub_server.add("/docket/2015/pdf/letter-a.pdf", (200, {}, "%PDF-1.4 new letter"))
+    url = stub_server.url + "/docket/2015/pdf/letter-a.pdf"
+    fetcher = HttpDocketFetcher(tmp_path, rate=1000)
+    existing = fetcher.pdfs_dir / pdf_filename("Doe_v_Epstein_2015", "2015", "Document", url)
+    existing.write_text("%PDF-1.4 another letter")
+
+    assert fetcher.download_pdf(url, "Doe_v_Epstein_2015", "2015", "Download") is True
+    fetcher.ledger.close()
+
+    assert existing.read_text() == "%PDF-1.4 another letter"
+    renamed = existing.with_name(existing.stem + "_2.pdf")
+    assert renamed.read_text() == "%PDF-1.4 new letter"
+    record = json.loads((tmp_path / "fetch_log.jsonl").read_text())
+    assert record["filename"] == renamed.name
+
+def test_download_pdf_reuses_identical_file(stub_server, tmp_path):
+    stub_server.add("/docket/2015/pdf/letter-a.pdf", (200, {}, "%PDF-1.4 letter"))
+    url = stub_server.url + "/docket/2015/pdf/letter-a.pdf"
+    fetcher = HttpDocketFetcher(tmp_path, rate=1000)
+    existing = fetcher.pdfs_dir / pdf_filename("Doe_v_Epstein_2015", "2015", "Document", url)
+    existing.write_text("%PDF-1.4 letter")
+
+    assert fetcher.download_pdf(url, "Doe_v_Epstein_2015", "2015", "Download") is True
+    fetcher.ledger.close()
+
+    assert sorted(path.name for path in fetcher.pdfs_dir.iterdir()) == [existing.name]
+    assert json.loads((tmp_path / "fetch_log.jsonl").read_text())["filename"] == existing.name
+
+def test_blob_store_error_fails_only_that_pdf(stub_server, tmp_path, monkeypatch):
+    docket_url, pdfs = serve_docket(stub_server)
+    fetcher = HttpDocketFetcher(tmp_path, concurrency=4, rate=1000)
+    adopt = fetcher.store.adopt
+
+    def flaky_adopt(path):
+        if "Exhibit A" in path.name:
+            raise OSError(18, "Invalid cross-device link")
+        return adopt(path)
+    monkeypatch.setattr(fetcher.store, "adopt", flaky_adopt)
+
+    result = fetcher.fetch_docket(docket_url)
+    fetcher.ledger.close()
+
+    assert result == {"case_name": "Doe v. Epstein, 2015", "downloaded": 5, "failed": 1}
+    # The file stays where it was downloaded, unrecorded, so the next run retries it
+    exhibit = [path for path in (tmp_path / "pdfs").iterdir() if "Exhibit A" in path.name]
+    exhibit_path = "/recap/gov.uscourts.nysd.447706/gov.uscourts.nysd.447706.1.1.pdf"
+    assert [path.read_text() for path in exhibit] == [pdfs[exhibit_path]]
+    assert "Exhibit A" not in (tmp_path / "fetch_log.jsonl").read_text()
@@ -0,0 +1,67 @@
+"""Counters, histograms and the exports of metrics.py"""
+
+import json
+
+import requests
+
+import http_download
+from metrics import Histogram, Metrics
+
+def test_histogram_quantiles_stay_within_observed_values():
+    histogram = Histogram()
+    for value in (0.002, 0.003, 0.004, 0.2, 4.0):
+        histogram.observe(value)
+
+    assert histogram.count == 5 and histogram.min == 0.002 and histogram.max == 4.0
+    assert 0.0025 <= histogram.quantile(0.5) <= 0.005
+    assert histogram.quantile(0.95) <= 4.0
+    assert Histogram().quantile(0.5) is None
+
+def test_counters_sum_over_labels():
+    metrics = Metrics()
+    metrics.count("downloads_total", status="downloaded")
+    metrics.count("downloads_total", 2, status="failed")
+    metrics.count("download_bytes_total", 1500)
+
+    assert metrics.counter_value("downloads_total") == 3
+    assert metrics.counter_value("downloads_total", status="failed") == 2
+    assert metrics.counter_value("missing_total") == 0
+
+def test_exports(tmp_path, capsys):
+    metrics = Metrics()
+    metrics.count("downloads_total", status="downloaded")
+    metrics.count("download_bytes_total", 2_000_000)
+    metrics.observe("download_seconds", 0.3, status="downloaded")
+    metrics.record_stage("download", 2.0)
+
+    metrics.export("test_run", tmp_path)
+    metrics.export("test_run", tmp_path)
+    metrics.report()
+
+    runs = [json.loads(line) for line in (tmp_path / "metrics.jsonl").read_text().splitlines()]
+    assert len(runs) == 2 and runs[0]["run"] == "test_run"
+    assert runs[0]["stages"] == {"download": 2.0}
+    assert runs[0]["histograms"][0]["count"] == 1
+    prom = (tmp_path / "metrics.prom").read_text()
+    assert 'downloads_total{status="downloaded"} 1' in prom
+    assert 'download_seconds_bucket{status="downloaded",le="0.5"} 1' in prom
+    assert 'download_seconds_count{status="downloaded"} 1' in prom
+    assert 'stage_seconds{stage="download"} 2.000' in prom
+    out = capsys.readouterr().out
+    assert "Files downloaded: 1, unchanged: 0, failed: 0" in out
+    assert "2.0 MB at 1.00 MB/s" in out
+
+def test_downloads_record_requests_and_retries(stub_server, tmp_path, monkeypatch):
+    metrics = Metrics()
+    monkeypatch.setattr(http_download, "METRICS", metrics)
+    stub_server.add("/doc.pdf", (503, {"Retry-After": "0"}, ""), (200, {}, "%PDF-1.4 document"))
+
+    result = http_download.download_file(requests.Session(), stub_server.url + "/doc.pdf", tmp_path / "doc.pdf")
+
+    assert result["status"] == "downloaded"
+    assert metrics.counter_value("http_requests_total") == 2
+    assert metrics.counter_value("http_requests_total", status="503") == 1
+    assert metrics.counter_value("http_retries_total") == 1
+    assert metrics.counter_value("downloads_total", status="downloaded") == 1
+    assert metrics.counter_value("download_bytes_total") == len("%PDF-1.4 document")
+    assert metrics.histogram("download_seconds").count == 1
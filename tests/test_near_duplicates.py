@@ -0,0 +1,74 @@
+"""Near-duplicate grouping of near_duplicates.py and how search collapses the groups"""
+
+import json
+import random
+
+from near_duplicates import NearDuplicateFinder, minhash_signature, similarity
+from search_engine import SearchEngine, collapse_duplicates
+
+def text(seed, words=300):
+    rng = random.Random(seed)
+    return " ".join(f"word{rng.randrange(5000)}" for _ in range(words))
+
+def refiled(content, stamp):
+    """The same text filed again: a new cover line and a couple of changed words"""
+    words = content.split()
+    words[100] = words[200] = "redacted"
+    return f"Exhibit {stamp} filed under seal " + " ".join(words)
+
+def documents():
+    deposition = text(1)
+    return [
+        {"id": 1, "content": deposition},
+        {"id": 2, "content": text(2)},
+        {"id": 3, "content": refiled(deposition, "A")},
+        {"id": 4, "content": refiled(deposition, "B") + " pilot"},
+        {"id": 5, "content": "Notice of appearance."},
+        {"id": 6, "content": "Notice of appearance."},
+    ]
+
+def test_similarity_estimate():
+    assert similarity(minhash_signature(text(1)), minhash_signature(refiled(text(1), "A"))) >= 0.8
+    assert similarity(minhash_signature(text(1)), minhash_signature(text(2))) < 0.1
+    assert minhash_signature("Notice of appearance.") is None
+
+def test_refiled_documents_point_at_the_first_copy(tmp_path):
+    finder = NearDuplicateFinder()
+    docs = documents()
+
+    assert [finder.add(doc) for doc in docs] == [None, None, 1, 1, None, None]
+    assert [doc.get("duplicateOf") for doc in docs] == [None, None, 1, 1, None, None]
+    assert finder.groups() == {1: [3, 4]}
+
+    saved = json.loads(finder.save(tmp_path / "duplicates.json").read_text())
+    assert saved["canonical"] == {"3": 1, "4": 1}
+
+def test_adding_again_clears_a_stale_mark():
+    doc = {"id": 9, "content": text(9), "duplicateOf": 1}
+
+    assert NearDuplicateFinder().add(doc) is None
+    assert "duplicateOf" not in doc
+
+def test_search_collapses_copies():
+    docs = documents()
+    finder = NearDuplicateFinder()
+    for doc in docs:
+        finder.add(doc)
+    engine = SearchEngine(docs)
+
+    word = docs[0]["content"].split()[0]
+    results = engine.search(word)
+    assert [(result["document"]["id"], result["duplicates"]) for result in results] == [(1, [3, 4])]
+
+    # Text only one copy has is still found, shown by that copy
+    results = engine.search("pilot")
+    assert [(result["document"]["id"], result["duplicates"]) for result in results] == [(4, [])]
+
+def test_collapse_keeps_the_best_place_of_a_group():
+    def result(doc_id, duplicate_of=None):
+        doc = {"id": doc_id} if duplicate_of is None else {"id": doc_id, "duplicateOf": duplicate_of}
+        return {"document": doc}
+
+    collapsed = collapse_duplicates([result(7, 1), result(2), result(1), result(8, 1)])
+
+    assert [(item["document"]["id"], item["duplicates"]) for item in collapsed] == [(1, [7, 8]), (2, [])]
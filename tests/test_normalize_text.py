@@ -0,0 +1,63 @@
+"""Stamp, running head and whitespace clean-up of normalize_text.py"""
+
+from normalize_text import clean_text, edge_lines, line_key, normalize_pages
+
+def filed_page(number, body):
+    return "\n".join([
+        f"Case 1:15-cv-07433-LAP Document 1320-12 Filed 01/03/24 Page {number} of 4",
+        "CONFIDENTIAL - SUBJECT TO PROTECTIVE ORDER",
+        body,
+        str(number),
+    ])
+
+BODIES = [
+    "Q. Where were the flight\nlogs kept?\nA. In the hangar office.\nQ. By whom?",
+    "A. The pilot kept them.   He signed\nevery entry.\nQ. Every one?\nA. Yes.",
+    "Q. Were they ever moved?\nA. Not that I know of.\nQ. Thank you.\nA. Sure.",
+    "MR. SMITH: No further\nquestions.\nTHE COURT: We'll\nadjourn.",
+]
+
+def test_repeated_stamps_and_heads_are_removed():
+    pages, metadata = normalize_pages([filed_page(i, body) for i, body in enumerate(BODIES, 1)])
+
+    assert len(pages) == 4
+    assert pages[0] == "Q. Where were the flight\nlogs kept?\nA. In the hangar office.\nQ. By whom?"
+    assert pages[1] == "A. The pilot kept them. He signed\nevery entry.\nQ. Every one?\nA. Yes."
+    assert all("CONFIDENTIAL" not in page and "Case 1:15" not in page for page in pages)
+    assert not pages[3].endswith("4")
+    assert metadata["filing"] == {"case": "1:15-cv-07433-LAP", "document": "1320-12", "filed": "01/03/24"}
+    removed = {entry["text"]: entry["pages"] for entry in metadata["boilerplate"]}
+    assert removed["CONFIDENTIAL - SUBJECT TO PROTECTIVE ORDER"] == 4
+    assert removed["Case 1:15-cv-07433-LAP Document 1320-12 Filed 01/03/24 Page 1 of 4"] == 4
+    assert removed["1"] == 4
+
+def test_single_stamped_page_loses_only_its_stamp():
+    pages, metadata = normalize_pages([filed_page(1, BODIES[0])])
+
+    # One page isn't enough to call its head or page number boilerplate
+    assert pages[0] == "CONFIDENTIAL - SUBJECT TO PROTECTIVE ORDER\n" + BODIES[0] + "\n1"
+    assert metadata["filing"]["document"] == "1320-12"
+
+def test_body_lines_are_kept_even_if_repeated():
+    # Away from the top and bottom of the page, repeating doesn't make a line boilerplate
+    bodies = [f"Q. Question {word}?\nA. Answer {word}.\nThe witness nodded.\nQ. Next {word}?\nA. Fine {word}."
+              for word in ("one", "two", "three", "four")]
+    pages, metadata = normalize_pages(bodies)
+
+    assert pages == bodies
+    assert "filing" not in metadata
+
+def test_empty_pages_keep_their_place():
+    pages, metadata = normalize_pages(["", None, "Some text.\n\n\n\nMore text."])
+
+    assert pages == ["", "", "Some text.\n\nMore text."]
+    assert metadata == {}
+
+def test_clean_text():
+    assert clean_text("  the de-\nposition   of\tthe\n\n\n\nwitness  ") == "the deposition of the\n\nwitness"
+    # Only lowercase words are joined; "Smith-\nJones" is a hyphenated name
+    assert clean_text("Smith-\nJones") == "Smith-\nJones"
+
+def test_line_key_ignores_case_spacing_and_numbers():
+    assert line_key("Page  3 of 40") == line_key("page 12 of 40")
+    assert edge_lines(["a", "", "b", "c", "d", "e", "f", "g", "h", "i"]) == [0, 2, 3, 7, 8, 9]
@@ -0,0 +1,85 @@
+"""Page cache of ocr.py, with a script in place of the tesseract command
+
+Tesseract itself isn't needed: the script records each call and prints a
+fixed text, which is all the cache has to get right.
+"""
+
+import pytest
+
+from ocr import PageOcr
+from process_all_pdfs import extract_pages
+
+Image = pytest.importorskip("PIL.Image")
+pytest.importorskip("pypdfium2")
+
+FAKE_TESSERACT = """#!/bin/sh
+cat > /dev/null
+echo "$@" >> "{log}"
+echo "Deposition of the pilot"
+"""
+
+@pytest.fixture
+def tesseract(tmp_path):
+    """Path of a tesseract stand-in; its calls are logged to calls.log"""
+    script = tmp_path / "tesseract"
+    script.write_text(FAKE_TESSERACT.format(log=tmp_path / "calls.log"))
+    script.chmod(0o755)
+    return script
+
+def calls(tmp_path):
+    log = tmp_path / "calls.log"
+    return log.read_text().splitlines() if log.exists() else []
+
+def scan(path, *shades):
+    """A PDF of scanned pages (images only, no text layer), one per shade"""
+    pages = [Image.new("L", (200, 260), shade) for shade in shades]
+    pages[0].save(path, save_all=True, append_images=pages[1:])
+    return path
+
+def test_page_text_is_cached(tmp_path, tesseract):
+    ocr = PageOcr(cache_dir=tmp_path / "cache", command=str(tesseract))
+    renders = []
+
+    def render(dpi):
+        renders.append(dpi)
+        return Image.new("L", (10, 10), 255)
+
+    assert ocr.page_text("digest-1", render) == ("Deposition of the pilot", False)
+    assert ocr.page_text("digest-1", render) == ("Deposition of the pilot", True)
+    assert renders == [300]
+    assert calls(tmp_path) == ["stdin stdout -l eng --dpi 300"]
+
+    # Other settings read the page differently, so they have their own entries
+    french = PageOcr(cache_dir=tmp_path / "cache", language="fra", command=str(tesseract))
+    assert french.page_text("digest-1", render)[1] is False
+    assert len(calls(tmp_path)) == 2
+
+def test_failed_ocr_is_not_cached(tmp_path):
+    script = tmp_path / "tesseract"
+    script.write_text("#!/bin/sh\necho 'Error opening data file' >&2\nexit 1\n")
+    script.chmod(0o755)
+    ocr = PageOcr(cache_dir=tmp_path / "cache", command=str(script))
+
+    with pytest.raises(RuntimeError, match="Error opening data file"):
+        ocr.page_text("digest-1", lambda dpi: Image.new("L", (10, 10), 255))
+    assert not ocr.cache_path("digest-1").exists()
+
+def test_same_scan_in_another_pdf_is_read_from_the_cache(tmp_path, tesseract):
+    ocr = PageOcr(cache_dir=tmp_path / "cache", command=str(tesseract))
+    first = scan(tmp_path / "first.pdf", 255, 200)
+    # Filed again under another docket entry, with a new page in front
+    refiled = scan(tmp_path / "refiled.pdf", 150, 255, 200)
+
+    timings = []
+    assert extract_pages(first, timings, ocr=ocr) == ["Deposition of the pilot"] * 2
+    assert [used for used, _ in timings] == ["ocr", "ocr"]
+
+    timings = []
+    assert extract_pages(refiled, timings, ocr=ocr) == ["Deposition of the pilot"] * 3
+    assert [used for used, _ in timings] == ["ocr", "ocr-cache", "ocr-cache"]
+    assert len(calls(tmp_path)) == 3
+
+    # Without OCR, scanned pages are reported as such
+    timings = []
+    assert extract_pages(first, timings) == ["", ""]
+    assert [used for used, _ in timings] == ["image", "image"]
@@ -0,0 +1,65 @@
+"""Passages of passage_index.py: splitting, ranking, the saved file and its corpus check"""
+
+import json
+from types import SimpleNamespace
+
+from passage_index import PassageIndex, PassageIndexWriter, split_passages
+from search_engine import show_passages
+
+def words(count, start=0):
+    return " ".join(f"w{i}" for i in range(start, start + count))
+
+def documents():
+    return [
+        {"id": 3, "title": "Deposition", "source": "Exhibit 3",
+         "content": words(200) + " the pilot kept the flight logs " + words(200, 200),
+         "pageOffsets": [0, 5]},
+        {"id": 8, "title": "Order", "source": "Exhibit 8", "content": "An order about scheduling. " + words(50)},
+    ]
+
+def test_split_passages_overlap():
+    passages = list(split_passages(words(300), passage_words=120, overlap_words=30))
+
+    assert [len(terms) for _, _, terms in passages] == [120, 120, 120]
+    assert passages[1][2][:30] == passages[0][2][-30:]
+    start, end, terms = passages[0]
+    assert words(300)[start:end].split() == terms
+
+def test_top_passages_and_pages():
+    index = PassageIndex()
+    for doc in documents():
+        index.add(doc)
+
+    results = index.top_passages("flight logs", 2)
+
+    assert [result["doc"] for result in results] == [3]
+    doc = documents()[0]
+    assert "flight logs" in doc["content"][results[0]["start"]:results[0]["end"]]
+    # Only the first passage starts on page 1
+    assert results[0]["start"] > 5 and results[0]["page"] == 2
+
+def test_saved_index_matches_its_corpus(tmp_path):
+    writer = PassageIndexWriter(tmp_path / "passages.json.gz")
+    for doc in documents():
+        writer.add(doc)
+    writer.close()
+
+    index = PassageIndex.load(tmp_path / "passages.json.gz")
+
+    assert index.documents == 2
+    assert index.top_passages("flight logs", 1)[0]["doc"] == 3
+    assert index.matches(documents())
+    # A rebuild that dropped or renumbered documents
+    assert not index.matches(documents()[:1])
+    assert not index.matches([dict(doc, id=doc["id"] + 100) for doc in documents()])
+
+def test_cli_refuses_a_stale_index(tmp_path, capsys):
+    writer = PassageIndexWriter(tmp_path / "passages.json.gz")
+    for doc in documents():
+        writer.add(doc)
+    writer.close()
+    (tmp_path / "documents.json").write_text(json.dumps({"documents": documents()[1:]}))
+
+    show_passages(SimpleNamespace(corpus=str(tmp_path / "documents.json"), query="flight logs", limit=3))
+
+    assert "built from other documents" in capsys.readouterr().out
@@ -0,0 +1,94 @@
+"""Index of search_index.py and the indexed search of search_engine.py"""
+
+import pytest
+
+from search_engine import SearchEngine, excerpt_matches, highlight_excerpt
+from search_index import InvertedIndex, InvertedIndexWriter, tokenize
+
+def documents():
+    return [
+        {"id": 1, "title": "Flight log", "content": "Flight logs list every flight. The pilot kept the LOGS."},
+        {"id": 2, "title": "Deposition", "content": "Q. Did you fly? A. I never flew on that flight."},
+        # Lowercasing "İ" adds a character, so offsets in this one can't be used
+        {"id": 4, "title": "Letter", "content": "İstanbul flight logs, see the pilot's notes."},
+        {"id": 5, "title": "Order", "content": "Scheduling order; no hearing <set> & nothing flies."},
+    ]
+
+def test_offsets_point_at_terms():
+    index = InvertedIndex()
+    for doc in documents():
+        index.add(doc)
+
+    for term in ("flight", "logs", "pilot"):
+        for doc_id, offsets in index.offsets(term).items():
+            if doc_id in index.shifted:
+                continue
+            content = next(doc for doc in documents() if doc["id"] == doc_id)["content"].lower()
+            assert offsets and all(content[offset:offset + len(term)] == term for offset in offsets)
+    assert index.postings("flight") == {1: [0, 4], 2: [10], 4: [2]}
+    assert index.shifted == {4}
+    assert index.offsets("missing") == {}
+
+def test_saved_index_round_trip(tmp_path):
+    writer = InvertedIndexWriter(tmp_path / "search_index.json.gz")
+    for doc in documents():
+        writer.add(doc)
+    writer.close()
+
+    index = InvertedIndex.load(tmp_path / "search_index.json.gz")
+
+    assert index.ids == [1, 2, 4, 5]
+    assert index.lengths == [len(tokenize(doc["content"])) for doc in documents()]
+    assert index.shifted == {4}
+    assert index.postings("logs") == writer.index.postings("logs")
+    assert index.offsets("logs") == writer.index.offsets("logs")
+
+@pytest.mark.parametrize("query, exact, case_insensitive", [
+    ("flight", False, True),
+    ("flight logs", False, True),
+    ("flight logs", True, True),
+    ("LOGS", False, False),
+    ("pilot's", True, True),
+    ("fl", False, True),
+    ("hearing <set>", True, True),
+])
+def test_indexed_search_matches_scan(tmp_path, query, exact, case_insensitive):
+    writer = InvertedIndexWriter(tmp_path / "search_index.json.gz")
+    for doc in documents():
+        writer.add(doc)
+    writer.close()
+    indexed = SearchEngine(documents(), InvertedIndex.load(tmp_path / "search_index.json.gz"))
+    scanning = SearchEngine(documents(), use_index=False)
+
+    def found(engine):
+        return [(result["document"]["id"], sorted(result["matches"]), result["terms"])
+                for result in engine.search(query, case_insensitive, exact)]
+
+    assert found(indexed) == found(scanning)
+    assert found(indexed)
+
+def test_stale_index_is_rebuilt():
+    index = InvertedIndex()
+    index.add(documents()[0])
+
+    engine = SearchEngine(documents(), index)
+
+    assert engine.index is not index
+    assert {result["document"]["id"] for result in engine.search("flight")} == {1, 2, 4}
+
+def test_highlight_excerpt():
+    content = "x" * 150 + " the flight <logs> & the flight crew " + "y" * 300
+    result = SearchEngine([{"id": 1, "content": content}]).search("flight")[0]
+    position = result["matches"][0]
+
+    excerpt = highlight_excerpt(content, result["terms"], position, 200)
+
+    assert excerpt.startswith("...") and excerpt.endswith("...")
+    assert "the <mark>flight</mark> &lt;logs&gt; &amp; the <mark>flight</mark> crew" in excerpt
+
+def test_excerpt_matches_keeps_matches_reaching_into_excerpt():
+    terms = [(6, [10, 95, 150, 400])]
+
+    # The excerpt of position 200 starts at 100; the match at 95 ends inside it
+    assert excerpt_matches(terms, 200, 300) == [(6, [95, 150])]
+    assert excerpt_matches(terms, 700, 100) == []
@@ -0,0 +1,48 @@
+"""Status codes and error payloads of search_service.SearchService.route"""
+
+import asyncio
+import json
+from http import HTTPStatus
+
+import pytest
+
+from search_service import SearchService
+
+@pytest.fixture
+def service(tmp_path):
+    corpus = tmp_path / "documents.json"
+    corpus.write_text(json.dumps({"documents": [
+        {"id": 1, "title": "Flight logs", "source": "Exhibit 1", "content": "Passenger flight logs for 1999."}
+    ]}))
+    service = SearchService(corpus)
+    service.swap_in(*service.load())
+    return service
+
+def route(service, target):
+    return asyncio.run(service.route("GET", target))
+
+def test_search(service):
+    status, payload = route(service, "/api/search?q=flight+logs")
+
+    assert status == HTTPStatus.OK
+    assert [hit["id"] for hit in payload["results"]] == [1]
+
+def test_bad_request(service):
+    status, payload = route(service, "/api/search?q=flight&page=zero")
+
+    assert status == HTTPStatus.BAD_REQUEST
+    assert payload == {"error": "page must be a whole number"}
+
+def test_unexpected_error_is_a_500(service, monkeypatch, capsys):
+    def broken_search(*args):
+        raise KeyError("content")
+    monkeypatch.setattr(service, "run_search", broken_search)
+
+    status, payload = route(service, "/api/search?q=flight")
+
+    assert status == HTTPStatus.INTERNAL_SERVER_ERROR
+    assert payload == {"error": "internal error"}
+    assert "KeyError" in capsys.readouterr().out
+    assert service.stats()["errors"] == 1
+    # The failed search isn't left pending for the next request
+    assert service.in_flight == {}
@@ -0,0 +1,85 @@
+"""The documents.db written by SqliteCorpusWriter, queried with SqliteCorpus"""
+
+import pytest
+
+from corpus_writers import SqliteCorpusWriter
+from sqlite_corpus import SqliteCorpus, fts_query
+
+FILLER = "The witness was asked about the schedule and answered each question in turn. "
+
+def doc(doc_id, title, pages, **fields):
+    offsets = []
+    content = ""
+    for text in pages:
+        offsets.append(len(content))
+        content += text
+    return {"id": doc_id, "title": title, "source": f"Exhibit {doc_id}", "filename": f"exhibit_{doc_id}.pdf",
+            "content": content, "pageOffsets": offsets, **fields}
+
+def build(tmp_path, documents):
+    path = tmp_path / "documents.db"
+    writer = SqliteCorpusWriter(path, {"version": 1})
+    for document in documents:
+        writer.add(document)
+    writer.close()
+    return SqliteCorpus(path)
+
+def test_title_hit_outranks_body_only_hit(tmp_path):
+    with build(tmp_path, [
+        # A much shorter page: FTS5's unweighted ranking would put it first
+        doc(1, "Hearing transcript", ["Zorblatt. " + FILLER]),
+        doc(2, "Zorblatt account statements", ["Zorblatt once. " + FILLER * 4]),
+    ]) as corpus:
+        results = corpus.search("zorblatt")
+
+    assert [result["id"] for result in results] == [2, 1]
+    assert scores_descending(results)
+
+def test_results_limit_and_best_page(tmp_path):
+    documents = [doc(i, f"Order {i}", [FILLER, f"Flight logs, copy {i}. " + FILLER * i]) for i in range(1, 6)]
+    with build(tmp_path, documents) as corpus:
+        results = corpus.search('"flight logs"', limit=3)
+        assert corpus.count('"flight logs"') == 5
+
+    # Same hit, shorter page ranks higher
+    assert [result["id"] for result in results] == [1, 2, 3]
+    assert [result["page"] for result in results] == [2, 2, 2]
+    assert scores_descending(results)
+    assert results[0]["snippet"].startswith("[Flight logs], copy 1.")
+
+def test_document_round_trip(tmp_path):
+    original = doc(7, "Deposition", ["Page one text. ", "Page two text."], date="2016-05-03")
+    with build(tmp_path, [original]) as corpus:
+        assert corpus.document(7) == original
+        assert corpus.document(8) is None
+        assert len(corpus) == 1
+
+def test_near_duplicates_collapse_but_keep_their_own_text(tmp_path):
+    shared = "Deposition of the pilot about the flight logs. " + FILLER * 2
+    with build(tmp_path, [
+        doc(1, "Deposition", [shared]),
+        doc(2, "Deposition (refiled)", [shared + "Stamped Zorblatt."], duplicateOf=1),
+        doc(3, "Unrelated order", ["An order about the flight logs schedule. " + FILLER]),
+    ]) as corpus:
+        results = corpus.search('"flight logs"')
+        copy_only = corpus.search("zorblatt")
+        assert corpus.count('"flight logs"') == 2
+        assert corpus.document(2)["content"].endswith("Stamped Zorblatt.")
+
+    by_id = {result["id"]: result for result in results}
+    assert set(by_id) == {1, 3}
+    assert by_id[1]["duplicates"] == [2]
+    # Text only the copy has still finds it
+    assert [(result["id"], result["duplicates"]) for result in copy_only] == [(2, [])]
+
+@pytest.mark.parametrize("query, expected", [
+    ("ghislaine maxwell", '"ghislaine" "maxwell"'),
+    ('"flight logs" OR depos*', '"flight logs" OR "depos"*'),
+    ("maxwell OR", '"maxwell"'),
+    ("NEAR(a b) -- ;", '"NEAR(a" "b)"'),
+])
+def test_fts_query(query, expected):
+    assert fts_query(query) == expected
+
+def scores_descending(results):
+    return all(a["score"] >= b["score"] for a, b in zip(results, results[1:]))